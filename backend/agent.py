@@ -13,6 +13,7 @@ from livekit.agents import (
 )
 import requests
 import asyncio
+import time
 from livekit.agents import AgentSession, Agent, llm, RoomInputOptions
 
 # from livekit.plugins.turn_detector.multilingual import MultilingualModel
@@ -22,10 +23,31 @@ import json
 from datetime import datetime
 import os
 import traceback  # Import traceback
+from array import array
+from bisect import bisect_left
+from agent_context import (
+    PROMPT_CONTEXT_TOKEN_BUDGET,
+    WindowedPromptContext,
+    render_prompt_context,
+)
+from agent_http import AgentLogBuffer, get_agent_http
+from retrieval import RETRIEVAL_ONLY_KNOWLEDGE, RetrievalIndex, format_results
+from agent_timeline import EventLoopLagMonitor, TimestampCoalescer
 
 load_dotenv(dotenv_path=".env_local")
 logger = logging.getLogger("voice-agent")
 API_BASE_URL = os.getenv("API_BASE_URL")
+# Seconds either side of an engagement opportunity's timestamp that trigger it
+ENGAGEMENT_TRIGGER_THRESHOLD = 1.0
+# Per-request timeout (seconds) for the backend calls made before a session starts
+AGENT_BOOTSTRAP_TIMEOUT = float(os.getenv("AGENT_BOOTSTRAP_TIMEOUT", "5"))
+
+DEFAULT_MODEL_CONFIG = {
+    "mode": "standard",
+    "standard_model": "gpt-4.1",
+    "realtime_model": "gemini-2.0-flash-live-001",
+    "voice_id": None,
+}
 
 # Base prompts for different bridge types - ENHANCED FOR GOAL DIRECTION
 BASE_PROMPTS = {
@@ -83,6 +105,7 @@ You have access to the following context in JSON format. Use it to inform your r
 - `knowledge_base`: Use this for deeper context, facts, and explanations, including any identified persuasion techniques, value propositions, objection handling strategies, or psychological sales methods relevant to the interaction's goal. Refer to it as your own knowledge.
 - `qa_pairs`: Use these to answer common questions directly.
 - `video_timeline`: Understand where you are in the presentation using `current_timestamp`. Refer to past or future segments based on this timeline.
+- `current_segments`: If present, the full detail of the segments around `current_timestamp` (the `context_window`); `knowledge_base` and `qa_pairs` then cover that part of the presentation. Use the `video_timeline` outline for anything outside it.
 - `engagement_opportunities`: You may be asked to initiate these based on the timeline.
 - `specific_goal_or_cta`: If this field is present and non-empty in the JSON context, it outlines THE PRIMARY OBJECTIVE or desired user action for this entire interaction. All your responses, while natural and conversational, should subtly and strategically work towards guiding the user to achieve this goal or take this call to action. This objective should be your top priority in shaping your replies, especially if the bridge_type is 'vsl' or 'webinar'.
 - `viewer_personalization`: If present, this contains specific information about the viewer. USE THIS DATA TO CREATE A HIGHLY PERSONALIZED EXPERIENCE:
@@ -117,6 +140,12 @@ Current Context JSON:
 ```
 """
 
+# Appended when the session has a retrieval index (see search_knowledge)
+RETRIEVAL_PROMPT = """
+# LOOKING THINGS UP
+The context above only covers part of what you know. When the user asks about something it does not cover (another part of the presentation, a specific fact, definition, example or common question), call the `search_knowledge` tool with a few keywords and answer from what it returns. Never mention that you searched.
+"""
+
 # Enhanced system prompt that incorporates personality, knowledge base and transcript
 SYSTEM_PROMPT_BASE = """
 You are both the creator and a real-time co-presenter of this content. You are speaking naturally to your audience as if they are right here with you.
@@ -164,6 +193,7 @@ class Assistant(Agent):
         brdge_id: str = None,
         room: rtc.Room = None,
         personalization_id: str = None,
+        bootstrap: dict = None,
     ) -> None:
         self.brdge_id = brdge_id
         self.room = room
@@ -181,6 +211,9 @@ class Assistant(Agent):
         self.knowledge_base = {}
         self.qa_pairs = []
         self.video_timeline = {}
+        self.prompt_context = None  # Precompiled static context JSON
+        self.context_window = None  # Timestamp-windowed context for long scripts
+        self.retrieval_index = None  # BM25 index for search_knowledge
         self.engagement_opportunities = []
         self.current_position = 0
         self.user_id = None
@@ -189,11 +222,16 @@ class Assistant(Agent):
             "started_at": None,
             "message": None,
             "was_interrupted": False,
-            "log_id": None,
         }
         self.current_timestamp_seconds = 0
         self.current_timestamp = "00:00:00"
         self.triggered_opportunities = set()
+        # Opportunities sorted by start second (see _index_engagement_opportunities)
+        self.opportunity_seconds = array("l")
+        self.opportunities_by_time = []
+        self.skipped_opportunities = set()  # Jumped over by a seek, never shown
+        # Video-timestamp packets are coalesced and processed at a fixed cadence
+        self.playback = TimestampCoalescer(self.handle_playback_tick, self.handle_seek)
         self.system_prompt = "Initializing..."
         self.brdge = {}  # Initialize brdge attribute
         self.active_quizzes = (
@@ -205,33 +243,43 @@ class Assistant(Agent):
         self.idle_timeout_seconds = 5 * 60  # 5 minutes
         self.idle_check_task = None
 
-        self.initialize()
+        # Usage and conversation logs, sent in batches (see agent_http.py)
+        self.log_buffer = AgentLogBuffer(
+            f"{self.api_base_url}/brdges/{self.brdge_id}/agent-logs/bulk"
+        )
+
+        self.initialize(bootstrap)
 
         super().__init__(instructions=self.system_prompt)
 
-    def initialize(self):
+    def initialize(self, bootstrap=None):
+        """
+        Load the agent config and build the system prompt. With a bootstrap
+        result (see bootstrap_agent) nothing is fetched here; otherwise the
+        config is fetched synchronously.
+        """
         if not self.brdge_id or not self.api_base_url:
             logger.error("Missing brdge_id or API_BASE_URL")
             return False
 
         try:
-            # Check if we have a personalization ID to include
-            url = f"{self.api_base_url}/brdges/{self.brdge_id}/agent-config"
-            if hasattr(self, "personalization_id") and self.personalization_id:
-                url += f"?personalization_id={self.personalization_id}"
-                logger.info(
-                    f"🎯 Agent: Using personalization ID {self.personalization_id} in agent-config request"
-                )
+            if bootstrap is not None:
+                config_data = bootstrap.get("config")
+                if config_data is None:
+                    raise RuntimeError("agent-config was not fetched during bootstrap")
             else:
-                logger.info(
-                    "⚠️ Agent: No personalization ID available for agent-config request"
+                url = agent_config_url(
+                    self.api_base_url, self.brdge_id, self.personalization_id
+                )
+                logger.info(f"🌐 Agent: Fetching config from: {url}")
+                response = requests.get(url, timeout=AGENT_BOOTSTRAP_TIMEOUT)
+                response.raise_for_status()
+                config_data = response.json()
+            # The f-string would serialize the whole knowledge base even with debug off
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"Fetched agent-config: {json.dumps(config_data, indent=2)}"
                 )
-
-            logger.info(f"🌐 Agent: Fetching config from: {url}")
-            response = requests.get(url)
-            response.raise_for_status()
-            config_data = response.json()
-            logger.debug(f"Fetched agent-config: {json.dumps(config_data, indent=2)}")
 
             # Log personalization data if present
             if config_data.get("personalization_data"):
@@ -255,6 +303,38 @@ class Assistant(Agent):
             self.engagement_opportunities = config_data.get(
                 "engagement_opportunities", []
             )
+            self._index_engagement_opportunities()
+            # Static part of the prompt context, minified by the backend
+            self.prompt_context = config_data.get("prompt_context")
+            if bootstrap is not None and bootstrap.get("retrieval_index"):
+                self.retrieval_index = RetrievalIndex.from_dict(
+                    bootstrap["retrieval_index"]
+                )
+                logger.info(
+                    f"🔎 Agent: Loaded retrieval index with {len(self.retrieval_index)} documents"
+                )
+            # Long scripts come with a windowed index built by the backend;
+            # short ones only with prompt_context, which is used whole
+            windowed_context = config_data.get("windowed_context")
+            if PROMPT_CONTEXT_TOKEN_BUDGET > 0:
+                # With RETRIEVAL_ONLY_KNOWLEDGE, knowledge comes from search_knowledge
+                retrieval_only = (
+                    self.retrieval_index is not None and RETRIEVAL_ONLY_KNOWLEDGE
+                )
+                if retrieval_only or not (windowed_context or self.prompt_context):
+                    # Without knowledge there is little to encode; otherwise
+                    # the backend has no precompiled context
+                    self.context_window = WindowedPromptContext(
+                        self.teaching_persona,
+                        self.agent_personality,
+                        {} if retrieval_only else self.knowledge_base,
+                        [] if retrieval_only else self.qa_pairs,
+                        self.video_timeline,
+                    )
+                elif windowed_context:
+                    self.context_window = WindowedPromptContext.from_dict(
+                        json.loads(windowed_context)
+                    )
             logger.info(
                 f"Retrieved {len(self.engagement_opportunities)} engagement opportunities"
             )
@@ -273,7 +353,10 @@ class Assistant(Agent):
                 "resume_analysis_id"
             ):
                 resume_analysis_id = self.personalization_data.get("resume_analysis_id")
-                self._fetch_resume_analysis(resume_analysis_id)
+                if bootstrap is not None:
+                    self.resume_analysis_data = bootstrap.get("resume_analysis")
+                else:
+                    self._fetch_resume_analysis(resume_analysis_id)
 
             default_voice = "95f07ec4-376e-40bc-a9f6-074beefb2f15"
             self.voice_id = self.brdge.get("voice_id", default_voice)
@@ -308,7 +391,8 @@ class Assistant(Agent):
                 f"🔍 Agent: Fetching resume analysis data for ID {resume_analysis_id}"
             )
             response = requests.get(
-                f"{self.api_base_url}/resume-analysis/{resume_analysis_id}"
+                f"{self.api_base_url}/resume-analysis/{resume_analysis_id}",
+                timeout=AGENT_BOOTSTRAP_TIMEOUT,
             )
 
             if response.ok:
@@ -533,37 +617,70 @@ PERSONALIZATION INSTRUCTIONS:
                     f"No additional_instructions found for brdge {self.brdge_id}."
                 )
 
-            context_data = {
-                "bridge_type": self.bridge_type,
-                "current_timestamp": self.current_timestamp,
-                "teaching_persona": (
-                    self.teaching_persona if hasattr(self, "teaching_persona") else {}
-                ),
-                "agent_personality": (
-                    self.agent_personality if hasattr(self, "agent_personality") else {}
-                ),
-                "knowledge_base": (
-                    self.knowledge_base if hasattr(self, "knowledge_base") else {}
-                ),
-                "qa_pairs": self.qa_pairs if hasattr(self, "qa_pairs") else [],
-                "video_timeline": (
-                    self.video_timeline if hasattr(self, "video_timeline") else {}
-                ),
-                "specific_goal_or_cta": additional_instructions,  # Use fetched additional_instructions
-            }
-
-            # Add personalization data to context if available
+            # Clean personalization (without metadata) for the context JSON
+            clean_personalization = None
             if hasattr(self, "personalization_data") and self.personalization_data:
-                # Remove metadata before including in context
                 clean_personalization = {
                     k: v
                     for k, v in self.personalization_data.items()
                     if k != "_metadata"
                 }
-                context_data["viewer_personalization"] = clean_personalization
 
-            formatted_json = json.dumps(context_data, indent=2)
+            if self.context_window:
+                formatted_json = self.context_window.render(
+                    self.current_timestamp_seconds,
+                    self.bridge_type,
+                    self.current_timestamp,
+                    additional_instructions,
+                    clean_personalization,
+                )
+                logger.info(
+                    f"🪟 Agent: Prompt context around {self.current_timestamp}: "
+                    f"{self.context_window.stats()}"
+                )
+            elif self.prompt_context:
+                # Only the per-session fields are encoded here
+                formatted_json = render_prompt_context(
+                    self.prompt_context,
+                    self.bridge_type,
+                    self.current_timestamp,
+                    additional_instructions,
+                    clean_personalization,
+                )
+            else:
+                # Backend without precompiled context
+                context_data = {
+                    "bridge_type": self.bridge_type,
+                    "current_timestamp": self.current_timestamp,
+                    "teaching_persona": (
+                        self.teaching_persona
+                        if hasattr(self, "teaching_persona")
+                        else {}
+                    ),
+                    "agent_personality": (
+                        self.agent_personality
+                        if hasattr(self, "agent_personality")
+                        else {}
+                    ),
+                    "knowledge_base": (
+                        self.knowledge_base if hasattr(self, "knowledge_base") else {}
+                    ),
+                    "qa_pairs": self.qa_pairs if hasattr(self, "qa_pairs") else [],
+                    "video_timeline": (
+                        self.video_timeline if hasattr(self, "video_timeline") else {}
+                    ),
+                    "specific_goal_or_cta": additional_instructions,  # Use fetched additional_instructions
+                }
+
+                # Add personalization data to context if available
+                if clean_personalization:
+                    context_data["viewer_personalization"] = clean_personalization
+
+                formatted_json = json.dumps(context_data, indent=2)
+
             final_prompt = f"{base_instructions}\\n{SYSTEM_PROMPT_SUFFIX.format(json_context=formatted_json)}"
+            if self.retrieval_index is not None:
+                final_prompt += RETRIEVAL_PROMPT
 
             logger.info(f"Generated system prompt for bridge_type '{self.bridge_type}'")
             # logger.debug(f"System Prompt: {final_prompt}")
@@ -678,6 +795,24 @@ PERSONALIZATION INSTRUCTIONS:
             {"status": "success", "message": f"Link popup command sent for URL: {url}"}
         )
 
+    @function_tool()
+    async def search_knowledge(self, context: RunContext, query: str):
+        """Call this tool to look up information from this presentation: its transcript, key facts, concepts, examples and common questions with their answers.
+        Use it when the user asks about something your current context does not cover, such as another part of the presentation or a specific detail.
+
+        Args:
+            query: A few keywords describing what to look up (e.g., "pricing tiers" or "gradient descent definition").
+        """
+        if self.retrieval_index is None:
+            return "Search is not available; answer from your current context."
+        start = time.perf_counter()
+        results = self.retrieval_index.search(query)
+        logger.info(
+            f"🔎 Agent: search_knowledge({query!r}) returned {len(results)} results "
+            f"in {(time.perf_counter() - start) * 1000:.2f}ms"
+        )
+        return format_results(results)
+
     async def send_link_popup_command(self, url: str, message: str = None):
         """Sends an RPC command to the frontend to display a link popup."""
         if not self.room or not self.room.local_participant:
@@ -717,41 +852,91 @@ PERSONALIZATION INSTRUCTIONS:
                     f"triggerLinkPopup RPC response from {remote_participants[i].identity}: {result}"
                 )
 
-    async def check_engagement_opportunities(self, current_time_seconds):
-        """Check if there are any engagement opportunities near the current timestamp"""
-        if (
-            not hasattr(self, "engagement_opportunities")
-            or not self.engagement_opportunities
-        ):
-            # logger.info("No engagement opportunities available to check")
-            return False
-
-        threshold = 1.0  # 1 second proximity
-
+    def _index_engagement_opportunities(self):
+        """Parse opportunity timestamps once into a sorted array for bisect lookups"""
+        indexed = []
         for opportunity in self.engagement_opportunities:
             try:
-                opp_timestamp_str = opportunity.get("timestamp", "00:00:00")
-                h, m, s = map(int, opp_timestamp_str.split(":"))
-                opp_time_seconds = h * 3600 + m * 60 + s
-
-                if abs(current_time_seconds - opp_time_seconds) <= threshold:
-                    opp_id = opportunity.get("id")
-                    if opp_id in self.triggered_opportunities:
-                        # logger.info(f"Opportunity {opp_id} already triggered, skipping")
-                        continue  # Check next opportunity
-
-                    logger.info(
-                        f"Found engagement opportunity {opp_id} at {opp_timestamp_str}"
-                    )
-                    await self.trigger_engagement_opportunity(opportunity)
-                    self.triggered_opportunities.add(opp_id)
-                    return True  # Triggered one, stop checking for this timestamp
-            except Exception as e:
+                h, m, s = map(int, opportunity.get("timestamp", "00:00:00").split(":"))
+            except (AttributeError, ValueError) as e:
                 logger.error(
-                    f"Error checking opportunity {opportunity.get('id', 'N/A')}: {e}"
+                    f"Skipping opportunity {opportunity.get('id', 'N/A')} with bad timestamp: {e}"
                 )
+                continue
+            indexed.append((h * 3600 + m * 60 + s, opportunity))
+        indexed.sort(key=lambda item: item[0])  # Stable: ties keep list order
+        self.opportunity_seconds = array("l", (seconds for seconds, _ in indexed))
+        self.opportunities_by_time = [opportunity for _, opportunity in indexed]
+
+    def find_engagement_opportunity(self, current_time_seconds):
+        """First untriggered opportunity within the threshold of the timestamp, or None"""
+        seconds = self.opportunity_seconds
+        index = bisect_left(
+            seconds, current_time_seconds - ENGAGEMENT_TRIGGER_THRESHOLD
+        )
+        latest = current_time_seconds + ENGAGEMENT_TRIGGER_THRESHOLD
+        while index < len(seconds) and seconds[index] <= latest:
+            opportunity = self.opportunities_by_time[index]
+            if opportunity.get("id") not in self.triggered_opportunities:
+                return opportunity
+            index += 1
+        return None
 
-        return False
+    async def handle_playback_tick(self, seconds):
+        """Latest player position, at most once per TIMESTAMP_TICK_SECONDS"""
+        hours = int(seconds // 3600)
+        minutes = int((seconds % 3600) // 60)
+        self.current_timestamp_seconds = seconds
+        self.current_timestamp = f"{hours:02d}:{minutes:02d}:{int(seconds % 60):02d}"
+        # Only spawn a task when there is something to trigger
+        if self.find_engagement_opportunity(seconds):
+            asyncio.create_task(self.check_engagement_opportunities(seconds))
+        if self.context_window and self.context_window.needs_refresh(seconds):
+            await self.refresh_instructions()
+
+    async def refresh_instructions(self):
+        """Rebuild the system prompt for the current position and apply it"""
+        self.system_prompt = self._build_enhanced_system_prompt()
+        await self.update_instructions(self.system_prompt)
+
+    async def handle_seek(self, previous, current):
+        """
+        A forward seek jumps over every opportunity between the two positions.
+        Those are recorded as skipped rather than fired late; they stay
+        untriggered, so seeking back to them still shows them.
+        """
+        if current < previous:
+            logger.info(f"⏪ Seek back from {previous:.1f}s to {current:.1f}s")
+            return
+        seconds = self.opportunity_seconds
+        first = bisect_left(seconds, previous + ENGAGEMENT_TRIGGER_THRESHOLD)
+        last = bisect_left(seconds, current - ENGAGEMENT_TRIGGER_THRESHOLD)
+        skipped = [
+            opportunity.get("id")
+            for opportunity in self.opportunities_by_time[first:last]
+            if opportunity.get("id") not in self.triggered_opportunities
+        ]
+        self.skipped_opportunities.update(skipped)
+        logger.info(
+            f"⏩ Seek from {previous:.1f}s to {current:.1f}s skipped "
+            f"{len(skipped)} engagement opportunities {skipped}"
+        )
+
+    async def check_engagement_opportunities(self, current_time_seconds):
+        """Check if there are any engagement opportunities near the current timestamp"""
+        opportunity = self.find_engagement_opportunity(current_time_seconds)
+        if opportunity is None:
+            return False
+
+        opp_id = opportunity.get("id")
+        logger.info(
+            f"Found engagement opportunity {opp_id} at {opportunity.get('timestamp')}"
+        )
+        # Marked before awaiting so overlapping timestamp ticks can't trigger it twice
+        self.triggered_opportunities.add(opp_id)
+        self.skipped_opportunities.discard(opp_id)
+        await self.trigger_engagement_opportunity(opportunity)
+        return True  # Triggered one, stop checking for this timestamp
 
     async def trigger_engagement_opportunity(self, opportunity):
         """Present an engagement opportunity to the user"""
@@ -1202,151 +1387,93 @@ After responding to the user based on the specific engagement instructions above
 
         # Agent now waits for user input...
 
+    def _viewer_ids(self):
+        """(viewer_user_id, anonymous_id) for log rows, from self.user_id"""
+        viewer_user_id = None
+        anonymous_id = None
+        user_id_str = str(self.user_id) if self.user_id is not None else None
+        if user_id_str:
+            if user_id_str.startswith("anon_"):
+                anonymous_id = user_id_str
+            else:
+                try:
+                    viewer_user_id = int(user_id_str)
+                except ValueError:
+                    logger.error(f"Invalid user_id format: {self.user_id}")
+        return viewer_user_id, anonymous_id
+
     async def _finalize_usage_log(self, message_content: str, interrupted: bool):
-        """Helper to update the usage log."""
-        if self.current_speech.get("started_at") and self.current_speech.get("log_id"):
+        """Queue the usage log row for the speech that just ended."""
+        if self.current_speech.get("started_at"):
             ended_at = datetime.utcnow()
             duration_seconds = (
                 ended_at - self.current_speech["started_at"]
             ).total_seconds()
             duration_minutes = duration_seconds / 60.0
-            log_id = self.current_speech["log_id"]
-            try:
-                # CORRECTED: Use await asyncio.to_thread
-                response = await asyncio.to_thread(
-                    requests.put,
-                    f"{self.api_base_url}/brdges/{self.brdge_id}/usage-logs/{log_id}",
-                    json={
-                        "ended_at": ended_at.isoformat(),
-                        "duration_minutes": round(duration_minutes, 2),
-                        "was_interrupted": interrupted,
-                        "agent_message": message_content,
-                    },
-                )
-                response.raise_for_status()
-                logger.info(
-                    f"Updated usage log {log_id} with {'interruption' if interrupted else 'completion'}"
-                )
-            except requests.exceptions.RequestException as e:
-                logger.error(f"HTTP Error updating usage log {log_id}: {e}")
-            except Exception as e:
-                logger.error(f"Error updating usage log {log_id}: {e}")
+            viewer_user_id, anonymous_id = self._viewer_ids()
+            # Written once, complete, by the bulk endpoint
+            self.log_buffer.add_usage(
+                {
+                    "viewer_user_id": viewer_user_id,
+                    "anonymous_id": anonymous_id,
+                    "started_at": self.current_speech["started_at"].isoformat(),
+                    "ended_at": ended_at.isoformat(),
+                    "duration_minutes": round(duration_minutes, 2),
+                    "was_interrupted": interrupted,
+                    "agent_message": message_content,
+                }
+            )
+            logger.info(
+                f"Queued usage log with {'interruption' if interrupted else 'completion'}"
+            )
 
     async def _log_conversation(
         self, message_content: str, role: str, interrupted: bool
     ):
-        """Helper to log conversation turns."""
+        """Queue a conversation turn for the next log flush."""
         duration_seconds = 0
         # Calculate duration only if it's agent speech ending/interrupted
         if role == "agent" and self.current_speech.get("started_at"):
             duration_seconds = (
                 datetime.utcnow() - self.current_speech["started_at"]
             ).total_seconds()
-            logger.info(
-                f"AGENT_LOG: Attempting to log conversation for agent. Message: '{message_content[:50]}...' Log ID: {self.current_speech.get('log_id')}"
-            )  # Added for debugging
-
-        elif role == "user":
-            logger.info(
-                f"USER_LOG: Attempting to log conversation for user. Message: '{message_content[:50]}...'"
-            )
-
-        try:
-            viewer_user_id = None
-            anonymous_id = None
-            user_id_str = str(self.user_id) if self.user_id is not None else None
-            if user_id_str:
-                if user_id_str.startswith("anon_"):
-                    anonymous_id = user_id_str
-                else:
-                    try:
-                        viewer_user_id = int(user_id_str)
-                    except ValueError:
-                        logger.error(f"Invalid user_id format: {self.user_id}")
 
-            duration_minutes = duration_seconds / 60.0
-
-            # Include personalization ID if available
-            conversation_data = {
-                "brdge_id": self.brdge_id,
-                "viewer_user_id": viewer_user_id,
-                "anonymous_id": anonymous_id,
-                "role": role,
-                "message": message_content,
-                "timestamp": datetime.utcnow().isoformat(),
-                "was_interrupted": interrupted,
-                "duration_minutes": round(duration_minutes, 2),
-            }
+        viewer_user_id, anonymous_id = self._viewer_ids()
+        duration_minutes = duration_seconds / 60.0
+
+        # Include personalization ID if available
+        conversation_data = {
+            "viewer_user_id": viewer_user_id,
+            "anonymous_id": anonymous_id,
+            "role": role,
+            "message": message_content,
+            "timestamp": datetime.utcnow().isoformat(),
+            "was_interrupted": interrupted,
+            "duration_minutes": round(duration_minutes, 2),
+        }
 
-            # Add personalization ID if we have it
-            if hasattr(self, "personalization_id") and self.personalization_id:
-                conversation_data["personalization_id"] = self.personalization_id
+        # Add personalization ID if we have it
+        if hasattr(self, "personalization_id") and self.personalization_id:
+            conversation_data["personalization_id"] = self.personalization_id
 
-            # CORRECTED: Use await asyncio.to_thread
-            response = await asyncio.to_thread(
-                requests.post,
-                f"{self.api_base_url}/brdges/{self.brdge_id}/conversation-logs",
-                json=conversation_data,
-            )
-            response.raise_for_status()
-            logger.info(
-                f"Successfully logged conversation for role: {role}. Message: '{message_content[:50]}...'"
-            )  # Confirmation
-        except requests.exceptions.RequestException as e:
-            logger.error(f"HTTP Error creating conversation log for role {role}: {e}")
-        except Exception as e:
-            logger.error(f"Error creating conversation log for role {role}: {e}")
+        self.log_buffer.add_conversation(conversation_data)
+        logger.info(
+            f"Queued conversation log for role: {role}. Message: '{message_content[:50]}...'"
+        )
 
     async def handle_agent_speech_started(self):
+        # The usage log row is written when the speech ends
         self.current_speech = {
             "started_at": datetime.utcnow(),
             "message": None,
             "was_interrupted": False,
-            "log_id": None,
         }
-        try:
-            viewer_user_id = None
-            anonymous_id = None
-            user_id_str = str(self.user_id) if self.user_id is not None else None
-            if user_id_str:
-                if user_id_str.startswith("anon_"):
-                    anonymous_id = user_id_str
-                else:
-                    try:
-                        viewer_user_id = int(user_id_str)
-                    except ValueError:
-                        logger.error(f"Invalid user_id format: {self.user_id}")
-
-            if not self.api_base_url or not self.brdge_id:
-                logger.error("API_BASE_URL or brdge_id is not set for usage log")
-                return
-
-            response = await asyncio.to_thread(
-                requests.post,
-                f"{self.api_base_url}/brdges/{self.brdge_id}/usage-logs",
-                json={
-                    "brdge_id": self.brdge_id,
-                    "viewer_user_id": viewer_user_id,
-                    "anonymous_id": anonymous_id,
-                    "started_at": self.current_speech["started_at"].isoformat(),
-                    "was_interrupted": False,
-                },
-            )
-            response.raise_for_status()
-            self.current_speech["log_id"] = response.json().get("id")
-            logger.info(f"Created usage log with ID: {self.current_speech['log_id']}")
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"HTTP Error creating usage log: {e}")
-        except Exception as e:
-            logger.error(f"Error creating usage log: {e}")
 
     def _reset_current_speech(self):
         self.current_speech = {
             "started_at": None,
             "message": None,
             "was_interrupted": False,
-            "log_id": None,
         }
 
     def update_activity_time(self):
@@ -1396,25 +1523,91 @@ After responding to the user based on the specific engagement instructions above
             logger.info(f"Stopped idle monitoring for user {self.user_id}")
 
 
-async def get_model_config(agent, brdge_id):
-    """Fetch model configuration for the given brdge"""
+def agent_config_url(api_base_url, brdge_id, personalization_id=None):
+    url = f"{api_base_url}/brdges/{brdge_id}/agent-config?prompt_context=1"
+    if personalization_id:
+        url += f"&personalization_id={personalization_id}"
+        logger.info(
+            f"🎯 Agent: Using personalization ID {personalization_id} in agent-config request"
+        )
+    else:
+        logger.info(
+            "⚠️ Agent: No personalization ID available for agent-config request"
+        )
+    return url
+
+
+async def _fetch_json(url, timings, name):
+    """GET a JSON document; None on error or timeout. Records the latency in timings"""
+    start = time.perf_counter()
     try:
-        response = await asyncio.to_thread(
-            requests.get, f"{agent.api_base_url}/brdges/{brdge_id}/model-config"
+        # The deadline covers the shared client's retries too
+        return await asyncio.wait_for(
+            get_agent_http().get_json(url), AGENT_BOOTSTRAP_TIMEOUT
         )
-        response.raise_for_status()
-        config = response.json()
-        logger.info(f"Fetched model config: {config}")
-        return config
+    except asyncio.TimeoutError:
+        logger.error(f"⏱️ Agent: {name} timed out after {AGENT_BOOTSTRAP_TIMEOUT}s")
     except Exception as e:
-        logger.error(f"Error fetching model config: {e}")
-        # Return default configuration
-        return {
-            "mode": "standard",
-            "standard_model": "gpt-4.1",
-            "realtime_model": "gemini-2.0-flash-live-001",
-            "voice_id": None,
-        }
+        logger.error(f"❌ Agent: Error fetching {name}: {e}")
+    finally:
+        timings[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return None
+
+
+async def bootstrap_agent(api_base_url, brdge_id, personalization_id=None):
+    """
+    Fetch everything a session needs without blocking the worker's event loop.
+    agent-config, model-config and the retrieval index are fetched
+    concurrently; the resume analysis, which is only known from agent-config,
+    follows if needed.
+    Each request has its own timeout and falls back to defaults on failure.
+    """
+    start = time.perf_counter()
+    timings = {}
+    result = {
+        "config": None,
+        "model_config": None,
+        "resume_analysis": None,
+        "retrieval_index": None,
+    }
+    config, model_config, retrieval_index = await asyncio.gather(
+        _fetch_json(
+            agent_config_url(api_base_url, brdge_id, personalization_id),
+            timings,
+            "agent_config",
+        ),
+        _fetch_json(
+            f"{api_base_url}/brdges/{brdge_id}/model-config", timings, "model_config"
+        ),
+        _fetch_json(
+            f"{api_base_url}/brdges/{brdge_id}/retrieval-index",
+            timings,
+            "retrieval_index",
+        ),
+    )
+    result["config"] = config
+    result["retrieval_index"] = retrieval_index
+
+    personalization = (config or {}).get("personalization_data") or {}
+    resume_analysis_id = personalization.get("resume_analysis_id")
+    if resume_analysis_id:
+        analysis = await _fetch_json(
+            f"{api_base_url}/resume-analysis/{resume_analysis_id}",
+            timings,
+            "resume_analysis",
+        )
+        if analysis:
+            result["resume_analysis"] = analysis.get("analysis_results", {})
+
+    # model-config, else what agent-config carried, else defaults
+    model_config = model_config or (config or {}).get("model_config")
+    result["model_config"] = model_config or dict(DEFAULT_MODEL_CONFIG)
+    logger.info(f"Fetched model config: {result['model_config']}")
+
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    result["timings"] = timings
+    logger.info(f"🚀 Agent: Bootstrap finished in {timings['total_ms']}ms {timings}")
+    return result
 
 
 async def entrypoint(ctx: JobContext):
@@ -1422,6 +1615,8 @@ async def entrypoint(ctx: JobContext):
     await ctx.connect()
 
     participant = await ctx.wait_for_participant()
+    # Time-to-first-audio is measured from the participant joining
+    session_started_at = time.perf_counter()
     logger.info(f"Starting assistant for participant {participant.identity}")
     logger.info(f"Full participant identity: {participant.identity}")
 
@@ -1492,13 +1687,16 @@ async def entrypoint(ctx: JobContext):
     logger.info(
         f"🚀 Agent: Creating Assistant with brdge_id={brdge_id}, personalization_id={personalization_id}"
     )
+    bootstrap = await bootstrap_agent(API_BASE_URL, brdge_id, personalization_id)
     agent = Assistant(
-        brdge_id=brdge_id, room=ctx.room, personalization_id=personalization_id
+        brdge_id=brdge_id,
+        room=ctx.room,
+        personalization_id=personalization_id,
+        bootstrap=bootstrap,
     )
     agent.user_id = user_id
 
-    # Fetch model configuration from agent config
-    model_config = await get_model_config(agent, brdge_id)
+    model_config = bootstrap["model_config"]
     agent.model_config = model_config  # Store in agent for access during execution
 
     # Create appropriate session based on model configuration
@@ -1545,6 +1743,43 @@ async def entrypoint(ctx: JobContext):
             vad=vad,
         )
 
+    first_audio_reported = False
+    prompt_turns = {"turns": 0, "prompt_tokens": 0, "max_prompt_tokens": 0}
+
+    @session.on("metrics_collected")
+    def on_metrics_collected(event):
+        # LLM metrics carry prompt_tokens, realtime model metrics input_tokens
+        metrics = event.metrics
+        prompt_tokens = getattr(metrics, "prompt_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = getattr(metrics, "input_tokens", None)
+        if prompt_tokens is None:
+            return
+        prompt_turns["turns"] += 1
+        prompt_turns["prompt_tokens"] += prompt_tokens
+        prompt_turns["max_prompt_tokens"] = max(
+            prompt_turns["max_prompt_tokens"], prompt_tokens
+        )
+        context_tokens = (
+            agent.context_window.last_tokens if agent.context_window else None
+        )
+        logger.info(
+            f"📏 Agent: Turn {prompt_turns['turns']} prompt {prompt_tokens} tokens "
+            f"(context ~{context_tokens}), ttft {getattr(metrics, 'ttft', -1) * 1000:.0f}ms"
+        )
+
+    @session.on("agent_state_changed")
+    def on_agent_state_changed(event):
+        nonlocal first_audio_reported
+        if first_audio_reported or getattr(event, "new_state", None) != "speaking":
+            return
+        first_audio_reported = True
+        time_to_first_audio = (time.perf_counter() - session_started_at) * 1000
+        logger.info(
+            f"⏱️ Agent: Time to first audio for brdge {brdge_id}: {time_to_first_audio:.0f}ms "
+            f"(bootstrap {bootstrap['timings']['total_ms']}ms, mode {model_config.get('mode', 'standard')})"
+        )
+
     @session.on("speech_created")
     def on_speech_created_sync(
         event: object,
@@ -1605,8 +1840,12 @@ async def entrypoint(ctx: JobContext):
         )
     )
 
-    # Start idle monitoring
+    # Start idle monitoring, periodic log flushing and timestamp processing
     agent.start_idle_monitoring()
+    agent.log_buffer.start()
+    agent.playback.start()
+    loop_lag = EventLoopLagMonitor()
+    loop_lag.start()
 
     # Wait for session to complete
     await session_task
@@ -1643,22 +1882,9 @@ async def entrypoint(ctx: JobContext):
             elif topic == "video-timestamp":
                 message = json.loads(message_str)  # Parse only if this topic
                 if message.get("type") == "timestamp" and "time" in message:
-                    raw_seconds = message["time"]
-                    hours = int(raw_seconds // 3600)
-                    minutes = int((raw_seconds % 3600) // 60)
-                    seconds = int(raw_seconds % 60)
-                    formatted_timestamp = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
                     if agent:
-                        if abs(agent.current_timestamp_seconds - raw_seconds) > 0.1:
-                            agent.current_timestamp_seconds = raw_seconds
-                            agent.current_timestamp = formatted_timestamp
-                            # System prompt is rebuilt dynamically if needed or context is added.
-                            # No direct update here unless specifically required.
-
-                            asyncio.create_task(
-                                agent.check_engagement_opportunities(raw_seconds)
-                            )
+                        # Processed by the session's coalescer task, not per packet
+                        agent.playback.update(message["time"])
 
             elif topic == "quiz_answer":
                 logger.info(f"Received data on 'quiz_answer' topic from {sender}")
@@ -1772,6 +1998,23 @@ async def entrypoint(ctx: JobContext):
         await disconnect_event.wait()
     finally:
         logger.info("Cleaning up agent...")
+        await agent.playback.stop()
+        await loop_lag.stop()
+        logger.info(
+            f"📊 Agent: Video timestamps {agent.playback.stats()}, "
+            f"event loop lag {loop_lag.stats()}"
+        )
+        logger.info(
+            f"📊 Agent: Prompt tokens {prompt_turns}, context "
+            f"{agent.context_window.stats() if agent.context_window else 'full'}"
+        )
+        # A speech cut off by the disconnect still has to be billed
+        if agent.current_speech.get("started_at"):
+            await agent._finalize_usage_log(
+                agent.current_speech.get("message") or "", interrupted=True
+            )
+            agent._reset_current_speech()
+        await agent.log_buffer.close()
 
 
 if __name__ == "__main__":
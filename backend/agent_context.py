@@ -0,0 +1,477 @@
+# agent_context.py
+"""
+Precompiled agent context for a script.
+
+Everything the voice agent needs from a script's knowledge is serialized once,
+when the script is written, instead of on every agent session:
+
+    config - minified JSON object of the script-derived agent-config fields
+             (agentPersonality, teaching_persona, engagement_opportunities,
+             timeline, knowledge_base, qa_pairs, model_config)
+    prompt - minified JSON object of the static part of the system prompt's
+             context block (persona, knowledge base, QA pairs, timeline)
+    windowed - for scripts over PROMPT_CONTEXT_TOKEN_BUDGET only, the item
+             index of a WindowedPromptContext (see to_dict), so sessions
+             window the context without serializing the content again
+
+Per-request and per-session fields (the brdge, viewer personalization, the
+current timestamp) are spliced into these strings without re-encoding them.
+Bump AGENT_CONTEXT_VERSION whenever the artifact layout changes; stored
+artifacts with an older version are rebuilt on their next read.
+
+WindowedPromptContext is what the agent puts in its system prompt for long
+scripts: the whole timeline outline, but only the segments, knowledge and QA
+pairs around the viewer's position, within a token budget. Scripts that fit
+the budget use the prompt string as-is.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+AGENT_CONTEXT_VERSION = 2
+
+# Approximate token budget for the system prompt's context JSON; 0 sends the
+# whole knowledge base, QA pairs and timeline as before
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "8000"))
+# Seconds either side of the current position whose content is included
+PROMPT_CONTEXT_WINDOW_SECONDS = float(os.getenv("PROMPT_CONTEXT_WINDOW_SECONDS", "300"))
+
+# Script content sections the agent context is built from
+AGENT_CONTEXT_SECTIONS = [
+    "agent_personality",
+    "teaching_persona",
+    "engagement_opportunities",
+    "video_timeline",
+    "timeline",
+    "knowledge_base",
+    "qa_pairs",
+    "model_config",
+]
+
+
+def dumps_compact(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def simplify_agent_personality(content: Dict[str, Any]) -> Dict[str, Any]:
+    """Only the three editable agent personality fields, with defaults"""
+    simplified = {
+        "name": "AI Assistant",
+        "persona_background": "A helpful AI assistant",
+        "communication_style": "friendly",
+    }
+    agent_personality = content.get("agent_personality") or {}
+    for field in simplified:
+        if field in agent_personality:
+            simplified[field] = agent_personality[field]
+    return simplified
+
+
+def agent_config_fields(content: Dict[str, Any]) -> Dict[str, Any]:
+    """The agent-config response fields that come from the script content"""
+    fields = {"agentPersonality": simplify_agent_personality(content)}
+    for name in ("teaching_persona", "engagement_opportunities"):
+        if name in content:
+            fields[name] = content[name]
+    # Timeline from video_timeline or timeline
+    if "video_timeline" in content:
+        fields["timeline"] = content["video_timeline"]
+    elif "timeline" in content:
+        fields["timeline"] = content["timeline"]
+    for name in ("knowledge_base", "qa_pairs", "model_config"):
+        if name in content:
+            fields[name] = content[name]
+    return fields
+
+
+def build_agent_context(content: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize the agent config and the static prompt context for a script"""
+    fields = agent_config_fields(content)
+    prompt = {
+        "teaching_persona": fields.get("teaching_persona", {}),
+        "agent_personality": fields["agentPersonality"],
+        "knowledge_base": fields.get("knowledge_base", {}),
+        "qa_pairs": fields.get("qa_pairs", []),
+        "video_timeline": fields.get("timeline", {}),
+    }
+    windowed = None
+    if PROMPT_CONTEXT_TOKEN_BUDGET > 0:
+        window = WindowedPromptContext(
+            prompt["teaching_persona"],
+            prompt["agent_personality"],
+            prompt["knowledge_base"],
+            prompt["qa_pairs"],
+            prompt["video_timeline"],
+        )
+        if window.total_tokens > PROMPT_CONTEXT_TOKEN_BUDGET:
+            windowed = dumps_compact(window.to_dict())
+    return {
+        "version": AGENT_CONTEXT_VERSION,
+        "config": dumps_compact(fields),
+        "prompt": dumps_compact(prompt),
+        "windowed": windowed,
+    }
+
+
+def splice_json_object(
+    head: Dict[str, Any], body: str, tail: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Merge head and tail into an already serialized JSON object, in that
+    order, encoding only the (small) head and tail values
+    """
+    parts = [dumps_compact(head)[1:-1], body.strip()[1:-1]]
+    if tail:
+        parts.append(dumps_compact(tail)[1:-1])
+    return "{" + ",".join(part for part in parts if part) + "}"
+
+
+def render_prompt_context(
+    prompt: str,
+    bridge_type: str,
+    current_timestamp: str,
+    specific_goal_or_cta: str,
+    viewer_personalization: Optional[Dict[str, Any]] = None,
+) -> str:
+    """The system prompt's context JSON with the per-session fields filled in"""
+    tail = {"specific_goal_or_cta": specific_goal_or_cta}
+    if viewer_personalization:
+        tail["viewer_personalization"] = viewer_personalization
+    return splice_json_object(
+        {"bridge_type": bridge_type, "current_timestamp": current_timestamp},
+        prompt,
+        tail,
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for JSON/English)"""
+    return (len(text) + 3) // 4
+
+
+def _timestamp_seconds(timestamp: Any) -> Optional[float]:
+    """Parse "HH:MM:SS" (or "MM:SS"); None if it isn't a timestamp"""
+    if not isinstance(timestamp, str) or ":" not in timestamp:
+        return None
+    try:
+        seconds = 0.0
+        for part in timestamp.strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = max(int(seconds), 0)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+class _ContextItem:
+    """A windowable piece of context, serialized once"""
+
+    __slots__ = ("group", "index", "spans", "text", "tokens")
+
+    def __init__(self, group: str, index: int, text: str, spans: List[Tuple]):
+        self.group = group
+        self.index = index
+        self.spans = spans
+        self.text = text
+        self.tokens = estimate_tokens(self.text) + 1  # With its separator
+
+    def distance(self, seconds: float) -> Optional[float]:
+        """Seconds from the nearest span to seconds; None for untimed items"""
+        if not self.spans:
+            return None
+        return min(
+            max(start - seconds, seconds - end, 0.0) for start, end in self.spans
+        )
+
+
+class WindowedPromptContext:
+    """
+    Builds the system prompt's context JSON for one session. Always included:
+    teaching persona, agent personality and an outline of the video timeline
+    (sections and segment titles with their times). Segments (with their
+    transcripts), knowledge base entries and QA pairs are included only when
+    they fall within window_seconds of the current position (or have no
+    position), nearest first, until token_budget is reached.
+
+    Knowledge and QA entries are placed on the timeline through the
+    section/segment ids in their source locations, or their own timestamps.
+    The selection is recomputed only when the position moves more than half
+    a window from where it was last made (see needs_refresh); included items
+    keep their original order, so the prompt is stable between refreshes.
+    """
+
+    def __init__(
+        self,
+        teaching_persona: Any,
+        agent_personality: Any,
+        knowledge_base: Any,
+        qa_pairs: Any,
+        video_timeline: Any,
+        token_budget: int = PROMPT_CONTEXT_TOKEN_BUDGET,
+        window_seconds: float = PROMPT_CONTEXT_WINDOW_SECONDS,
+    ):
+        self.token_budget = token_budget
+        self.window_seconds = window_seconds
+        self.items: List[_ContextItem] = []
+        self.center: Optional[float] = None
+        self.windowed = False  # Whether content is actually being left out
+        self.refreshes = 0
+        self.last_tokens = 0
+        self.last_included = 0
+        self.window_json = ""
+
+        sections = []
+        if isinstance(video_timeline, dict):
+            sections = video_timeline.get("pedagogical_structure") or []
+        if sections:
+            outline = {
+                key: value
+                for key, value in video_timeline.items()
+                if key != "pedagogical_structure"
+            }
+            outline["pedagogical_structure"] = [
+                self._outline_section(section) for section in sections
+            ]
+        else:
+            # Not a sectioned timeline; nothing to window it by
+            outline = video_timeline or {}
+
+        # Section and segment ids -> (start, end) seconds
+        spans = {}
+        for section in sections:
+            span = self._span(section)
+            if span and section.get("id"):
+                spans[section["id"]] = span
+            for segment in section.get("segments") or []:
+                segment_span = self._span(segment)
+                if segment_span:
+                    if segment.get("id"):
+                        spans[segment["id"]] = segment_span
+                    self.items.append(
+                        _ContextItem(
+                            "current_segments",
+                            len(self.items),
+                            dumps_compact(segment),
+                            [segment_span],
+                        )
+                    )
+
+        # List fields of the knowledge base are windowed, anything else is kept
+        self.knowledge_fixed = {}
+        self.knowledge_groups = []
+        for key, value in (knowledge_base or {}).items():
+            if isinstance(value, list):
+                self.knowledge_groups.append(key)
+                for entry in value:
+                    self.items.append(
+                        _ContextItem(
+                            key,
+                            len(self.items),
+                            dumps_compact(entry),
+                            self._locate(entry, spans),
+                        )
+                    )
+            else:
+                self.knowledge_fixed[key] = value
+        for entry in qa_pairs or []:
+            self.items.append(
+                _ContextItem(
+                    "qa_pairs",
+                    len(self.items),
+                    dumps_compact(entry),
+                    self._locate(entry, spans),
+                )
+            )
+
+        self.static_json = dumps_compact(
+            {
+                "teaching_persona": teaching_persona or {},
+                "agent_personality": agent_personality or {},
+                "video_timeline": outline,
+            }
+        )[1:-1]
+        self._count_tokens()
+
+    def _count_tokens(self):
+        self.static_tokens = estimate_tokens(self.static_json)
+        self.total_tokens = self.static_tokens + sum(item.tokens for item in self.items)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The serialized item index, for from_dict in another process"""
+        return {
+            "static_json": self.static_json,
+            "knowledge_fixed": self.knowledge_fixed,
+            "knowledge_groups": self.knowledge_groups,
+            "items": [[item.group, item.spans, item.text] for item in self.items],
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        token_budget: int = PROMPT_CONTEXT_TOKEN_BUDGET,
+        window_seconds: float = PROMPT_CONTEXT_WINDOW_SECONDS,
+    ) -> "WindowedPromptContext":
+        """A context over an index built by to_dict, without re-serializing any item"""
+        context = cls({}, {}, {}, [], {}, token_budget, window_seconds)
+        context.static_json = data["static_json"]
+        context.knowledge_fixed = data["knowledge_fixed"]
+        context.knowledge_groups = data["knowledge_groups"]
+        context.items = [
+            _ContextItem(group, index, text, spans)
+            for index, (group, spans, text) in enumerate(data["items"])
+        ]
+        context._count_tokens()
+        return context
+
+    @staticmethod
+    def _span(entry: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        start = _timestamp_seconds(entry.get("start_time"))
+        if start is None:
+            return None
+        end = _timestamp_seconds(entry.get("end_time"))
+        return (start, end if end is not None and end >= start else start)
+
+    @staticmethod
+    def _outline_section(section: Dict[str, Any]) -> Dict[str, Any]:
+        outline = {
+            key: section[key]
+            for key in ("id", "title", "start_time", "end_time", "summary")
+            if key in section
+        }
+        outline["segments"] = [
+            {
+                key: segment[key]
+                for key in ("id", "title", "start_time", "end_time")
+                if key in segment
+            }
+            for segment in section.get("segments") or []
+        ]
+        return outline
+
+    @staticmethod
+    def _locate(entry: Any, spans: Dict[str, Tuple]) -> List[Tuple]:
+        """Timeline spans an entry refers to, found anywhere inside it"""
+        found = []
+        stack = [entry]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                for key, child in value.items():
+                    if key == "section_id" and isinstance(child, str):
+                        if child in spans:
+                            found.append(spans[child])
+                    elif key in ("timestamp", "start_time"):
+                        seconds = _timestamp_seconds(child)
+                        if seconds is not None:
+                            found.append((seconds, seconds))
+                    elif isinstance(child, (dict, list)):
+                        stack.append(child)
+            elif isinstance(value, list):
+                stack.extend(value)
+        return found
+
+    def needs_refresh(self, seconds: float) -> bool:
+        if self.center is None:
+            return True
+        return self.windowed and abs(seconds - self.center) > self.window_seconds / 2
+
+    def _select(self, seconds: float, budget: int) -> List[_ContextItem]:
+        ranked = []
+        for item in self.items:
+            distance = item.distance(seconds)
+            if distance is None:
+                # Untimed entries only get what the window leaves over
+                ranked.append((1, 0.0, item.index, item))
+            elif distance <= self.window_seconds:
+                ranked.append((0, distance, item.index, item))
+        ranked.sort(key=lambda entry: entry[:3])
+        chosen = []
+        for _, _, _, item in ranked:
+            # Skip rather than stop, so smaller nearby entries still fit
+            if item.tokens <= budget:
+                chosen.append(item)
+                budget -= item.tokens
+        chosen.sort(key=lambda item: item.index)
+        return chosen
+
+    def _window_json(
+        self, seconds: float, chosen: List[_ContextItem], windowed: bool = True
+    ) -> str:
+        groups: Dict[str, List[str]] = {}
+        for item in chosen:
+            groups.setdefault(item.group, []).append(item.text)
+
+        def array_json(group):
+            return "[" + ",".join(groups.get(group, [])) + "]"
+
+        knowledge = dumps_compact(self.knowledge_fixed)[1:-1]
+        knowledge_parts = [knowledge] if knowledge else []
+        knowledge_parts += [
+            f"{dumps_compact(group)}:{array_json(group)}"
+            for group in self.knowledge_groups
+        ]
+        window = {
+            "start": _format_seconds(seconds - self.window_seconds),
+            "end": _format_seconds(seconds + self.window_seconds),
+        }
+        parts = [f'"context_window":{dumps_compact(window)}'] if windowed else []
+        parts += [
+            f'"current_segments":{array_json("current_segments")}',
+            '"knowledge_base":{' + ",".join(knowledge_parts) + "}",
+            f'"qa_pairs":{array_json("qa_pairs")}',
+        ]
+        return ",".join(parts)
+
+    def _refresh(self, seconds: float, budget: int):
+        budget -= estimate_tokens(self._window_json(seconds, []))
+        if sum(item.tokens for item in self.items) <= budget:
+            # Everything fits; a short script keeps its whole context
+            self.windowed = False
+            chosen = self.items
+        else:
+            self.windowed = any(item.spans for item in self.items)
+            chosen = self._select(seconds, max(budget, 0))
+        self.window_json = self._window_json(seconds, chosen, self.windowed)
+        self.center = seconds
+        self.refreshes += 1
+        self.last_included = len(chosen)
+
+    def render(
+        self,
+        seconds: float,
+        bridge_type: str,
+        current_timestamp: str,
+        specific_goal_or_cta: str,
+        viewer_personalization: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """The context JSON for the current position, refreshing the window if due"""
+        head = dumps_compact(
+            {"bridge_type": bridge_type, "current_timestamp": current_timestamp}
+        )[1:-1]
+        tail = {"specific_goal_or_cta": specific_goal_or_cta}
+        if viewer_personalization:
+            tail["viewer_personalization"] = viewer_personalization
+        tail = dumps_compact(tail)[1:-1]
+        if self.needs_refresh(seconds):
+            budget = self.token_budget - self.static_tokens
+            budget -= estimate_tokens(head) + estimate_tokens(tail)
+            self._refresh(seconds, budget)
+        rendered = (
+            "{" + ",".join([head, self.static_json, self.window_json, tail]) + "}"
+        )
+        self.last_tokens = estimate_tokens(rendered)
+        return rendered
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "context_tokens": self.last_tokens,
+            "full_context_tokens": self.total_tokens,
+            "items": f"{self.last_included}/{len(self.items)}",
+            "refreshes": self.refreshes,
+        }
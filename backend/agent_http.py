@@ -0,0 +1,316 @@
+# agent_http.py
+"""
+Shared async HTTP client for the voice agent's calls to the backend API.
+
+One aiohttp session per worker process (and event loop) keeps connections to
+the backend alive across conversation turns and sessions, instead of a new
+connection and a default-executor thread for every usage/conversation log.
+Concurrency is bounded, every request has a timeout, and connection errors,
+timeouts and gateway errors are retried with jittered backoff (POSTs only when
+they cannot have reached the app, so logs are not written twice).
+
+    http = get_agent_http()
+    config = await http.get_json(f"{API_BASE_URL}/brdges/1/model-config")
+
+Session logging goes through AgentLogBuffer, which batches usage and
+conversation rows into the bulk ingest endpoint instead of a request per row.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import uuid
+from collections import deque
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger("voice-agent")
+
+AGENT_HTTP_MAX_CONNECTIONS = int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "32"))
+AGENT_HTTP_TIMEOUT = float(os.getenv("AGENT_HTTP_TIMEOUT", "10"))
+AGENT_HTTP_MAX_RETRIES = int(os.getenv("AGENT_HTTP_MAX_RETRIES", "2"))
+AGENT_LOG_BATCH_SIZE = int(os.getenv("AGENT_LOG_BATCH_SIZE", "20"))
+AGENT_LOG_FLUSH_SECONDS = float(os.getenv("AGENT_LOG_FLUSH_SECONDS", "10"))
+
+# Statuses worth retrying: the request most likely never reached the app
+RETRYABLE_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+
+class AgentHTTPError(Exception):
+    """A backend call failed after retries; status is None for transport errors"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class AgentHTTPClient:
+    """Pooled keep-alive client with bounded concurrency, timeouts and retries"""
+
+    def __init__(
+        self,
+        max_connections: int = AGENT_HTTP_MAX_CONNECTIONS,
+        timeout: float = AGENT_HTTP_TIMEOUT,
+        max_retries: int = AGENT_HTTP_MAX_RETRIES,
+    ):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        # Sessions are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        return self._session
+
+    async def request(
+        self, method: str, url: str, json: Any = None
+    ) -> Optional[Dict[str, Any]]:
+        """Send a request and return the decoded JSON body (None if not JSON)"""
+        session = self._ensure_session()
+        self.requests += 1
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with session.request(method, url, json=json) as response:
+                        if response.status in RETRYABLE_STATUSES:
+                            raise AgentHTTPError(
+                                f"{method} {url} returned {response.status}",
+                                response.status,
+                            )
+                        if response.status >= 400:
+                            self.failures += 1
+                            body = await response.text()
+                            raise AgentHTTPError(
+                                f"{method} {url} returned {response.status}: {body[:200]}",
+                                response.status,
+                            )
+                        if response.content_type != "application/json":
+                            return None
+                        return await response.json()
+            except (AgentHTTPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, AgentHTTPError) and e.status not in RETRYABLE_STATUSES:
+                    raise
+                if not self._retryable(method, e):
+                    attempt = self.max_retries
+                if attempt >= self.max_retries:
+                    self.failures += 1
+                    if isinstance(e, AgentHTTPError):
+                        raise
+                    raise AgentHTTPError(
+                        f"{method} {url} failed: {type(e).__name__}: {e}"
+                    ) from e
+                attempt += 1
+                self.retries += 1
+                delay = min(0.25 * 2**attempt, 2.0) * random.uniform(0.5, 1.0)
+                logger.warning(
+                    f"🔄 Agent HTTP: {method} {url} failed ({type(e).__name__}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retryable(method: str, error: Exception) -> bool:
+        if method in IDEMPOTENT_METHODS:
+            return True
+        # A POST that timed out or lost its connection mid-request may have been
+        # applied already; only retry when it cannot have reached the app
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return True
+        return isinstance(error, AgentHTTPError) and error.status in {502, 503}
+
+    async def get_json(self, url: str) -> Optional[Dict[str, Any]]:
+        return await self.request("GET", url)
+
+    async def post_json(self, url: str, payload: Any) -> Optional[Dict[str, Any]]:
+        return await self.request("POST", url, json=payload)
+
+    async def put_json(self, url: str, payload: Any) -> Optional[Dict[str, Any]]:
+        return await self.request("PUT", url, json=payload)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "max_connections": self.max_connections,
+        }
+
+
+_agent_http: Optional[AgentHTTPClient] = None
+
+
+def get_agent_http() -> AgentHTTPClient:
+    """The worker process's shared client"""
+    global _agent_http
+    if _agent_http is None:
+        _agent_http = AgentHTTPClient()
+    return _agent_http
+
+
+def _batch_rows(batch: Dict[str, Any]) -> int:
+    return len(batch["usage_logs"]) + len(batch["conversation_logs"])
+
+
+class AgentLogBuffer:
+    """
+    Collects a session's usage and conversation log rows and sends them to
+    the bulk ingest endpoint in batches: when max_events are queued, every
+    flush_interval seconds, and on close (at disconnect).
+
+    Each batch gets a batch_id. A failed batch keeps its id and is resent
+    before any newer rows, so the backend can skip a batch that it stored
+    before a timeout hid its response. Failed batches are only resent by the
+    timer. Rows are kept up to max_pending.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        http: Optional[AgentHTTPClient] = None,
+        max_events: int = AGENT_LOG_BATCH_SIZE,
+        flush_interval: float = AGENT_LOG_FLUSH_SECONDS,
+        max_pending: int = 1000,
+    ):
+        self.url = url
+        self.http = http or get_agent_http()
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.usage_logs = []
+        self.conversation_logs = []
+        # Batches already given an id but not yet acknowledged, oldest first
+        self._batches = deque()
+        self.flushes = 0
+        self.dropped = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def __len__(self):
+        return (
+            len(self.usage_logs)
+            + len(self.conversation_logs)
+            + sum(_batch_rows(batch) for batch in self._batches)
+        )
+
+    def start(self):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    def add_usage(self, entry: Dict[str, Any]):
+        self.usage_logs.append(entry)
+        self._maybe_flush()
+
+    def add_conversation(self, entry: Dict[str, Any]):
+        self.conversation_logs.append(entry)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        # While a flush is running or a failed batch waits, the timer resends
+        if self._tasks or self._batches:
+            return
+        if len(self.usage_logs) + len(self.conversation_logs) >= self.max_events:
+            task = asyncio.create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if self.usage_logs or self.conversation_logs:
+                self._batches.append(
+                    {
+                        "batch_id": uuid.uuid4().hex,
+                        "usage_logs": self.usage_logs,
+                        "conversation_logs": self.conversation_logs,
+                    }
+                )
+                self.usage_logs, self.conversation_logs = [], []
+            while self._batches:
+                batch = self._batches[0]
+                try:
+                    await self.http.post_json(self.url, batch)
+                except AgentHTTPError as e:
+                    if e.status is not None and e.status < 500:
+                        # The backend refused the batch; sending it again won't help
+                        self._batches.popleft()
+                        self.dropped += _batch_rows(batch)
+                        logger.error(f"❌ Agent: Log batch rejected, dropping it: {e}")
+                        continue
+                    logger.error(
+                        f"❌ Agent: Log flush failed, keeping rows for retry: {e}"
+                    )
+                    self._trim()
+                    return
+                self._batches.popleft()
+                self.flushes += 1
+                logger.info(
+                    f"📝 Agent: Flushed {len(batch['usage_logs'])} usage and "
+                    f"{len(batch['conversation_logs'])} conversation logs"
+                )
+
+    def _trim(self):
+        """
+        Drop the oldest rows over max_pending. Conversation rows go first; usage
+        rows drive billing and are only dropped when they alone are over the cap.
+        """
+        overflow = len(self) - self.max_pending
+        dropped = {"conversation_logs": 0, "usage_logs": 0}
+        for key in ("conversation_logs", "usage_logs"):
+            for batch in self._batches:
+                if overflow <= 0:
+                    break
+                count = min(overflow, len(batch[key]))
+                del batch[key][:count]
+                overflow -= count
+                dropped[key] += count
+        # Don't keep resending batches that were trimmed down to nothing
+        while self._batches and not _batch_rows(self._batches[0]):
+            self._batches.popleft()
+        self.dropped += sum(dropped.values())
+        if dropped["conversation_logs"]:
+            logger.warning(
+                f"⚠️ Agent: Dropped {dropped['conversation_logs']} buffered conversation log rows"
+            )
+        if dropped["usage_logs"]:
+            logger.error(
+                f"❌ Agent: Log buffer full, dropped {dropped['usage_logs']} unsent usage log rows"
+            )
+
+    async def close(self):
+        """Stop the timer and send whatever is left"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
@@ -0,0 +1,141 @@
+# agent_timeline.py
+"""
+Video playback tracking for the voice agent.
+
+The player sends "video-timestamp" packets several times a second. Rather
+than a task per packet, each session has a TimestampCoalescer: packets only
+overwrite the latest position, and one long-lived consumer task processes it
+at a fixed cadence, reporting large jumps as seeks. EventLoopLagMonitor
+measures how late the worker's event loop wakes up, the cost of that traffic.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger("voice-agent")
+
+TIMESTAMP_TICK_SECONDS = float(os.getenv("TIMESTAMP_TICK_SECONDS", "0.25"))
+SEEK_THRESHOLD_SECONDS = float(os.getenv("SEEK_THRESHOLD_SECONDS", "5"))
+
+
+class TimestampCoalescer:
+    """
+    Keeps only the latest playback position and hands it to on_tick at most
+    once per interval. A jump of more than seek_threshold (either way) from
+    the last processed position calls on_seek(previous, current) first.
+    """
+
+    def __init__(
+        self,
+        on_tick: Callable[[float], Awaitable[None]],
+        on_seek: Optional[Callable[[float, float], Awaitable[None]]] = None,
+        interval: float = TIMESTAMP_TICK_SECONDS,
+        seek_threshold: float = SEEK_THRESHOLD_SECONDS,
+    ):
+        self.on_tick = on_tick
+        self.on_seek = on_seek
+        self.interval = interval
+        self.seek_threshold = seek_threshold
+        self.latest: Optional[float] = None
+        self.last_processed: Optional[float] = None
+        self.received = 0
+        self.processed = 0
+        self.seeks = 0
+        self._pending = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, seconds: float):
+        """Record a position from a packet; cheap enough to call per packet"""
+        self.latest = seconds
+        self.received += 1
+        self._pending.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            current = self.latest
+            if current == self.last_processed:
+                continue
+            previous = self.last_processed
+            self.last_processed = current
+            self.processed += 1
+            try:
+                if (
+                    previous is not None
+                    and self.on_seek is not None
+                    and abs(current - previous) > self.seek_threshold
+                ):
+                    self.seeks += 1
+                    await self.on_seek(previous, current)
+                await self.on_tick(current)
+            except Exception as e:
+                logger.error(f"Error processing video timestamp {current}: {e}")
+            # Fixed cadence: later packets in this window are coalesced
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "coalesced": self.received - self.processed,
+            "seeks": self.seeks,
+        }
+
+
+class EventLoopLagMonitor:
+    """Samples how late a sleep(interval) wakes up on the running loop"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "mean_lag_ms": (
+                round(self.total_lag / self.samples * 1000, 2) if self.samples else 0.0
+            ),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
@@ -24,8 +24,9 @@ DB_NAME = os.getenv("DB_NAME")
 
 app = Flask(__name__)
 # app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///brdges.db"
+# DATABASE_URL overrides the MySQL settings (e.g. SQLite for local benchmarks)
 app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"mysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+    os.getenv("DATABASE_URL") or f"mysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY")
@@ -71,6 +72,33 @@ def reset_db():
         print("Database reset successfully.")
 
 
+@app.cli.command("compact-script-content")
+def compact_script_content():
+    """Move legacy BrdgeScript.content JSON into compressed sections."""
+    from models import BrdgeScript, ScriptContentSection
+
+    with app.app_context():
+        # Scripts that already have sections were compacted, even if an earlier
+        # run left a JSON null (rather than SQL NULL) in content
+        ids = [
+            script_id
+            for (script_id,) in db.session.query(BrdgeScript.id).filter(
+                BrdgeScript.content.isnot(None),
+                ~db.session.query(ScriptContentSection.id)
+                .filter(ScriptContentSection.script_id == BrdgeScript.id)
+                .exists(),
+            )
+        ]
+        for script_id in ids:
+            script = BrdgeScript.query.get(script_id)
+            if script.content:
+                script.store_content(script.content)
+            else:
+                script.content = None
+            db.session.commit()
+        print(f"Compacted content for {len(ids)} scripts.")
+
+
 # Note: All routes are now defined in routes.py to avoid duplicates
 
 
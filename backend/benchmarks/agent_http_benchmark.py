@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sockets and threads used by the voice agent's backend logging for
+N concurrent sessions, comparing the old asyncio.to_thread(requests.post/put)
+calls with the shared pooled client in agent_http.py.
+
+Each simulated session runs a number of conversation turns; a turn makes the
+same three calls the agent makes (create usage log, log the conversation,
+finalize the usage log). The backend is a stand-in HTTP/1.1 server in a
+separate process that counts accepted connections, so its own threads do
+not show up in the client's numbers.
+
+Usage (from backend/):
+    python benchmarks/agent_http_benchmark.py --sessions 100 --turns 5 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def serve(port, latency, connections, ready):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive
+
+        def setup(self):
+            super().setup()
+            with connections.get_lock():
+                connections.value += 1
+
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            time.sleep(latency)
+            body = json.dumps({"id": 1}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_POST = do_PUT = do_GET = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.request_queue_size = 1024
+    ready.set()
+    server.serve_forever()
+
+
+class ThreadSampler:
+    """Peak thread count of this process while the benchmark runs"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.002):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def to_thread_session(base_url, turns):
+    import requests
+
+    for _ in range(turns):
+        response = await asyncio.to_thread(
+            requests.post, f"{base_url}/brdges/1/usage-logs", json={"brdge_id": 1}
+        )
+        log_id = response.json()["id"]
+        await asyncio.to_thread(
+            requests.post,
+            f"{base_url}/brdges/1/conversation-logs",
+            json={"role": "agent", "message": "Hello"},
+        )
+        await asyncio.to_thread(
+            requests.put,
+            f"{base_url}/brdges/1/usage-logs/{log_id}",
+            json={"was_interrupted": False},
+        )
+
+
+async def pooled_session(http, base_url, turns):
+    for _ in range(turns):
+        log = await http.post_json(f"{base_url}/brdges/1/usage-logs", {"brdge_id": 1})
+        await http.post_json(
+            f"{base_url}/brdges/1/conversation-logs",
+            {"role": "agent", "message": "Hello"},
+        )
+        await http.put_json(
+            f"{base_url}/brdges/1/usage-logs/{log['id']}", {"was_interrupted": False}
+        )
+
+
+async def run(mode, base_url, sessions, turns):
+    from agent_http import AgentHTTPClient
+
+    http = AgentHTTPClient()
+    if mode == "to_thread":
+        jobs = [to_thread_session(base_url, turns) for _ in range(sessions)]
+    else:
+        jobs = [pooled_session(http, base_url, turns) for _ in range(sessions)]
+    await asyncio.gather(*jobs)
+    await http.close()
+
+
+def measure(mode, base_url, connections, sessions, turns):
+    with connections.get_lock():
+        connections.value = 0
+    baseline_threads = threading.active_count()
+    start = time.perf_counter()
+    with ThreadSampler() as sampler:
+        asyncio.run(run(mode, base_url, sessions, turns))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "requests": sessions * turns * 3,
+        "sockets": connections.value,
+        # Minus this process's own threads (main + sampler)
+        "peak_threads": sampler.peak - baseline_threads - 1,
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent HTTP client benchmark")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    connections = multiprocessing.Value("i", 0)
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(args.port, args.latency_ms / 1000, connections, ready),
+        daemon=True,
+    )
+    server.start()
+    ready.wait()
+    base_url = f"http://127.0.0.1:{args.port}/api"
+
+    print(
+        f"🔬 {args.sessions} concurrent sessions x {args.turns} turns, "
+        f"{args.latency_ms:g} ms backend latency"
+    )
+    print(
+        f"\n{'client':<12} {'requests':>9} {'sockets':>8} {'threads':>8} {'seconds':>8}"
+    )
+    for mode in ("to_thread", "pooled"):
+        row = measure(mode, base_url, connections, args.sessions, args.turns)
+        print(
+            f"{row['mode']:<12} {row['requests']:>9} {row['sockets']:>8} "
+            f"{row['peak_threads']:>8} {row['seconds']:>8.2f}"
+        )
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
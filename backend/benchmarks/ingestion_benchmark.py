@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the ingestion pipeline (routes.process_brdge_content ->
+gemini.create_brdge_knowledge) that never calls Gemini, S3 or MySQL.
+
+- Gemini is replaced by fake_genai.FakeGenAI, replaying recorded pass outputs
+  (or synthetic ones sized to the video) with a configurable latency and
+  failure distribution
+- The database is a throwaway SQLite file (DATABASE_URL)
+- S3 is a local directory (LocalS3)
+
+For every (video size, concurrency) cell it runs that many ingestions at once
+and reports end-to-end latency, per-pass Gemini time, DB writes and the peak
+Python heap (tracemalloc).
+
+Usage (from backend/):
+    python benchmarks/ingestion_benchmark.py
+    python benchmarks/ingestion_benchmark.py --video-mb 10,100 --concurrency 1,4,8 \\
+        --latency lognormal:2,0.4 --fault-rate 0.05 --output results.json
+
+--responses takes a JSON file of {pass_name: output}; an extraction cache entry
+(EXTRACTION_CACHE_DIR/<key>.json) works as-is, so a real ingestion can be
+recorded once and replayed here.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Prompt substring that identifies each Gemini pass (first match wins, so the
+# passes whose prompts embed earlier outputs come first)
+PASS_PROMPT_MARKERS = [
+    ("engagement_opportunities", "identify ideal moments for student engagement"),
+    ("teaching_persona", "to extract the persona of"),
+    ("document_knowledge", "structured knowledge that complements the video"),
+    ("knowledge_base", "extract a comprehensive knowledge base"),
+    ("document_timeline", "extract its organizational structure"),
+    ("video_timeline", "pedagogically-aware timeline"),
+]
+
+
+class LocalS3:
+    """The subset of the boto3 S3 client used by routes.py, backed by a directory"""
+
+    def __init__(self, root):
+        self.root = root
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def _path(self, bucket, key):
+        path = os.path.join(self.root, bucket or "bucket", key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None, **kwargs):
+        shutil.copyfile(filename, self._path(bucket, key))
+        with self._lock:
+            self.bytes_written += os.path.getsize(filename)
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, **kwargs):
+        with open(self._path(bucket, key), "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+            size = f.tell()
+        with self._lock:
+            self.bytes_written += size
+
+    def download_file(self, bucket, key, filename, **kwargs):
+        shutil.copyfile(self._path(bucket, key), filename)
+        with self._lock:
+            self.bytes_read += os.path.getsize(filename)
+
+    def put_object(self, Bucket=None, Key=None, Body=b"", **kwargs):
+        data = Body.encode("utf-8") if isinstance(Body, str) else Body
+        with open(self._path(Bucket, Key), "wb") as f:
+            f.write(data)
+        with self._lock:
+            self.bytes_written += len(data)
+        return {}
+
+    def delete_object(self, Bucket=None, Key=None, **kwargs):
+        try:
+            os.remove(self._path(Bucket, Key))
+        except OSError:
+            pass
+        return {}
+
+    def generate_presigned_url(self, operation, Params=None, ExpiresIn=3600, **kwargs):
+        params = Params or {}
+        return f"file://{self._path(params.get('Bucket'), params.get('Key'))}"
+
+
+def parse_latency(spec, seed):
+    """fixed:S | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA -> callable returning seconds"""
+    rng = random.Random(seed)
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def synthetic_pass_outputs(video_mb):
+    """Plausible pass outputs whose size grows with the video (about 1 section per 10 MB)"""
+    section_count = max(3, int(video_mb // 10))
+    sections = []
+    for index in range(section_count):
+        start, end = index * 300, (index + 1) * 300
+        sections.append(
+            {
+                "id": f"section-{index + 1}",
+                "type": "learning_section",
+                "title": f"Section {index + 1}",
+                "start_time": time.strftime("%H:%M:%S", time.gmtime(start)),
+                "end_time": time.strftime("%H:%M:%S", time.gmtime(end - 1)),
+                "teaching_approach": "explanation",
+                "segments": [
+                    {
+                        "id": f"segment-{index + 1}.{part + 1}",
+                        "title": f"Segment {part + 1}",
+                        "start_time": time.strftime(
+                            "%H:%M:%S", time.gmtime(start + part * 100)
+                        ),
+                        "end_time": time.strftime(
+                            "%H:%M:%S", time.gmtime(start + part * 100 + 99)
+                        ),
+                        "transcript": "Lorem ipsum dolor sit amet. " * 40,
+                        "visual_content": {
+                            "type": "Slide",
+                            "description": "A slide with a diagram",
+                            "text_visible": ["Title", "Bullet one", "Bullet two"],
+                        },
+                        "key_points": ["First point", "Second point"],
+                    }
+                    for part in range(3)
+                ],
+                "summary": "A summary of this section. " * 5,
+            }
+        )
+    concepts = [
+        {
+            "id": f"concept-{index + 1}",
+            "name": f"Concept {index + 1}",
+            "definition": "A definition of the concept. " * 4,
+            "timestamps": [sections[index % section_count]["start_time"]],
+        }
+        for index in range(section_count * 2)
+    ]
+    return {
+        "video_timeline": {
+            "video_timeline": {
+                "metadata": {
+                    "title": "Benchmark video",
+                    "total_duration": sections[-1]["end_time"],
+                    "instructor": "Presenter",
+                    "subject_domain": "Benchmarking",
+                },
+                "pedagogical_structure": sections,
+            }
+        },
+        "document_timeline": {"document_timeline": {}},
+        "knowledge_base": {"knowledge_base": {"core_concepts": concepts}},
+        "teaching_persona": {
+            "teaching_persona": {
+                "instructor_profile": {"name": "Presenter"},
+                "communication_style": {"tone": "friendly"},
+            }
+        },
+        "document_knowledge": {"document_knowledge": {}},
+        "engagement_opportunities": {
+            "engagement_opportunities": [
+                {
+                    "id": f"engagement-{index + 1}",
+                    "timestamp": section["start_time"],
+                    "section_id": section["id"],
+                    "engagement_type": "quiz",
+                    "quiz_items": [{"question": "What was covered?"}],
+                }
+                for index, section in enumerate(sections)
+            ]
+        },
+    }
+
+
+def load_recorded_outputs(path):
+    with open(path, "r", encoding="utf-8") as f:
+        recorded = json.load(f)
+    # Extraction cache entries keep the pass outputs under "passes"
+    return recorded.get("passes", recorded)
+
+
+def make_fake_genai(pass_outputs, args, seed):
+    from fake_genai import FakeGenAI
+
+    responses = {
+        marker: pass_outputs[pass_name]
+        for pass_name, marker in PASS_PROMPT_MARKERS
+        if pass_name in pass_outputs
+    }
+    return FakeGenAI(
+        responses=responses,
+        latency=parse_latency(args.latency, seed),
+        fault_rate=args.fault_rate,
+        fault_kinds=args.fault_kinds.split(","),
+        upload_bytes_per_second=args.upload_mbps * 1024 * 1024 / 8,
+        processing_polls=args.processing_polls,
+        seed=seed,
+    )
+
+
+def write_video(path, size_mb):
+    """A unique file of the requested size, so hashes and upload reuse behave as for real uploads"""
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        f.write(uuid.uuid4().bytes)
+        for _ in range(int(size_mb)):
+            f.write(block)
+
+
+class WriteCounter:
+    """Counts INSERT/UPDATE/DELETE rows sent to the database"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(" ", 1)[0].upper()
+        if verb in ("INSERT", "UPDATE", "DELETE"):
+            rows = len(parameters) if executemany and parameters else 1
+            with self._lock:
+                self.count += rows
+
+
+def run_ingestion(app, db, routes, s3, user_id, work_dir, video_mb, result):
+    """One create-brdge flow: S3 upload, background processing, then the final status"""
+    from models import Brdge, BrdgeScript, Recording
+
+    with app.app_context():
+        start = time.time()
+        brdge = Brdge(
+            name=f"bench-{uuid.uuid4().hex[:8]}",
+            user_id=user_id,
+            presentation_filename="",
+            audio_filename="",
+            folder="temp",
+            bridge_type="course",
+        )
+        db.session.add(brdge)
+        db.session.commit()
+        brdge.folder = str(brdge.id)
+        filename = f"{uuid.uuid4()}.mp4"
+        db.session.add(Recording(brdge_id=brdge.id, filename=filename))
+        db.session.commit()
+
+        video_path = os.path.join(work_dir, f"brdge_{brdge.id}_{filename}")
+        write_video(video_path, video_mb)
+        s3_start = time.time()
+        s3.upload_file(
+            video_path, routes.S3_BUCKET, f"{brdge.folder}/recordings/{filename}"
+        )
+        result["s3_seconds"] = time.time() - s3_start
+
+        process_start = time.time()
+        script = routes.process_brdge_content(brdge.id, video_path, None, "course", "")
+        result["process_seconds"] = time.time() - process_start
+        result["end_to_end_seconds"] = time.time() - start
+        script = BrdgeScript.query.get(script.id) if script else None
+        result["script_id"] = script.id if script else None
+        result["status"] = script.status if script else "missing"
+        os.remove(video_path)
+
+
+def run_cell(app, db, routes, s3, writes, user_id, args, video_mb, concurrency, seed):
+    import gemini
+    from fake_genai import patched
+    from models import GeminiCallMetric
+
+    pass_outputs = (
+        load_recorded_outputs(args.responses)
+        if args.responses
+        else synthetic_pass_outputs(video_mb)
+    )
+    fake = make_fake_genai(pass_outputs, args, seed)
+    work_dir = tempfile.mkdtemp(prefix="brdge_bench_")
+    results = [{} for _ in range(concurrency)]
+    writes_before = writes.count
+
+    tracemalloc.start()
+    cell_start = time.time()
+    with patched(gemini, fake):
+        threads = [
+            threading.Thread(
+                target=run_ingestion,
+                args=(app, db, routes, s3, user_id, work_dir, video_mb, results[i]),
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall_time = time.time() - cell_start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    script_ids = [r["script_id"] for r in results if r.get("script_id")]
+    per_pass = {}
+    with app.app_context():
+        for metric in GeminiCallMetric.query.filter(
+            GeminiCallMetric.script_id.in_(script_ids)
+        ).all():
+            per_pass.setdefault(metric.pass_name, []).append(metric.wall_time)
+
+    latencies = sorted(r.get("end_to_end_seconds", 0.0) for r in results)
+    return {
+        "video_mb": video_mb,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall_time, 3),
+        "latency_p50": round(statistics.median(latencies), 3),
+        "latency_max": round(latencies[-1], 3),
+        "s3_seconds_mean": round(
+            statistics.mean(r.get("s3_seconds", 0.0) for r in results), 3
+        ),
+        "per_pass_seconds_mean": {
+            name: round(statistics.mean(times), 3)
+            for name, times in sorted(per_pass.items())
+        },
+        "gemini_calls": fake.calls,
+        "faults_injected": dict(fake.injected),
+        "db_writes": writes.count - writes_before,
+        "db_writes_per_ingestion": round(
+            (writes.count - writes_before) / concurrency, 1
+        ),
+        "peak_python_mb": round(peak_bytes / (1024 * 1024), 2),
+        "failed": sum(1 for r in results if r.get("status") != "completed"),
+    }
+
+
+def print_report(rows):
+    print("\n📊 INGESTION BENCHMARK")
+    header = f"{'video MB':>9} {'conc':>5} {'p50 s':>8} {'max s':>8} {'wall s':>8} {'DB writes/job':>14} {'peak MB':>8} {'failed':>7}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['video_mb']:>9} {row['concurrency']:>5} {row['latency_p50']:>8.2f} "
+            f"{row['latency_max']:>8.2f} {row['wall_seconds']:>8.2f} "
+            f"{row['db_writes_per_ingestion']:>14} {row['peak_python_mb']:>8.2f} {row['failed']:>7}"
+        )
+    print("\n⏱️ Mean Gemini time per pass (s):")
+    for row in rows:
+        passes = ", ".join(
+            f"{name} {seconds:.2f}"
+            for name, seconds in row["per_pass_seconds_mean"].items()
+        )
+        print(f"   {row['video_mb']} MB x{row['concurrency']}: {passes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark process_brdge_content offline with a fake Gemini backend"
+    )
+    parser.add_argument(
+        "--video-mb", default="5,50", help="Comma-separated video sizes"
+    )
+    parser.add_argument(
+        "--concurrency", default="1,4", help="Comma-separated simultaneous ingestions"
+    )
+    parser.add_argument(
+        "--latency",
+        default="lognormal:0.2,0.5",
+        help="Per-call latency: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA",
+    )
+    parser.add_argument(
+        "--fault-rate", type=float, default=0.0, help="Probability a call fails"
+    )
+    parser.add_argument(
+        "--fault-kinds",
+        default="rate_limit,server_error,truncated_json",
+        help="Comma-separated fake_genai fault kinds",
+    )
+    parser.add_argument(
+        "--upload-mbps",
+        type=float,
+        default=0,
+        help="Simulated upload bandwidth (0 = instant)",
+    )
+    parser.add_argument(
+        "--processing-polls",
+        type=int,
+        default=1,
+        help="Polls before an upload is ACTIVE",
+    )
+    parser.add_argument("--responses", help="Recorded pass outputs to replay (JSON)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    bench_dir = tempfile.mkdtemp(prefix="brdge_bench_env_")
+    os.environ["DATABASE_URL"] = (
+        f"sqlite:///{os.path.join(bench_dir, 'bench.db')}?timeout=30"
+    )
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "false"
+    os.environ["GEMINI_FILE_REGISTRY_PATH"] = os.path.join(bench_dir, "files.json")
+    os.environ["ANALYSIS_PROXY_ENABLED"] = "false"
+    os.environ["SEGMENTED_EXTRACTION_MIN_SECONDS"] = "0"
+
+    from app import app, db
+    import routes
+    from models import User
+
+    s3 = LocalS3(os.path.join(bench_dir, "s3"))
+    routes.s3_client = s3
+    with app.app_context():
+        writes = WriteCounter(db.engine)
+        user = User(email=f"bench-{uuid.uuid4().hex[:8]}@example.com")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    rows = []
+    try:
+        for video_mb in [float(v) for v in args.video_mb.split(",")]:
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                print(f"▶️ {video_mb:g} MB x {concurrency} concurrent ingestions")
+                rows.append(
+                    run_cell(
+                        app,
+                        db,
+                        routes,
+                        s3,
+                        writes,
+                        user_id,
+                        args,
+                        video_mb,
+                        concurrency,
+                        args.seed,
+                    )
+                )
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    print_report(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
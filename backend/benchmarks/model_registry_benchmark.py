@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-request cost of getting a Gemini model the old way
+(genai.configure + a new GenerativeModel + timing logs on every request)
+versus the shared registry (configure_genai/get_model after the first call).
+
+Neither path talks to the network; this measures pure client-side setup, the
+overhead the career/funnel endpoints paid before every Gemini call.
+
+Usage (from backend/):
+    python benchmarks/model_registry_benchmark.py --iterations 2000 --threads 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def uncached_request(gemini):
+    """What every request did before the registry"""
+    start_time = time.time()
+    gemini.genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    gemini.print_timing("API Configuration", time.time() - start_time)
+    start_time = time.time()
+    model = gemini.genai.GenerativeModel(
+        gemini.GEMINI_MODEL,
+        generation_config={"response_mime_type": "application/json"},
+    )
+    gemini.print_timing(
+        f"Model Initialization ({gemini.GEMINI_MODEL})", time.time() - start_time
+    )
+    return model
+
+
+def cached_request(gemini):
+    gemini.configure_genai()
+    return gemini.get_model()
+
+
+def measure(func, gemini, iterations, threads):
+    """Per-call latencies in microseconds, with `threads` callers running at once"""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = max(iterations // threads, 1)
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            func(gemini)
+            local.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    # The old path printed two timing lines per request; keep them off the console
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gemini model registry micro-benchmark"
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+    import gemini
+
+    sdk = getattr(gemini.genai, "__version__", "unknown version")
+    print(
+        f"🔬 google.generativeai {sdk}, {args.iterations} requests on {args.threads} thread(s)"
+    )
+
+    # Warm both paths (imports, first registry entry)
+    with contextlib.redirect_stdout(io.StringIO()):
+        uncached_request(gemini)
+        cached_request(gemini)
+
+    results = {
+        "configure + new model per request": measure(
+            uncached_request, gemini, args.iterations, args.threads
+        ),
+        "shared registry": measure(
+            cached_request, gemini, args.iterations, args.threads
+        ),
+    }
+    print(f"\n{'path':<36} {'mean µs':>10} {'p50 µs':>10} {'p99 µs':>10}")
+    for name, latencies in results.items():
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+        print(
+            f"{name:<36} {statistics.mean(latencies):>10.1f} "
+            f"{statistics.median(latencies):>10.1f} {p99:>10.1f}"
+        )
+    old, new = (statistics.mean(v) for v in results.values())
+    print(
+        f"\n⚡ Saved {old - new:.1f} µs per request ({old / max(new, 1e-9):.0f}x faster)"
+    )
+
+
+if __name__ == "__main__":
+    main()
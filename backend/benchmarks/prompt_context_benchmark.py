@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark: size of the system prompt's context JSON for a long course, the old
+way (json.dumps of the whole persona, knowledge base, QA pairs and timeline)
+versus WindowedPromptContext in agent_context.py, over a simulated viewing.
+
+The synthetic course has the shape gemini.py extracts: sections of a few
+segments with transcripts, concepts and facts pointing at sections, and QA
+pairs with timestamps. Tokens are estimated at four characters per token.
+
+Usage (from backend/):
+    python benchmarks/prompt_context_benchmark.py --minutes 120 --budget 8000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from agent_context import WindowedPromptContext, estimate_tokens
+
+
+def timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+# Words the synthetic text is drawn from (retrieval_benchmark.py swaps in a
+# larger, Zipf-distributed vocabulary)
+VOCABULARY = ("data", "model", "learn", "value", "step", "case")
+
+
+def words(rng, count):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(count))
+
+
+def synthetic_course(minutes, rng):
+    sections, concepts, facts, qa_pairs = [], [], [], []
+    for number in range(1, minutes // 5 + 1):
+        start = (number - 1) * 300
+        segments = [
+            {
+                "id": f"segment-{number}.{part}",
+                "title": words(rng, 4),
+                "start_time": timestamp(start + (part - 1) * 100),
+                "end_time": timestamp(start + part * 100),
+                # About 150 spoken words a minute
+                "transcript": words(rng, 250),
+                "key_points": [words(rng, 8) for _ in range(3)],
+            }
+            for part in (1, 2, 3)
+        ]
+        sections.append(
+            {
+                "id": f"section-{number}",
+                "title": words(rng, 4),
+                "start_time": timestamp(start),
+                "end_time": timestamp(start + 300),
+                "summary": words(rng, 40),
+                "segments": segments,
+            }
+        )
+        location = {"type": "video", "section_id": f"section-{number}"}
+        for _ in range(4):
+            concepts.append(
+                {
+                    "id": f"concept-{len(concepts) + 1}",
+                    "name": words(rng, 2),
+                    "definitions": [
+                        {"definition_text": words(rng, 40), "source_location": location}
+                    ],
+                    "examples": [
+                        {"example_text": words(rng, 30), "source_location": location}
+                    ],
+                }
+            )
+            facts.append(
+                {
+                    "fact": words(rng, 20),
+                    "context": words(rng, 15),
+                    "source_location": location,
+                }
+            )
+        for _ in range(3):
+            qa_pairs.append(
+                {
+                    "question": words(rng, 12),
+                    "answer": words(rng, 40),
+                    "timestamp": timestamp(start + rng.randint(0, 299)),
+                }
+            )
+    return {
+        "teaching_persona": {"speech_characteristics": words(rng, 300)},
+        "agent_personality": {"name": "Instructor", "communication_style": "friendly"},
+        "knowledge_base": {"core_concepts": concepts, "key_facts": facts},
+        "qa_pairs": qa_pairs,
+        "video_timeline": {
+            "metadata": {"title": "Course", "total_duration": timestamp(minutes * 60)},
+            "pedagogical_structure": sections,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt context size benchmark")
+    parser.add_argument("--minutes", type=int, default=120)
+    parser.add_argument("--budget", type=int, default=8000)
+    parser.add_argument("--window", type=float, default=300)
+    parser.add_argument("--tick", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    course = synthetic_course(args.minutes, random.Random(args.seed))
+    full = json.dumps(
+        {
+            "bridge_type": "course",
+            "current_timestamp": "00:00:00",
+            **course,
+            "specific_goal_or_cta": "",
+        },
+        indent=2,
+    )
+
+    build_start = time.perf_counter()
+    context = WindowedPromptContext(
+        course["teaching_persona"],
+        course["agent_personality"],
+        course["knowledge_base"],
+        course["qa_pairs"],
+        course["video_timeline"],
+        token_budget=args.budget,
+        window_seconds=args.window,
+    )
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    # Watch the whole course at the agent's tick rate
+    sizes, refresh_ms = [], []
+    seconds = 0.0
+    while seconds < args.minutes * 60:
+        if context.needs_refresh(seconds):
+            start = time.perf_counter()
+            rendered = context.render(seconds, "course", timestamp(seconds), "")
+            refresh_ms.append((time.perf_counter() - start) * 1000)
+            sizes.append(estimate_tokens(rendered))
+        seconds += args.tick
+
+    print(
+        f"🔬 {args.minutes} min course, budget {args.budget} tokens, "
+        f"window ±{args.window:g}s"
+    )
+    print(f"\n{'context':<10} {'tokens':>8} {'refreshes':>10} {'ms/refresh':>11}")
+    print(f"{'full':<10} {estimate_tokens(full):>8} {'-':>10} {'-':>11}")
+    print(
+        f"{'windowed':<10} {max(sizes):>8} {len(sizes):>10} "
+        f"{sum(refresh_ms) / len(refresh_ms):>11.2f}"
+    )
+    print(f"\nIndexing the course: {build_ms:.1f} ms; context stats {context.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the BM25 retrieval index in retrieval.py for a long course. It
+reports index build time, stored size and per-session load time, query
+latency, and the system prompt size with the knowledge base served by the
+search_knowledge tool. That prompt size is compared with the full context
+JSON and with the windowed context from agent_context.py.
+
+The course comes from prompt_context_benchmark.py with a Zipf-distributed
+vocabulary, so postings lists have realistic lengths. Queries are a few words
+sampled from the same vocabulary. Tokens are estimated at four characters per
+token.
+
+Usage (from backend/):
+    python benchmarks/retrieval_benchmark.py --minutes 120 --queries 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import prompt_context_benchmark as course_builder
+from agent_context import WindowedPromptContext, estimate_tokens
+from retrieval import RETRIEVAL_TOP_K, RetrievalIndex, format_results
+
+
+def zipf_vocabulary(rng, size=5000):
+    """Pseudo-words, the i-th repeated in proportion to 1/i"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = []
+    for rank in range(1, size + 1):
+        word = "".join(rng.choice(letters) for _ in range(rng.randint(3, 10)))
+        vocabulary.extend([word] * max(1, 2000 // rank))
+    return vocabulary
+
+
+def context_tokens(course, budget, knowledge=True):
+    context = WindowedPromptContext(
+        course["teaching_persona"],
+        course["agent_personality"],
+        course["knowledge_base"] if knowledge else {},
+        course["qa_pairs"] if knowledge else [],
+        course["video_timeline"],
+        token_budget=budget,
+    )
+    return estimate_tokens(context.render(1800, "course", "00:30:00", ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval index benchmark")
+    parser.add_argument("--minutes", type=int, default=120)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--budget", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    course_builder.VOCABULARY = zipf_vocabulary(rng)
+    course = course_builder.synthetic_course(args.minutes, rng)
+
+    start = time.perf_counter()
+    index = RetrievalIndex.build(course)
+    build_ms = (time.perf_counter() - start) * 1000
+    raw = json.dumps(index.to_dict(), separators=(",", ":")).encode("utf-8")
+    stored = zlib.compress(raw, 6)
+
+    # What an agent session does with the fetched index
+    start = time.perf_counter()
+    loaded = RetrievalIndex.from_dict(json.loads(zlib.decompress(stored)))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    queries = [
+        " ".join(
+            rng.choice(course_builder.VOCABULARY) for _ in range(rng.randint(2, 5))
+        )
+        for _ in range(args.queries)
+    ]
+    latencies, result_tokens = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = loaded.search(query, RETRIEVAL_TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        result_tokens.append(estimate_tokens(format_results(results)))
+    latencies.sort()
+
+    full = json.dumps(
+        {"bridge_type": "course", "current_timestamp": "00:30:00", **course},
+        indent=2,
+    )
+    print(
+        f"🔬 {args.minutes} min course: {len(index)} documents, "
+        f"{len(index.postings)} terms"
+    )
+    print(
+        f"\nIndex build {build_ms:.0f} ms, stored {len(stored) / 1024:.0f} KB "
+        f"({len(raw) / 1024:.0f} KB raw), session load {load_ms:.0f} ms"
+    )
+    print(
+        f"Query latency over {args.queries} queries (top {RETRIEVAL_TOP_K}): "
+        f"mean {statistics.mean(latencies):.3f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)]:.3f} ms, "
+        f"max {latencies[-1]:.3f} ms"
+    )
+    print(f"\n{'system prompt context':<36} {'tokens':>8}")
+    print(f"{'full JSON':<36} {estimate_tokens(full):>8}")
+    print(
+        f"{'windowed, budget ' + str(args.budget):<36} "
+        f"{context_tokens(course, args.budget):>8}"
+    )
+    print(
+        f"{'windowed, knowledge via search':<36} "
+        f"{context_tokens(course, args.budget, knowledge=False):>8}"
+    )
+    print(
+        f"{'  + one search_knowledge result':<36} "
+        f"{round(statistics.mean(result_tokens)):>8}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: storage size and per-request decode time of BrdgeScript
+content as one JSON document versus zlib-compressed per-section rows
+(ScriptContentSection), for the section sets real endpoints read.
+
+Uses the same synthetic knowledge as ingestion_benchmark.py and the same
+encoding as ScriptContentSection.encode, without needing a database.
+
+Usage (from backend/):
+    python benchmarks/script_content_benchmark.py --video-mb 10,100,500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ingestion_benchmark import synthetic_pass_outputs
+
+# Sections each endpoint loads after the change
+ENDPOINT_SECTIONS = {
+    "agent-config": [
+        "agent_personality",
+        "teaching_persona",
+        "engagement_opportunities",
+        "video_timeline",
+        "timeline",
+        "knowledge_base",
+        "qa_pairs",
+        "model_config",
+    ],
+    "agent-config (persona only)": ["teaching_persona", "agent_personality"],
+    "model-config": ["model_config"],
+    "reextract check": ["video_timeline"],
+}
+
+
+def unified_content(video_mb):
+    """Flatten the pass outputs into the unified document stored on a script"""
+    content = {}
+    for output in synthetic_pass_outputs(video_mb).values():
+        content.update(output)
+    content["qa_pairs"] = [
+        {"question": f"Question {index}?", "answer": "An answer. " * 10}
+        for index in range(20)
+    ]
+    content["model_config"] = {"mode": "standard", "standard_model": "gpt-4.1"}
+    return content
+
+
+def encode_section(value):
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return zlib.compress(raw, 6)
+
+
+def time_us(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Script content storage benchmark")
+    parser.add_argument("--video-mb", default="10,100,500")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    for video_mb in [float(v) for v in args.video_mb.split(",")]:
+        content = unified_content(video_mb)
+        # What the JSON column held (default json.dumps separators)
+        legacy = json.dumps(content)
+        sections = {name: encode_section(value) for name, value in content.items()}
+        stored = sum(len(blob) for blob in sections.values())
+
+        print(
+            f"\n📦 {video_mb:g} MB video: legacy row {len(legacy) / 1024:.1f} KB, "
+            f"sections {stored / 1024:.1f} KB total ({len(legacy) / stored:.1f}x smaller)"
+        )
+        legacy_us = time_us(lambda: json.loads(legacy), args.iterations)
+        print(f"   {'read':<30} {'legacy µs':>10} {'sections µs':>12}")
+        for endpoint, names in ENDPOINT_SECTIONS.items():
+            wanted = [sections[name] for name in names if name in sections]
+            sectioned_us = time_us(
+                lambda: [json.loads(zlib.decompress(blob)) for blob in wanted],
+                args.iterations,
+            )
+            print(f"   {endpoint:<30} {legacy_us:>10.0f} {sectioned_us:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-loop lag in one agent worker while many sessions' players
+send "video-timestamp" packets, handled the old way (parse + a new task per
+packet) versus the per-session TimestampCoalescer in agent_timeline.py.
+
+Each session has a sorted opportunity index like the Assistant's, and each
+processed timestamp does the same work the agent does (format the timestamp,
+bisect for a due opportunity).
+
+Usage (from backend/):
+    python benchmarks/timestamp_coalescer_benchmark.py --sessions 200 --hz 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from agent_timeline import EventLoopLagMonitor, TimestampCoalescer
+
+
+class Session:
+    def __init__(self, opportunities, rng):
+        self.seconds = sorted(rng.randint(0, 3600) for _ in range(opportunities))
+        self.current_timestamp = "00:00:00"
+        self.tasks = 0
+
+    async def tick(self, seconds):
+        hours = int(seconds // 3600)
+        minutes = int((seconds % 3600) // 60)
+        self.current_timestamp = f"{hours:02d}:{minutes:02d}:{int(seconds % 60):02d}"
+        index = bisect_left(self.seconds, seconds - 1.0)
+        return index < len(self.seconds) and self.seconds[index] <= seconds + 1.0
+
+
+async def player(session, mode, coalescer, hz, duration, start):
+    position = start
+    packet_interval = 1 / hz
+    # Players join at different moments, as real sessions do
+    await asyncio.sleep(random.uniform(0, packet_interval))
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(packet_interval)
+        position += packet_interval
+        message = json.loads(json.dumps({"type": "timestamp", "time": position}))
+        if mode == "per_packet":
+            session.tasks += 1
+            asyncio.create_task(session.tick(message["time"]))
+        else:
+            coalescer.update(message["time"])
+
+
+async def run(mode, args):
+    rng = random.Random(args.seed)
+    cpu_start = time.process_time()
+    monitor = EventLoopLagMonitor(interval=0.05)
+    monitor.start()
+    sessions, coalescers, players = [], [], []
+    for _ in range(args.sessions):
+        session = Session(args.opportunities, rng)
+        coalescer = TimestampCoalescer(session.tick)
+        if mode == "coalesced":
+            coalescer.start()
+        sessions.append(session)
+        coalescers.append(coalescer)
+        players.append(
+            player(
+                session, mode, coalescer, args.hz, args.seconds, rng.uniform(0, 3000)
+            )
+        )
+    await asyncio.gather(*players)
+    for coalescer in coalescers:
+        await coalescer.stop()
+    await monitor.stop()
+    processed = (
+        sum(session.tasks for session in sessions)
+        if mode == "per_packet"
+        else sum(coalescer.processed for coalescer in coalescers)
+    )
+    return {
+        "mode": mode,
+        "processed": processed,
+        "cpu_seconds": time.process_time() - cpu_start,
+        **monitor.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Video timestamp coalescing benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument(
+        "--hz", type=float, default=10, help="Packets per second per player"
+    )
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--opportunities", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"🔬 {args.sessions} sessions, {args.hz:g} timestamp packets/s each, {args.seconds:g}s"
+    )
+    print(
+        f"\n{'handling':<12} {'processed':>10} {'cpu s':>7} {'mean lag ms':>12} {'max lag ms':>11}"
+    )
+    for mode in ("per_packet", "coalesced"):
+        row = asyncio.run(run(mode, args))
+        print(
+            f"{row['mode']:<12} {row['processed']:>10} {row['cpu_seconds']:>7.2f} "
+            f"{row['mean_lag_ms']:>12.2f} {row['max_lag_ms']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# extraction_cache.py
+"""
+Content-addressed cache for multi-pass knowledge extraction results.
+
+Entries are keyed on the SHA-256 of the video/document bytes plus every input
+that changes what Gemini is asked (bridge type, additional instructions, model
+name and a fingerprint of the extraction prompts). Each entry stores the JSON
+output of every pass along with the unified result, so a re-upload of the same
+recording can skip Gemini entirely.
+
+Entries live on local disk as one JSON file each and are evicted least recently
+used first once the cache grows past its size budget.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "/tmp/brdge_extraction_cache")
+EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "2048"))
+EXTRACTION_CACHE_ENABLED = (
+    os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+)
+
+_HASH_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+
+# (path, size, mtime) -> digest, so the cache and the upload registry can both
+# key on content without reading a large video twice
+_hash_memo: Dict[tuple, str] = {}
+_hash_memo_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """Hash a file in chunks so large videos never sit fully in memory"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    content_hash = digest.hexdigest()
+    with _hash_memo_lock:
+        if len(_hash_memo) > 256:
+            _hash_memo.clear()
+        _hash_memo[memo_key] = content_hash
+    return content_hash
+
+
+def build_cache_key(
+    video_hash: str,
+    document_hash: Optional[str],
+    bridge_type: str,
+    additional_instructions: str,
+    model_name: str,
+    prompt_fingerprint: str,
+    media_variant: Optional[str] = None,
+) -> str:
+    """Combine every extraction input into a single stable key"""
+    key_fields = {
+        "video": video_hash,
+        "document": document_hash,
+        "bridge_type": bridge_type,
+        "additional_instructions": additional_instructions or "",
+        "model": model_name,
+        "prompts": prompt_fingerprint,
+    }
+    # Only present when Gemini saw a derived copy (e.g. an analysis proxy), so
+    # keys for the original media are unchanged
+    if media_variant:
+        key_fields["media_variant"] = media_variant
+    key_material = json.dumps(key_fields, sort_keys=True)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """Disk-backed cache of pass outputs with size-based LRU eviction"""
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else EXTRACTION_CACHE_MAX_MB * 1024 * 1024
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry ({"passes": {...}, "unified": {...}}) or None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Bump mtime so eviction treats this entry as recently used
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable extraction cache entry {key}: {e}")
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, passes: Dict[str, Any], unified: Dict[str, Any]):
+        """Store pass outputs and the unified result, then enforce the size budget"""
+        entry = {"created_at": time.time(), "passes": passes, "unified": unified}
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write extraction cache entry {key}: {e}")
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if self._remove(path):
+                total_bytes -= size
+                with self._lock:
+                    self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus current disk usage"""
+        entry_count = 0
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                entry_count += 1
+                try:
+                    total_bytes += os.path.getsize(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": EXTRACTION_CACHE_ENABLED,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entry_count,
+                "size_bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Process-wide cache instance"""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache()
+        return _extraction_cache
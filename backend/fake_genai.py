@@ -0,0 +1,305 @@
+# fake_genai.py
+"""
+In-process stand-in for google.generativeai, for exercising gemini.py without
+network access or an API key.
+
+Responses are scripted by prompt substring, and every call can be delayed or
+made to fail (rate limits, server errors, timeouts, truncated or non-JSON
+output) either from a fixed sequence or at random:
+
+    import gemini
+    from fake_genai import FakeGenAI, patched
+
+    fake = FakeGenAI(
+        responses={"pedagogically-aware timeline": {"video_timeline": {...}}},
+        faults=["rate_limit", "truncated_json"],
+    )
+    with patched(gemini, fake):
+        gemini.create_brdge_knowledge("lecture.mp4")
+
+Run this file directly for a quick check of the retry, JSON repair and
+circuit breaker behaviour in gemini.call_gemini.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+FAULT_KINDS = (
+    "rate_limit",  # 429, retryable
+    "server_error",  # 500, retryable
+    "unavailable",  # 503, retryable
+    "timeout",  # 504 after waiting out the request timeout, retryable
+    "bad_request",  # 400, not retryable
+    "truncated_json",  # Response body cut off halfway
+    "invalid_json",  # Prose instead of JSON
+)
+
+
+class FakeAPIError(Exception):
+    """Mimics google.api_core exceptions, which carry an HTTP status in .code"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+class _State:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        # Roughly 4 characters per token, like the real tokenizer on English
+        self.usage_metadata = FakeUsage(prompt_tokens, max(len(text) // 4, 1))
+
+
+class FakeStreamResponse(FakeResponse):
+    """Result of generate_content(stream=True); iterating spreads the latency over chunks"""
+
+    def __init__(self, text: str, prompt_tokens: int, latency: float, chunks: int):
+        super().__init__(text, prompt_tokens)
+        self._latency = latency
+        self._chunks = max(chunks, 1)
+
+    def __iter__(self):
+        size = max(-(-len(self.text) // self._chunks), 1)
+        for start in range(0, len(self.text), size):
+            time.sleep(self._latency / self._chunks)
+            yield FakeResponse(self.text[start : start + size], 0)
+
+
+class FakeFile:
+    def __init__(self, name: str, path: str, size: int, processing_polls: int):
+        self.name = name
+        self.display_name = os.path.basename(path)
+        self.uri = f"https://fake-genai.local/{name}"
+        self.mime_type = "video/mp4" if path.endswith(".mp4") else "application/pdf"
+        self.size_bytes = size
+        self.expiration_time = datetime.now(timezone.utc) + timedelta(hours=48)
+        self.state = _State("PROCESSING" if processing_polls > 0 else "ACTIVE")
+        self.polls_remaining = processing_polls
+
+
+class FakeGenAI:
+    """
+    Drop-in for the parts of google.generativeai that gemini.py uses:
+    configure, GenerativeModel(...).generate_content (optionally streamed),
+    upload_file, get_file.
+
+    Args:
+        responses: Prompt substring -> response (dict/list are JSON encoded,
+            callables are called with the prompt text). First match wins.
+        default_response: Used when no substring matches
+        latency: Seconds per generate call, or a callable returning seconds
+        faults: Fault kinds to apply to successive calls, in order
+            (None entries mean a normal call); used before fault_rate
+        fault_rate: Probability that a call gets a random fault from fault_kinds
+        stream_chunks: Chunks a streamed response is split into
+        upload_bytes_per_second: Simulated upload bandwidth
+        processing_polls: get_file calls before an upload becomes ACTIVE
+        seed: Seed for the random latency/fault choices
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, Any]] = None,
+        default_response: Any = None,
+        latency: Union[float, Callable[[], float]] = 0.0,
+        faults: Optional[Iterable[Optional[str]]] = None,
+        fault_rate: float = 0.0,
+        fault_kinds: Iterable[str] = FAULT_KINDS,
+        stream_chunks: int = 8,
+        upload_bytes_per_second: float = 0,
+        processing_polls: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.responses = responses or {}
+        self.default_response = default_response if default_response is not None else {}
+        self.latency = latency
+        self.faults = list(faults or [])
+        self.fault_rate = fault_rate
+        self.fault_kinds = tuple(fault_kinds)
+        self.stream_chunks = stream_chunks
+        self.upload_bytes_per_second = upload_bytes_per_second
+        self.processing_polls = processing_polls
+        self.random = random.Random(seed)
+        self.files: Dict[str, FakeFile] = {}
+        self.calls = 0
+        self.uploads = 0
+        self.injected: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class GenerativeModel:
+            def __init__(
+                self, model_name="gemini-fake", generation_config=None, **kwargs
+            ):
+                self.model_name = f"models/{model_name}"
+                self.generation_config = generation_config
+
+            def generate_content(
+                self, contents, request_options=None, stream=False, **kwargs
+            ):
+                return fake._generate(contents, request_options or {}, stream)
+
+        self.GenerativeModel = GenerativeModel
+
+    def configure(self, **kwargs):
+        pass
+
+    def _next_fault(self) -> Optional[str]:
+        with self._lock:
+            self.calls += 1
+            if self.faults:
+                fault = self.faults.pop(0)
+            elif self.fault_rate and self.random.random() < self.fault_rate:
+                fault = self.random.choice(self.fault_kinds)
+            else:
+                fault = None
+            if fault:
+                self.injected[fault] = self.injected.get(fault, 0) + 1
+            return fault
+
+    def _latency(self) -> float:
+        latency = self.latency() if callable(self.latency) else self.latency
+        return max(latency, 0.0)
+
+    def _render(self, prompt: str) -> str:
+        response = self.default_response
+        for needle, candidate in self.responses.items():
+            if needle in prompt:
+                response = candidate
+                break
+        if callable(response):
+            response = response(prompt)
+        return response if isinstance(response, str) else json.dumps(response)
+
+    def _generate(self, contents, request_options, stream=False) -> FakeResponse:
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        prompt = "\n".join(part for part in parts if isinstance(part, str))
+        fault = self._next_fault()
+        latency = self._latency()
+        timeout = request_options.get("timeout")
+
+        if fault == "timeout" or (timeout and latency > timeout):
+            time.sleep(min(latency, timeout or latency))
+            raise FakeAPIError(504, "Deadline Exceeded")
+        if not stream:
+            time.sleep(latency)
+
+        if fault == "rate_limit":
+            raise FakeAPIError(429, "Resource has been exhausted (e.g. check quota).")
+        if fault == "server_error":
+            raise FakeAPIError(500, "An internal error has occurred.")
+        if fault == "unavailable":
+            raise FakeAPIError(503, "The service is currently unavailable.")
+        if fault == "bad_request":
+            raise FakeAPIError(400, "Request contains an invalid argument.")
+
+        text = self._render(prompt)
+        if fault == "truncated_json":
+            text = text[: max(len(text) // 2, 1)]
+        elif fault == "invalid_json":
+            text = "I'm sorry, I can only describe the video in prose right now."
+        if stream:
+            return FakeStreamResponse(
+                text, max(len(prompt) // 4, 1), latency, self.stream_chunks
+            )
+        return FakeResponse(text, max(len(prompt) // 4, 1))
+
+    def upload_file(self, path: str, **kwargs) -> FakeFile:
+        size = os.path.getsize(path)
+        if self.upload_bytes_per_second:
+            time.sleep(size / self.upload_bytes_per_second)
+        with self._lock:
+            self.uploads += 1
+            name = f"files/fake-{self.uploads}"
+            self.files[name] = FakeFile(name, path, size, self.processing_polls)
+            return self.files[name]
+
+    def get_file(self, name: str) -> FakeFile:
+        with self._lock:
+            remote_file = self.files.get(name)
+            if not remote_file:
+                raise FakeAPIError(404, f"File {name} not found")
+            if remote_file.polls_remaining > 0:
+                remote_file.polls_remaining -= 1
+                if remote_file.polls_remaining == 0:
+                    remote_file.state = _State("ACTIVE")
+            return remote_file
+
+    def delete_file(self, name: str):
+        with self._lock:
+            self.files.pop(name, None)
+
+
+@contextmanager
+def patched(module, fake: FakeGenAI):
+    """Temporarily replace module.genai (e.g. the gemini module) with a fake"""
+    original = module.genai
+    # Cached models belong to whichever genai built them
+    reset = getattr(module, "reset_model_registry", None)
+    module.genai = fake
+    if reset:
+        reset()
+    try:
+        yield fake
+    finally:
+        module.genai = original
+        if reset:
+            reset()
+
+
+if __name__ == "__main__":
+    import gemini
+
+    payload = {"video_timeline": {"pedagogical_structure": [{"id": "section-1"}]}}
+    scenarios = [
+        ("transient errors then success", ["rate_limit", "server_error"]),
+        ("truncated JSON that repair would empty is re-asked", ["truncated_json"]),
+        ("prose is re-asked", ["invalid_json"]),
+        ("bad request is not retried", ["bad_request"]),
+    ]
+    for title, faults in scenarios:
+        fake = FakeGenAI(default_response=payload, faults=faults, seed=0)
+        model = fake.GenerativeModel()
+        gemini.gemini_circuit.record_success()
+        try:
+            response = gemini.call_gemini(
+                model, "prompt", "self_check", expect_json=True, max_retries=3
+            )
+            result = f"ok {response.text[:60]}"
+        except Exception as e:
+            result = f"raised {type(e).__name__}: {e}"
+        last = gemini.RECENT_GEMINI_METRICS[-1]
+        print(
+            f"{title}: {result} | calls={fake.calls} outcome={last['outcome']} retries={last['retries']}"
+        )
+
+    fake = FakeGenAI(
+        default_response=payload, fault_rate=1.0, fault_kinds=["unavailable"]
+    )
+    model = fake.GenerativeModel()
+    for attempt in range(3):
+        try:
+            gemini.call_gemini(model, "prompt", "self_check", max_retries=2)
+        except Exception as e:
+            print(f"degraded call {attempt + 1}: {type(e).__name__}")
+    print(f"circuit state: {gemini.gemini_circuit.state}, provider calls: {fake.calls}")
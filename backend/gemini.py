@@ -1,11 +1,30 @@
 # pip install -q -U google-generativeai
 import google.generativeai as genai
 import os
+import re
 import time
 import json
+import random
+import hashlib
+import inspect
 import logging
+import heapq
+import itertools
+import threading
+import contextvars
+from collections import deque
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable, Set
+
+from extraction_cache import (
+    EXTRACTION_CACHE_ENABLED,
+    build_cache_key,
+    file_sha256,
+    get_extraction_cache,
+)
+from gemini_files import get_file_registry
 
 # Set up logging
 logging.basicConfig(
@@ -15,6 +34,65 @@ logger = logging.getLogger(__name__)
 
 GEMINI_MODEL = "gemini-2.0-flash"
 
+# Upper bound on concurrent Gemini passes for a single ingestion
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "4"))
+
+# Videos at least this long are analysed as overlapping windows (0 disables)
+SEGMENTED_EXTRACTION_MIN_SECONDS = float(
+    os.getenv("SEGMENTED_EXTRACTION_MIN_SECONDS", "2400")
+)
+SEGMENT_WINDOW_SECONDS = float(os.getenv("SEGMENT_WINDOW_SECONDS", "900"))
+SEGMENT_OVERLAP_SECONDS = float(os.getenv("SEGMENT_OVERLAP_SECONDS", "60"))
+
+# Resilience settings shared by every Gemini generate call (see call_gemini)
+GEMINI_CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "600"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_JSON_REASKS = int(os.getenv("GEMINI_JSON_REASKS", "1"))
+# A repair must keep at least this share of the response to be accepted
+GEMINI_JSON_REPAIR_MIN_RATIO = float(os.getenv("GEMINI_JSON_REPAIR_MIN_RATIO", "0.5"))
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv("GEMINI_CIRCUIT_FAILURE_THRESHOLD", "5")
+)
+GEMINI_CIRCUIT_RESET_SECONDS = float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "30"))
+
+# Process-wide request/token budgets shared by every Gemini call (0 disables)
+GEMINI_RPM_LIMIT = float(os.getenv("GEMINI_RPM_LIMIT", "1000"))
+GEMINI_TPM_LIMIT = float(os.getenv("GEMINI_TPM_LIMIT", "4000000"))
+# Share of each budget that background work (ingestion) may not use up
+GEMINI_INTERACTIVE_RESERVE = float(os.getenv("GEMINI_INTERACTIVE_RESERVE", "0.2"))
+# Interactive calls give up after waiting this long for budget
+GEMINI_RATE_LIMIT_MAX_WAIT = float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT", "60"))
+# Input tokens assumed for each uploaded file until the real usage is known
+GEMINI_FILE_TOKEN_ESTIMATE = int(os.getenv("GEMINI_FILE_TOKEN_ESTIMATE", "50000"))
+
+# Stream the timeline/engagement responses so sections are reported as they arrive
+GEMINI_STREAMING_ENABLED = (
+    os.getenv("GEMINI_STREAMING_ENABLED", "false").lower() == "true"
+)
+# How often the extraction DAG hands buffered worker log lines to the callback
+LOG_FLUSH_INTERVAL = 2.0
+
+# Give up waiting for uploaded files to leave PROCESSING after this many seconds
+GEMINI_FILE_PROCESSING_TIMEOUT = float(
+    os.getenv("GEMINI_FILE_PROCESSING_TIMEOUT", "600")
+)
+
+# Bump to invalidate cached extractions when pass behaviour changes outside the prompts
+EXTRACTION_PROMPT_VERSION = "1"
+
+# Passes that send the uploaded video to Gemini; the document passes also need
+# the uploaded document when one is provided
+EXTRACTION_FILE_PASSES = (
+    "video_timeline",
+    "knowledge_base",
+    "teaching_persona",
+    "engagement_opportunities",
+)
+
+# Set on a pass's placeholder output when the pass itself failed; such outputs
+# are never checkpointed or cached (see pass_output_error)
+PASS_ERROR_KEY = "extraction_error"
+
 
 # Add this class near the top of the file
 class LogCollector:
@@ -24,25 +102,45 @@ class LogCollector:
         self.logs = []
         self.last_update = time.time()
         self.progress = 0
+        self.metrics = []  # One record per Gemini call, see record_gemini_metric
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # The callback usually writes to the database, which needs the creating
+        # thread's app context, so worker threads only buffer their lines
+        self._owner_thread = threading.get_ident()
+        self._flushed_count = 0
 
     def add_log(self, message, status="info"):
         # Create a log entry
         log_entry = {"message": message, "status": status, "timestamp": time.time()}
-        self.logs.append(log_entry)
+        with self._lock:
+            self.logs.append(log_entry)
 
         # If callback provided and enough time passed, update the database
-        if self.callback and time.time() - self.last_update > 2:
+        if (
+            self.callback
+            and time.time() - self.last_update > 2
+            and threading.get_ident() == self._owner_thread
+        ):
             self.update_database()
 
     def update_progress(self, progress):
         self.progress = progress
-        if self.callback:
+        if self.callback and threading.get_ident() == self._owner_thread:
             self.update_database()
 
     def update_database(self):
+        """Hand every line logged so far to the callback (coalesced since the last call)"""
         if self.callback:
-            self.callback(self.brdge_id, self.logs, self.progress)
-            self.last_update = time.time()
+            with self._flush_lock:
+                self._flushed_count = len(self.logs)
+                self.callback(self.brdge_id, self.logs, self.progress)
+                self.last_update = time.time()
+
+    def flush_pending(self):
+        """Flush lines buffered by worker threads, if there are any"""
+        if self.callback and len(self.logs) != self._flushed_count:
+            self.update_database()
 
 
 # Helper function to format timing information consistently
@@ -57,34 +155,904 @@ def print_timing(stage_name, duration_seconds, include_emoji=True, log_collector
         log_collector.add_log(message, status="info")
 
 
+# Every Gemini call in this process, most recent last (for quick inspection)
+RECENT_GEMINI_METRICS = deque(maxlen=1000)
+
+# Per-ingestion list that call records are appended to; propagated into worker
+# threads by submitting work through contextvars.copy_context()
+_metrics_sink: contextvars.ContextVar = contextvars.ContextVar(
+    "gemini_metrics_sink", default=None
+)
+
+
+def record_gemini_metric(
+    pass_name: str,
+    wall_time: float,
+    outcome: str = "success",
+    model_name: Optional[str] = None,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    bytes_uploaded: int = 0,
+    retries: int = 0,
+    error: Optional[str] = None,
+    time_to_first_item: Optional[float] = None,
+    queue_wait: float = 0.0,
+) -> Dict[str, Any]:
+    """Store a structured record of one Gemini call (generate or upload)"""
+    record = {
+        "pass_name": pass_name,
+        "model": model_name,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "wall_time": round(wall_time, 4),
+        "bytes_uploaded": bytes_uploaded,
+        "retries": retries,
+        "outcome": outcome,
+        "error": error[:500] if error else None,
+        # Streamed calls only: seconds until the first array element was parsed
+        "time_to_first_item": (
+            round(time_to_first_item, 4) if time_to_first_item is not None else None
+        ),
+        # Seconds spent waiting on the process-wide rate limiter
+        "queue_wait": round(queue_wait, 4),
+        "timestamp": time.time(),
+    }
+    RECENT_GEMINI_METRICS.append(record)
+    sink = _metrics_sink.get()
+    if sink is not None:
+        sink.append(record)
+    return record
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """executor.submit that carries the caller's context (metrics sink) into the worker"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _content_bytes(contents) -> int:
+    """Size of the text parts of a request; uploaded files are counted at upload"""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    return sum(len(part.encode("utf-8")) for part in parts if isinstance(part, str))
+
+
+class GeminiUnavailableError(Exception):
+    """Raised without calling Gemini while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after `failure_threshold` consecutive transient
+    failures. After `reset_timeout` seconds one probe request is let through;
+    success closes the circuit again, failure re-opens it. Callers must call
+    release_probe() once the attempt is over, however it ended, so a probe
+    that neither succeeded nor failed cannot keep the circuit half-open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._probe_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.time() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at < self.reset_timeout:
+                return False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            self._probe_thread = threading.get_ident()
+            return True
+
+    def release_probe(self):
+        """End this thread's probe, if it holds one, without recording a result"""
+        with self._lock:
+            if self._probe_in_flight and self._probe_thread == threading.get_ident():
+                self._probe_in_flight = False
+                self._probe_thread = None
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+            self._probe_thread = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            self._probe_thread = None
+            if (
+                self.opened_at is not None
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.opened_at is None:
+                    logger.error(
+                        f"Gemini circuit opened after {self.consecutive_failures} consecutive failures"
+                    )
+                self.opened_at = time.time()
+
+
+gemini_circuit = CircuitBreaker(
+    GEMINI_CIRCUIT_FAILURE_THRESHOLD, GEMINI_CIRCUIT_RESET_SECONDS
+)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# Priority of calls made in the current context; ingestion switches it to
+# background and it follows the work into pass threads via submit_with_context
+_request_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "gemini_request_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+class TokenBucket:
+    """Refills continuously up to `per_minute`; the level may go negative after a
+    call turns out to cost more than estimated"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` in the bucket"""
+        needed = min(amount + reserve, self.capacity)
+        return max(0.0, (needed - self.level) / self.rate)
+
+
+class GeminiRateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets shared by every Gemini
+    call in the process.
+
+    Callers queue by priority and are served strictly in order, so an
+    interactive request overtakes any queued ingestion work. Background calls
+    also leave `interactive_reserve` of each budget untouched, so a large
+    ingestion burst can't drain it for everyone else.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        interactive_reserve: float = 0.0,
+    ):
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.interactive_reserve = interactive_reserve
+        self._cond = threading.Condition()
+        self._queue = []  # Heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._stats = {
+            name: {
+                "granted": 0,
+                "timeouts": 0,
+                "wait_seconds": 0.0,
+                "max_wait_seconds": 0.0,
+                "max_queue_depth": 0,
+            }
+            for name in PRIORITY_NAMES.values()
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _delay(self, estimated_tokens: float, priority: int) -> float:
+        reserve = self.interactive_reserve if priority != PRIORITY_INTERACTIVE else 0.0
+        delay = 0.0
+        if self.requests:
+            delay = self.requests.delay_for(1, reserve * self.requests.capacity)
+        if self.tokens:
+            delay = max(
+                delay,
+                self.tokens.delay_for(estimated_tokens, reserve * self.tokens.capacity),
+            )
+        return delay
+
+    def _queue_depth(self, priority: int) -> int:
+        return sum(
+            1 for queued_priority, _ in self._queue if queued_priority == priority
+        )
+
+    def acquire(
+        self,
+        estimated_tokens: float,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None,
+    ) -> float:
+        """
+        Block until the call may be sent and take its budget.
+        Returns the seconds spent waiting; raises GeminiUnavailableError after
+        `timeout` seconds.
+        """
+        if not self.enabled:
+            return 0.0
+        stats = self._stats[PRIORITY_NAMES[priority]]
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            stats["max_queue_depth"] = max(
+                stats["max_queue_depth"], self._queue_depth(priority)
+            )
+            # Whoever was first in line may have just been overtaken
+            self._cond.notify_all()
+            try:
+                while True:
+                    now = time.monotonic()
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.refill(now)
+                    delay = None
+                    if self._queue[0] == ticket:
+                        delay = self._delay(estimated_tokens, priority)
+                        if delay <= 0:
+                            if self.requests:
+                                self.requests.level -= 1
+                            if self.tokens:
+                                self.tokens.level -= estimated_tokens
+                            break
+                    if timeout is not None:
+                        remaining = timeout - (now - start)
+                        if remaining <= 0:
+                            stats["timeouts"] += 1
+                            raise GeminiUnavailableError(
+                                f"Gemini rate limit: no budget after waiting {timeout:.0f}s"
+                            )
+                        delay = (
+                            min(delay, remaining) if delay is not None else remaining
+                        )
+                    self._cond.wait(delay)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            stats["granted"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+        return waited
+
+    def refund(self, estimated_tokens: float):
+        """Give back the budget taken by acquire() for a call that was never sent"""
+        if not self.enabled:
+            return
+        with self._cond:
+            if self.requests:
+                self.requests.level += 1
+            if self.tokens:
+                self.tokens.level += estimated_tokens
+            self._cond.notify_all()
+
+    def reconcile(self, estimated_tokens: float, actual_tokens: float):
+        """Charge (or refund) the difference once a call's real usage is known"""
+        if not self.tokens:
+            return
+        with self._cond:
+            self.tokens.level -= actual_tokens - estimated_tokens
+            self._cond.notify_all()
+
+    def penalize(self):
+        """The provider said 429: stop sending until the request budget refills"""
+        if not self.requests:
+            return
+        with self._cond:
+            self.requests.level = min(self.requests.level, 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depths, waits and remaining budget, for the admin metrics endpoint"""
+        with self._cond:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket.refill(now)
+            return {
+                "enabled": self.enabled,
+                "requests_per_minute": (
+                    self.requests.capacity if self.requests else None
+                ),
+                "tokens_per_minute": self.tokens.capacity if self.tokens else None,
+                "requests_available": (
+                    round(self.requests.level, 2) if self.requests else None
+                ),
+                "tokens_available": round(self.tokens.level) if self.tokens else None,
+                "interactive_reserve": self.interactive_reserve,
+                "priorities": {
+                    name: {
+                        **stats,
+                        "queue_depth": self._queue_depth(priority),
+                        "wait_seconds": round(stats["wait_seconds"], 3),
+                        "max_wait_seconds": round(stats["max_wait_seconds"], 3),
+                    }
+                    for priority, name in PRIORITY_NAMES.items()
+                    for stats in (self._stats[name],)
+                },
+            }
+
+
+gemini_rate_limiter = GeminiRateLimiter(
+    GEMINI_RPM_LIMIT, GEMINI_TPM_LIMIT, GEMINI_INTERACTIVE_RESERVE
+)
+
+
+def estimate_request_tokens(contents) -> int:
+    """Rough input token count: ~4 characters per token plus a fixed allowance per file"""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // 4 + 1
+        else:
+            tokens += GEMINI_FILE_TOKEN_ESTIMATE
+    return tokens
+
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+JSON_REASK_PROMPT = (
+    "Your previous response, quoted below, was not valid JSON:\n\n{response}\n\n"
+    "Respond again with ONLY the complete JSON object requested above, with no "
+    "markdown or commentary."
+)
+# How much of the invalid response to quote back when re-asking
+JSON_REASK_EXCERPT_CHARS = 2000
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Rate limits, server errors and timeouts are worth retrying; bad requests aren't"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        # google.api_core exception names when no numeric code is exposed
+        return type(error).__name__ in (
+            "ResourceExhausted",
+            "TooManyRequests",
+            "InternalServerError",
+            "ServiceUnavailable",
+            "DeadlineExceeded",
+            "GatewayTimeout",
+        )
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 20.0) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+def _is_empty_json(value: Any) -> bool:
+    if isinstance(value, dict):
+        return all(_is_empty_json(child) for child in value.values())
+    return value in ([], "", None)
+
+
+def repair_keeps_content(text: str, repaired: str) -> bool:
+    """
+    Whether a repaired response is still the data that was asked for. Cutting
+    truncated output back can leave little or nothing (a cut-off timeline
+    becomes {"video_timeline": {}}); that is a failed response, not data.
+    """
+    if len(repaired) < GEMINI_JSON_REPAIR_MIN_RATIO * len(text.strip()):
+        return False
+    return not _is_empty_json(json.loads(repaired))
+
+
+def strip_trailing_commas(text: str) -> str:
+    """Drop commas that directly precede a closing } or ], leaving string contents alone"""
+    out = []
+    pending_comma = None  # Index in out of a comma that may turn out to be trailing
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            pending_comma = None
+        elif char in "}]":
+            if pending_comma is not None:
+                del out[pending_comma]
+                pending_comma = None
+        elif char == ",":
+            pending_comma = len(out)
+        elif not char.isspace():
+            pending_comma = None
+        out.append(char)
+    return "".join(out)
+
+
+def repair_json_text(text: str) -> Optional[str]:
+    """
+    Best-effort fix for model JSON: strips markdown fences and trailing commas,
+    and closes truncated output by cutting back to the last complete element.
+    Returns valid JSON text, or None if it can't be repaired.
+    """
+    if not text:
+        return None
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    text = strip_trailing_commas(text[min(starts) :].strip())
+
+    candidate = text
+    for _ in range(200):
+        stack = []
+        cut_points = []
+        in_string = False
+        escaped = False
+        for index, char in enumerate(candidate):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                stack.append("}" if char == "{" else "]")
+                cut_points.append(index + 1)
+            elif char in "}]":
+                if stack:
+                    stack.pop()
+                cut_points.append(index + 1)
+            elif char == ",":
+                cut_points.append(index)
+
+        closed = candidate + ('"' if in_string else "")
+        closed = closed.rstrip().rstrip(",:").rstrip()
+        closed += "".join(reversed(stack))
+        try:
+            json.loads(closed)
+            return closed
+        except ValueError:
+            pass
+
+        cut_points = [point for point in cut_points if point < len(candidate)]
+        if not cut_points:
+            return None
+        candidate = candidate[: cut_points[-1]]
+    return None
+
+
+class _RepairedResponse:
+    """A Gemini response whose .text was replaced (repaired JSON, or a joined stream)"""
+
+    def __init__(self, response, text: str):
+        self._response = response
+        self.text = text
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def _response_text(response) -> str:
+    try:
+        return response.text or ""
+    except ValueError:
+        # .text raises when the candidate was blocked or empty
+        return ""
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for streamed JSON: returns each element of one named
+    array (e.g. "pedagogical_structure") as soon as it is complete, however the
+    text is split into chunks. Nested arrays and everything outside the target
+    array are ignored.
+    """
+
+    def __init__(self, array_key: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(array_key))
+        self._buffer = ""
+        self._pos = 0  # Next unscanned character of _buffer
+        self._found = False
+        self._closed = False
+        self._depth = 0  # Nesting depth below the array itself
+        self._item_start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Add streamed text and return the elements completed by it"""
+        if self._closed or not chunk:
+            return []
+        self._buffer += chunk
+        if not self._found:
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return []
+            self._found = True
+            self._buffer = self._buffer[match.end() :]
+            self._pos = 0
+
+        items = []
+        buffer = self._buffer
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of the target array
+                    self._closed = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        items.append(json.loads(buffer[self._item_start : index + 1]))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+
+        # Only the element being built needs to stay in memory
+        if self._item_start is None:
+            self._buffer = ""
+            self._pos = 0
+        else:
+            self._buffer = buffer[self._item_start :]
+            self._pos = len(buffer) - self._item_start
+            self._item_start = 0
+        return items
+
+
+def _generate_streaming(model, request, stream_key, on_item, stream_state, **kwargs):
+    """
+    generate_content(stream=True), handing each completed element of the
+    stream_key array to on_item. Returns a response with the joined text.
+
+    stream_state carries the number of elements already reported across
+    retries, so a retried attempt doesn't report the same elements again.
+    """
+    parser = JSONArrayStreamParser(stream_key)
+    response = model.generate_content(request, stream=True, **kwargs)
+    chunks = []
+    parsed = 0
+    for chunk in response:
+        text = _response_text(chunk)
+        chunks.append(text)
+        for item in parser.feed(text):
+            parsed += 1
+            if parsed <= stream_state["reported"]:
+                continue
+            stream_state["reported"] = parsed
+            if stream_state.get("first_item_at") is None:
+                stream_state["first_item_at"] = time.time()
+            try:
+                on_item(item)
+            except Exception as e:
+                logger.warning(f"Stream item callback failed: {e}")
+    return _RepairedResponse(response, "".join(chunks))
+
+
+# Optional hook run before every generate attempt, e.g. a rate limit shared by
+# several worker processes (see quickstart_extraction.py --input-dir)
+_request_throttle: Optional[Callable[[], None]] = None
+
+
+def set_request_throttle(throttle: Optional[Callable[[], None]]):
+    """Install (or clear, with None) a callable that blocks until a request may be sent"""
+    global _request_throttle
+    _request_throttle = throttle
+
+
+def call_gemini(
+    model,
+    contents,
+    pass_name: str,
+    expect_json: bool = False,
+    timeout: Optional[float] = GEMINI_CALL_TIMEOUT,
+    max_retries: int = GEMINI_MAX_RETRIES,
+    stream_key: Optional[str] = None,
+    on_item: Optional[Callable[[Any], None]] = None,
+    priority: Optional[int] = None,
+    **kwargs,
+):
+    """
+    model.generate_content with the resilience every call site needs:
+
+    - transient errors (429/5xx/timeouts) are retried with jittered backoff
+    - each attempt is bounded by `timeout` seconds
+    - the shared circuit breaker fails fast while Gemini is degraded
+    - every attempt waits for the process-wide rate limiter; `priority`
+      defaults to the context's (background during ingestion, else interactive)
+    - with expect_json, unparseable output is repaired, or re-asked once
+    - with on_item and GEMINI_STREAMING_ENABLED, the response is streamed and
+      on_item gets each element of the `stream_key` array as soon as it parses
+
+    One metrics record is written per call. The final error is re-raised.
+    """
+    model_name = getattr(model, "model_name", None)
+    if timeout and "request_options" not in kwargs:
+        kwargs["request_options"] = {"timeout": timeout}
+    request = contents
+    retries = 0
+    json_reasks = 0
+    outcome = "success"
+    start = time.time()
+    streaming = bool(GEMINI_STREAMING_ENABLED and stream_key and on_item)
+    stream_state = {"reported": 0, "first_item_at": None}
+    if priority is None:
+        priority = _request_priority.get()
+    queue_wait = 0.0
+
+    while True:
+        # Queue for the rate limiter before taking a half-open probe, so a
+        # long wait (or a limiter timeout) never holds the probe
+        estimated_tokens = estimate_request_tokens(request)
+        try:
+            queue_wait += gemini_rate_limiter.acquire(
+                estimated_tokens,
+                priority,
+                timeout=(
+                    GEMINI_RATE_LIMIT_MAX_WAIT
+                    if priority == PRIORITY_INTERACTIVE
+                    else None
+                ),
+            )
+        except GeminiUnavailableError as e:
+            record_gemini_metric(
+                pass_name,
+                time.time() - start,
+                outcome="rate_limited",
+                model_name=model_name,
+                retries=retries,
+                error=str(e),
+                queue_wait=time.time() - start,
+            )
+            raise
+
+        if not gemini_circuit.allow():
+            gemini_rate_limiter.refund(estimated_tokens)
+            record_gemini_metric(
+                pass_name,
+                time.time() - start,
+                outcome="circuit_open",
+                model_name=model_name,
+                retries=retries,
+                queue_wait=queue_wait,
+            )
+            raise GeminiUnavailableError(
+                f"Gemini circuit is open, skipping {pass_name} call"
+            )
+
+        # Whatever happens below (errors that record nothing, a raising
+        # throttle, KeyboardInterrupt), a half-open probe is released
+        try:
+            if _request_throttle:
+                _request_throttle()
+
+            try:
+                if streaming:
+                    response = _generate_streaming(
+                        model, request, stream_key, on_item, stream_state, **kwargs
+                    )
+                else:
+                    response = model.generate_content(request, **kwargs)
+            except Exception as e:
+                retryable = is_retryable_error(e)
+                if retryable:
+                    gemini_circuit.record_failure()
+                else:
+                    # Gemini answered (e.g. a 400 for this request): it is reachable
+                    gemini_circuit.record_success()
+                if getattr(e, "code", None) == 429 or type(e).__name__ in (
+                    "ResourceExhausted",
+                    "TooManyRequests",
+                ):
+                    gemini_rate_limiter.penalize()
+                if retryable and retries < max_retries:
+                    delay = backoff_delay(retries)
+                    retries += 1
+                    logger.warning(
+                        f"Gemini {pass_name} call failed ({e}), retry {retries}/{max_retries} in {delay:.1f}s"
+                    )
+                    time.sleep(delay)
+                    continue
+                record_gemini_metric(
+                    pass_name,
+                    time.time() - start,
+                    outcome="error",
+                    model_name=model_name,
+                    bytes_uploaded=_content_bytes(contents),
+                    retries=retries,
+                    error=str(e),
+                    queue_wait=queue_wait,
+                )
+                raise
+            gemini_circuit.record_success()
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                gemini_rate_limiter.reconcile(
+                    estimated_tokens,
+                    (getattr(usage, "prompt_token_count", 0) or 0)
+                    + (getattr(usage, "candidates_token_count", 0) or 0),
+                )
+
+            if expect_json:
+                text = _response_text(response)
+                try:
+                    json.loads(text)
+                except ValueError:
+                    repaired = repair_json_text(text)
+                    if repaired is not None and not repair_keeps_content(
+                        text, repaired
+                    ):
+                        logger.warning(
+                            f"Repairing JSON from {pass_name} would drop most of it "
+                            f"({len(repaired)} of {len(text)} chars)"
+                        )
+                        repaired = None
+                    if repaired is not None:
+                        logger.warning(f"Repaired malformed JSON from {pass_name}")
+                        response = _RepairedResponse(response, repaired)
+                        outcome = "repaired"
+                    elif json_reasks < GEMINI_JSON_REASKS:
+                        json_reasks += 1
+                        retries += 1
+                        logger.warning(f"Unparseable JSON from {pass_name}, re-asking")
+                        request = (
+                            list(contents)
+                            if isinstance(contents, (list, tuple))
+                            else [contents]
+                        )
+                        excerpt = text[:JSON_REASK_EXCERPT_CHARS]
+                        if len(text) > JSON_REASK_EXCERPT_CHARS:
+                            excerpt += "\n... [truncated]"
+                        request.append(JSON_REASK_PROMPT.format(response=excerpt))
+                        continue
+                    else:
+                        # Leave it to the caller's own parse error handling
+                        outcome = "invalid_json"
+
+            record_gemini_metric(
+                pass_name,
+                time.time() - start,
+                outcome=outcome,
+                model_name=model_name,
+                input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+                output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+                bytes_uploaded=_content_bytes(contents),
+                retries=retries,
+                time_to_first_item=(
+                    stream_state["first_item_at"] - start
+                    if stream_state["first_item_at"]
+                    else None
+                ),
+                queue_wait=queue_wait,
+            )
+            return response
+        finally:
+            gemini_circuit.release_probe()
+
+
+DEFAULT_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Process-wide client state: the API key genai was configured with and one
+# GenerativeModel per (model name, generation_config), shared by all threads
+_configured_api_key = None
+_model_registry: Dict[Tuple[str, str], Any] = {}
+_model_registry_lock = threading.Lock()
+
+
 # Configure Gemini
 def configure_genai():
-    """Configure the Gemini API with credentials"""
-    start_time = time.time()
+    """Configure the Gemini API with credentials (only the first call, or after a key change, does any work)"""
+    global _configured_api_key
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY environment variable not set")
-
-    genai.configure(api_key=api_key)
+    if api_key == _configured_api_key:
+        return
+
+    with _model_registry_lock:
+        if api_key == _configured_api_key:
+            return
+        start_time = time.time()
+        genai.configure(api_key=api_key)
+        # Models built for the previous key hold its client
+        _model_registry.clear()
+        _configured_api_key = api_key
     duration = time.time() - start_time
     print_timing("API Configuration", duration)
     logger.info("Gemini API configured successfully")
 
 
 # Initialize the model - ensure it uses the desired flash model
-def get_model(model_name=GEMINI_MODEL):  # Updated default model name
-    """Get configured Gemini model instance"""
-    start_time = time.time()
-    # Ensure your generation_config is appropriate for all calls, or adjust per call type.
-    # For challenge generation, text/JSON is fine.
-    model = genai.GenerativeModel(
-        model_name, generation_config={"response_mime_type": "application/json"}
+def get_model(model_name=GEMINI_MODEL, generation_config=None):
+    """
+    Get the shared Gemini model instance for this name and generation_config
+    (JSON output by default), creating it on first use
+    """
+    # The default config skips serialising the key on the hot path
+    key = (
+        model_name,
+        (
+            json.dumps(generation_config, sort_keys=True, default=str)
+            if generation_config
+            else ""
+        ),
     )
-    duration = time.time() - start_time
-    print_timing(f"Model Initialization ({model_name})", duration)
+    model = _model_registry.get(key)
+    if model is not None:
+        return model
+
+    with _model_registry_lock:
+        model = _model_registry.get(key)
+        if model is None:
+            start_time = time.time()
+            model = genai.GenerativeModel(
+                model_name,
+                generation_config=generation_config or DEFAULT_GENERATION_CONFIG,
+            )
+            _model_registry[key] = model
+            print_timing(
+                f"Model Initialization ({model_name})", time.time() - start_time
+            )
     return model
 
 
+def reset_model_registry():
+    """Forget the configured key and cached models (e.g. after swapping genai in tests)"""
+    global _configured_api_key
+    with _model_registry_lock:
+        _configured_api_key = None
+        _model_registry.clear()
+
+
 #################################################
 # EXTRACTION FUNCTIONS - EACH SPECIALIZED PASS
 #################################################
@@ -107,19 +1075,17 @@ def extract_initial_timelines(
     pass_start_time = time.time()
     print(f"🔍 EXTRACTION PASS 1: Extracting parallel content timelines...")
 
-    # First extract video timeline
-    video_timeline_start = time.time()
-    video_timeline = extract_video_timeline(video_file, model)
-    video_timeline_duration = time.time() - video_timeline_start
-    print_timing("Video Timeline Extraction", video_timeline_duration)
-
-    # Then extract document timeline if available
-    document_timeline = {}
-    if document_file:
-        doc_timeline_start = time.time()
-        document_timeline = extract_document_timeline(document_file, model)
-        doc_timeline_duration = time.time() - doc_timeline_start
-        print_timing("Document Timeline Extraction", doc_timeline_duration)
+    # Run just the two timeline passes of the extraction DAG, side by side
+    timeline_passes = [
+        p
+        for p in build_extraction_passes(
+            video_file, document_file, model, log_collector
+        )
+        if p.name in ("video_timeline", "document_timeline")
+    ]
+    results, _ = run_extraction_dag(timeline_passes, log_collector)
+    video_timeline = results["video_timeline"]
+    document_timeline = results["document_timeline"]
 
     # Combine both timelines into a unified structure
     combined_timelines = {
@@ -141,7 +1107,7 @@ def extract_initial_timelines(
     return combined_timelines
 
 
-def extract_video_timeline(video_file, model) -> Dict[str, Any]:
+def extract_video_timeline(video_file, model, log_collector=None) -> Dict[str, Any]:
     """Extract timeline from video"""
     timeline_start_time = time.time()
 
@@ -269,7 +1235,24 @@ def extract_video_timeline(video_file, model) -> Dict[str, Any]:
         print_timing("Video Timeline - Prompt Creation", prompt_creation_time)
 
         api_call_start = time.time()
-        response = model.generate_content([timeline_prompt, video_file])
+        streamed_sections = []
+
+        def on_section(section):
+            # Only called when streaming is enabled
+            streamed_sections.append(section)
+            log_message = f"📚 Timeline section {len(streamed_sections)} ready: {section.get('title', 'Untitled')} ({section.get('start_time', '?')}-{section.get('end_time', '?')}, t+{time.time() - api_call_start:.1f}s)"
+            print(log_message)
+            if log_collector:
+                log_collector.add_log(log_message, status="info")
+
+        response = call_gemini(
+            model,
+            [timeline_prompt, video_file],
+            "video_timeline",
+            expect_json=True,
+            stream_key="pedagogical_structure",
+            on_item=on_section,
+        )
         api_call_duration = time.time() - api_call_start
         print_timing("Video Timeline - Gemini API Call", api_call_duration)
 
@@ -305,7 +1288,8 @@ def extract_video_timeline(video_file, model) -> Dict[str, Any]:
                     "subject_domain": "Unknown",
                 },
                 "pedagogical_structure": [],
-            }
+            },
+            PASS_ERROR_KEY: str(e),
         }
 
 
@@ -411,7 +1395,12 @@ def extract_document_timeline(document_file, model) -> Dict[str, Any]:
         print_timing("Document Timeline - Prompt Creation", prompt_creation_time)
 
         api_call_start = time.time()
-        response = model.generate_content([document_prompt, document_file])
+        response = call_gemini(
+            model,
+            [document_prompt, document_file],
+            "document_timeline",
+            expect_json=True,
+        )
         api_call_duration = time.time() - api_call_start
         print_timing("Document Timeline - Gemini API Call", api_call_duration)
 
@@ -432,7 +1421,7 @@ def extract_document_timeline(document_file, model) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"Document timeline extraction error: {e}")
         print(f"❌ Document timeline extraction failed: {str(e)}")
-        return {"document_timeline": {}}
+        return {"document_timeline": {}, PASS_ERROR_KEY: str(e)}
 
 
 def extract_knowledge_base(
@@ -597,7 +1586,7 @@ def extract_knowledge_base(
         print_timing("Knowledge Base - Contents Preparation", contents_prep_duration)
 
         api_call_start = time.time()
-        response = model.generate_content(contents)
+        response = call_gemini(model, contents, "knowledge_base", expect_json=True)
         api_call_duration = time.time() - api_call_start
         print_timing("Knowledge Base - Gemini API Call", api_call_duration)
 
@@ -628,7 +1617,8 @@ def extract_knowledge_base(
                 "concept_relationships": [],
                 "key_facts": [],
                 "processes": [],
-            }
+            },
+            PASS_ERROR_KEY: str(e),
         }
 
 
@@ -906,7 +1896,9 @@ def extract_teaching_persona(
         print_timing("Teaching Persona - Prompt Creation", prompt_creation_time)
 
         api_call_start = time.time()
-        response = model.generate_content([persona_prompt, video_file])
+        response = call_gemini(
+            model, [persona_prompt, video_file], "teaching_persona", expect_json=True
+        )
         api_call_duration = time.time() - api_call_start
         print_timing("Teaching Persona - Gemini API Call", api_call_duration)
 
@@ -957,7 +1949,7 @@ def extract_teaching_persona(
     except Exception as e:
         logger.error(f"Teaching persona extraction error: {e}")
         print(f"❌ Teaching persona extraction failed: {str(e)}")
-        return {"teaching_persona": {}}
+        return {"teaching_persona": {}, PASS_ERROR_KEY: str(e)}
 
 
 def extract_document_knowledge(
@@ -1064,7 +2056,12 @@ def extract_document_knowledge(
         print_timing("Document Knowledge - Prompt Creation", prompt_creation_time)
 
         api_call_start = time.time()
-        response = model.generate_content([document_prompt, document_file])
+        response = call_gemini(
+            model,
+            [document_prompt, document_file],
+            "document_knowledge",
+            expect_json=True,
+        )
         api_call_duration = time.time() - api_call_start
         print_timing("Document Knowledge - Gemini API Call", api_call_duration)
 
@@ -1091,7 +2088,7 @@ def extract_document_knowledge(
     except Exception as e:
         logger.error(f"Document knowledge extraction error: {e}")
         print(f"❌ Document knowledge extraction failed: {str(e)}")
-        return {"document_knowledge": {}}
+        return {"document_knowledge": {}, PASS_ERROR_KEY: str(e)}
 
 
 def extract_engagement_opportunities(
@@ -1438,7 +2435,24 @@ def extract_engagement_opportunities(
         print_timing("Engagement Opportunities - Prompt Creation", prompt_creation_time)
 
         api_call_start = time.time()
-        response = model.generate_content([engagement_prompt, video_file])
+        streamed_opportunities = []
+
+        def on_opportunity(opportunity):
+            # Only called when streaming is enabled
+            streamed_opportunities.append(opportunity)
+            log_message = f"💡 Engagement opportunity {len(streamed_opportunities)} ready: {opportunity.get('engagement_type', 'unknown')} at {opportunity.get('timestamp', '?')} (t+{time.time() - api_call_start:.1f}s)"
+            print(log_message)
+            if log_collector:
+                log_collector.add_log(log_message, status="info")
+
+        response = call_gemini(
+            model,
+            [engagement_prompt, video_file],
+            "engagement_opportunities",
+            expect_json=True,
+            stream_key="engagement_opportunities",
+            on_item=on_opportunity,
+        )
         api_call_duration = time.time() - api_call_start
         print_timing("Engagement Opportunities - Gemini API Call", api_call_duration)
 
@@ -1466,106 +2480,1085 @@ def extract_engagement_opportunities(
     except Exception as e:
         logger.error(f"Engagement opportunities extraction error: {e}")
         print(f"❌ Engagement opportunities extraction failed: {str(e)}")
-        return {"engagement_opportunities": []}
+        return {"engagement_opportunities": [], PASS_ERROR_KEY: str(e)}
+
+
+def integrate_knowledge(
+    timeline_data,
+    knowledge_data,
+    persona_data,
+    document_data,
+    engagement_data,
+    model,
+    log_collector=None,
+    bridge_type="course",
+) -> Dict[str, Any]:
+    """
+    FINAL PASS: Minimally combine all extracted components preserving their raw structure
+
+    Args:
+        timeline_data: Video timeline data
+        knowledge_data: Knowledge base data
+        persona_data: Teaching persona data
+        document_data: Document knowledge data
+        engagement_data: Engagement opportunities data
+        model: Configured Gemini model
+
+    Returns:
+        Combined knowledge structure for Brdge AI agent
+    """
+    pass_start_time = time.time()
+    print(f"🔄 FINAL PASS: Combining extraction components...")
+
+    # Define widget mapping based on bridge type
+    WIDGET_MAP = {
+        "webinar": [
+            "chat",
+            "cta-calendar",
+        ],  # Assuming guided_conversation handled by chat
+        "vsl": ["chat", "cta-checkout"],  # Assuming guided_conversation handled by chat
+        "course": [
+            "chat",
+            "quiz",
+            "progress_bar",
+        ],  # Keep quiz widget for explicit course quizzes
+        "onboarding": [
+            "chat",
+            "deep_link",
+            "inline_tip",
+        ],  # Onboarding uses chat for tips/checks
+        "default": ["chat"],  # Fallback
+    }
+    widgets = WIDGET_MAP.get(bridge_type, WIDGET_MAP["default"])
+
+    # Simple combination of all extracted data
+    unified_data = {
+        # Add metadata for identification
+        "extraction_metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "bridge_type": bridge_type,  # Store the type used for extraction
+            "components": [
+                "video_timeline",
+                "knowledge_base",
+                "teaching_persona",
+                "document_knowledge",
+                "engagement_opportunities",
+                "widgets",  # Added widgets component
+            ],
+        },
+        "bridge_type": bridge_type,  # Add type at top level too
+        "widgets": widgets,  # Add the determined widgets
+        # Include all raw components
+        "video_timeline": timeline_data.get("video_timeline", {}),
+        "document_timeline": timeline_data.get("document_timeline", {}),
+        "knowledge_base": knowledge_data.get("knowledge_base", {}),
+        "teaching_persona": persona_data.get("teaching_persona", {}),
+        "document_knowledge": document_data.get("document_knowledge", {}),
+        "engagement_opportunities": engagement_data.get("engagement_opportunities", []),
+    }
+
+    # No complex processing, just report statistics
+    pass_duration = time.time() - pass_start_time
+    print_timing("FINAL PASS: Data Combination (Total)", pass_duration)
+
+    # Count components for reporting
+    components_stats = {
+        "timeline_sections": len(
+            unified_data["video_timeline"].get("pedagogical_structure", [])
+        ),
+        "document_sections": len(unified_data["document_timeline"].get("sections", [])),
+        "core_concepts": len(unified_data["knowledge_base"].get("core_concepts", [])),
+        "engagement_points": len(unified_data["engagement_opportunities"]),
+    }
+
+    print(
+        f"✅ Knowledge components combined: {', '.join([f'{k}: {v}' for k, v in components_stats.items()])}"
+    )
+    return unified_data
+
+
+#################################################
+# SEGMENTED LONG-VIDEO EXTRACTION
+#################################################
+
+
+def timestamp_to_seconds(timestamp: str) -> float:
+    """Parse "HH:MM:SS" (or "MM:SS") into seconds; unparseable values become 0"""
+    try:
+        seconds = 0.0
+        for part in str(timestamp).strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def seconds_to_timestamp(seconds: float) -> str:
+    """Format seconds as zero padded "HH:MM:SS" """
+    seconds = max(int(round(seconds)), 0)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def probe_video_duration(video_path: str) -> Optional[float]:
+    """Duration of a local video in seconds, or None if ffprobe isn't available"""
+    try:
+        import ffmpeg  # Only needed for segmented extraction
+
+        return float(ffmpeg.probe(video_path)["format"]["duration"])
+    except Exception as e:
+        logger.warning(f"Could not probe video duration for {video_path}: {e}")
+        return None
+
+
+def plan_video_windows(
+    duration: float,
+    window_seconds: float = SEGMENT_WINDOW_SECONDS,
+    overlap_seconds: float = SEGMENT_OVERLAP_SECONDS,
+) -> List[Tuple[float, float]]:
+    """Split [0, duration] into windows of window_seconds that overlap by overlap_seconds"""
+    windows = []
+    start = 0.0
+    step = max(window_seconds - overlap_seconds, 1.0)
+    while True:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            return windows
+        start += step
+
+
+def cut_video_window(video_path: str, start: float, end: float) -> Tuple[str, bool]:
+    """
+    Re-encode [start, end) of a video into a small clip for analysis.
+    Re-encoding (rather than stream copy) keeps the cut frame-accurate, so
+    window-relative timestamps can be offset back exactly.
+    Returns tuple of (output_path, success)
+    """
+    try:
+        import ffmpeg
+
+        output_path = (
+            f"{video_path.rsplit('.', 1)[0]}.window-{int(start)}-{int(end)}.mp4"
+        )
+        stream = ffmpeg.input(video_path, ss=start, t=end - start)
+        stream = ffmpeg.output(
+            stream,
+            output_path,
+            vf="scale=-2:'min(480,ih)'",
+            vcodec="libx264",
+            preset="ultrafast",
+            crf=30,
+            acodec="aac",
+            audio_bitrate="64k",
+            ac=1,
+        )
+        ffmpeg.run(
+            stream, overwrite_output=True, capture_stdout=True, capture_stderr=True
+        )
+        return output_path, True
+    except Exception as e:
+        logger.error(f"Error cutting video window {start:.0f}-{end:.0f}s: {e}")
+        return None, False
+
+
+def shift_timeline_sections(
+    sections: List[Dict[str, Any]],
+    offset_seconds: float,
+    clamp_start: float = 0.0,
+    clamp_end: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Copy timeline sections with every start/end time moved by offset_seconds.
+    Sections that fall entirely outside [clamp_start, clamp_end] after the shift
+    are dropped and the rest are clamped to that range.
+    """
+
+    def shift(timestamp):
+        seconds = timestamp_to_seconds(timestamp) + offset_seconds
+        if clamp_end is not None:
+            seconds = min(seconds, clamp_end)
+        return seconds_to_timestamp(max(seconds, clamp_start))
+
+    shifted = []
+    for section in sections:
+        start = timestamp_to_seconds(section.get("start_time")) + offset_seconds
+        end = timestamp_to_seconds(section.get("end_time")) + offset_seconds
+        if end <= clamp_start or (clamp_end is not None and start >= clamp_end):
+            continue
+        section = dict(section, start_time=shift(section.get("start_time")))
+        section["end_time"] = shift(section.get("end_time"))
+        section["segments"] = [
+            dict(
+                segment,
+                start_time=shift(segment.get("start_time")),
+                end_time=shift(segment.get("end_time")),
+            )
+            for segment in section.get("segments", [])
+        ]
+        shifted.append(section)
+    return shifted
+
+
+def _window_core(windows: List[Tuple[float, float]], index: int) -> Tuple[float, float]:
+    """
+    The part of a window that owns the results found in it. Overlaps are split
+    down the middle, so something seen near a boundary is kept exactly once.
+    """
+    start, end = windows[index]
+    core_start = 0.0 if index == 0 else (start + windows[index - 1][1]) / 2
+    core_end = end if index == len(windows) - 1 else (end + windows[index + 1][0]) / 2
+    return core_start, core_end
+
+
+def merge_window_timelines(
+    windows: List[Tuple[float, float]], window_results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Stitch per-window timelines into one video_timeline in absolute time"""
+    merged_sections = []
+    for index, ((start, _), result) in enumerate(zip(windows, window_results)):
+        core_start, core_end = _window_core(windows, index)
+        sections = result.get("video_timeline", {}).get("pedagogical_structure", [])
+        for section in shift_timeline_sections(sections, start):
+            midpoint = (
+                timestamp_to_seconds(section["start_time"])
+                + timestamp_to_seconds(section["end_time"])
+            ) / 2
+            if core_start <= midpoint < core_end:
+                merged_sections.append(section)
+
+    # Close gaps/overlaps left at window boundaries so sections still partition the video
+    merged_sections.sort(key=lambda s: timestamp_to_seconds(s["start_time"]))
+    for index, section in enumerate(merged_sections):
+        section["id"] = f"section-{index + 1}"
+        if index == 0:
+            section["start_time"] = "00:00:00"
+        else:
+            section["start_time"] = merged_sections[index - 1]["end_time"]
+        for segment_index, segment in enumerate(section.get("segments", [])):
+            segment["id"] = f"segment-{index + 1}.{segment_index + 1}"
+    if merged_sections:
+        merged_sections[-1]["end_time"] = seconds_to_timestamp(windows[-1][1])
+
+    # Keep segments inside their (possibly moved) section boundaries
+    for section in merged_sections:
+        segments = section.get("segments", [])
+        if segments:
+            segments[0]["start_time"] = section["start_time"]
+            segments[-1]["end_time"] = section["end_time"]
+
+    metadata = {}
+    for result in window_results:
+        metadata = result.get("video_timeline", {}).get("metadata", {})
+        if metadata.get("title") and metadata.get("title") != "Unknown":
+            break
+    metadata = dict(metadata, total_duration=seconds_to_timestamp(windows[-1][1]))
+
+    return {
+        "video_timeline": {
+            "metadata": metadata,
+            "pedagogical_structure": merged_sections,
+        }
+    }
+
+
+def merge_window_engagements(
+    windows: List[Tuple[float, float]], window_results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Offset per-window engagement opportunities to absolute time and drop boundary duplicates"""
+    merged = []
+    for index, ((start, _), result) in enumerate(zip(windows, window_results)):
+        core_start, core_end = _window_core(windows, index)
+        for opportunity in result.get("engagement_opportunities", []):
+            seconds = timestamp_to_seconds(opportunity.get("timestamp")) + start
+            if not core_start <= seconds < core_end:
+                continue
+            merged.append(
+                dict(
+                    opportunity,
+                    timestamp=seconds_to_timestamp(seconds),
+                    id=f"{opportunity.get('id', 'engagement')}-w{index + 1}",
+                )
+            )
+
+    merged.sort(key=lambda o: timestamp_to_seconds(o["timestamp"]))
+    deduped = []
+    for opportunity in merged:
+        concepts = set(opportunity.get("concepts_addressed") or [])
+        previous = deduped[-1] if deduped else None
+        if (
+            previous
+            and timestamp_to_seconds(opportunity["timestamp"])
+            - timestamp_to_seconds(previous["timestamp"])
+            < SEGMENT_OVERLAP_SECONDS
+            and previous.get("engagement_type") == opportunity.get("engagement_type")
+            and concepts & set(previous.get("concepts_addressed") or [])
+        ):
+            continue
+        deduped.append(opportunity)
+
+    return {"engagement_opportunities": deduped}
+
+
+def _run_windows(func, video_windows, label, log_collector=None):
+    """Run func(index, start, end, window_file) for every window in parallel, in order"""
+    window_start = time.time()
+    with ThreadPoolExecutor(
+        max_workers=min(len(video_windows), EXTRACTION_MAX_WORKERS)
+    ) as executor:
+        futures = [
+            submit_with_context(executor, func, index, start, end, window_file)
+            for index, (start, end, window_file) in enumerate(video_windows)
+        ]
+        results = [future.result() for future in futures]
+    print_timing(
+        f"{label} ({len(video_windows)} windows)",
+        time.time() - window_start,
+        log_collector=log_collector,
+    )
+    return results
+
+
+def _window_errors(window_results) -> str:
+    """The pass errors of any failed windows, joined for PASS_ERROR_KEY"""
+    return "; ".join(
+        f"window {index + 1}: {result[PASS_ERROR_KEY]}"
+        for index, result in enumerate(window_results)
+        if result.get(PASS_ERROR_KEY)
+    )
+
+
+def extract_video_timeline_segmented(
+    video_windows, model, log_collector=None
+) -> Dict[str, Any]:
+    """
+    PASS 1a for long videos: extract a timeline per window in parallel and merge.
+
+    Args:
+        video_windows: List of (start_seconds, end_seconds, uploaded clip)
+    """
+    print(f"🎞️ Segmented video timeline: {len(video_windows)} windows")
+    window_results = _run_windows(
+        lambda index, start, end, window_file: extract_video_timeline(
+            window_file, model
+        ),
+        video_windows,
+        "Video Timeline - Segmented",
+        log_collector,
+    )
+    windows = [(start, end) for start, end, _ in video_windows]
+    results = merge_window_timelines(windows, window_results)
+    # A failed window would leave a hole in the merged timeline
+    window_errors = _window_errors(window_results)
+    if window_errors:
+        results[PASS_ERROR_KEY] = window_errors
+    validate_timeline_data(results)
+    print(
+        f"✅ Segmented video timeline merged: {len(results['video_timeline']['pedagogical_structure'])} sections"
+    )
+    return results
+
+
+def extract_engagement_opportunities_segmented(
+    video_windows,
+    timeline_data,
+    knowledge_data,
+    persona_data,
+    doc_data,
+    model,
+    log_collector=None,
+    bridge_type="course",
+    additional_instructions="",
+) -> Dict[str, Any]:
+    """PASS 5 for long videos: find engagement points per window in parallel and merge"""
+    sections = timeline_data.get("video_timeline", {}).get("pedagogical_structure", [])
+
+    def extract_window(index, start, end, window_file):
+        # Show each window only its own part of the timeline, in clip-relative time
+        window_timeline = {
+            "video_timeline": {
+                "pedagogical_structure": shift_timeline_sections(
+                    sections, -start, clamp_end=end - start
+                )
+            }
+        }
+        return extract_engagement_opportunities(
+            window_file,
+            window_timeline,
+            knowledge_data,
+            persona_data,
+            doc_data,
+            model,
+            log_collector,
+            bridge_type,
+            additional_instructions,
+        )
+
+    window_results = _run_windows(
+        extract_window,
+        video_windows,
+        "Engagement Opportunities - Segmented",
+        log_collector,
+    )
+    windows = [(start, end) for start, end, _ in video_windows]
+    results = merge_window_engagements(windows, window_results)
+    window_errors = _window_errors(window_results)
+    if window_errors:
+        results[PASS_ERROR_KEY] = window_errors
+    print(
+        f"✅ Segmented engagement merged: {len(results['engagement_opportunities'])} opportunities"
+    )
+    return results
+
+
+#################################################
+# MAIN EXTRACTION PIPELINE
+#################################################
+
+
+class ExtractionPass:
+    """A node in the extraction DAG: a named pass and the passes whose output it needs"""
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        func: Callable,
+        depends_on=(),
+        uses_settings: bool = False,
+        required: bool = False,
+    ):
+        self.name = name
+        self.label = label
+        self.func = func  # Called with a dict of dependency results keyed by pass name
+        self.depends_on = tuple(depends_on)
+        # Output changes with bridge_type / additional_instructions
+        self.uses_settings = uses_settings
+        # The extraction fails when this pass has no real output
+        self.required = required
+
+
+def pass_output_error(name: str, output: Any) -> Optional[str]:
+    """
+    Why a pass output is a failure placeholder rather than real output, or None.
+
+    Passes catch their own errors and return an empty structure marked with
+    PASS_ERROR_KEY; an empty timeline, knowledge base or persona counts as a
+    failure too, since a successful call never produces one.
+    """
+    if not isinstance(output, dict):
+        return "no output"
+    if output.get(PASS_ERROR_KEY):
+        return output[PASS_ERROR_KEY]
+    if name == "video_timeline":
+        if not (output.get("video_timeline") or {}).get("pedagogical_structure"):
+            return "empty video timeline"
+    elif name == "knowledge_base":
+        if not any((output.get("knowledge_base") or {}).values()):
+            return "empty knowledge base"
+    elif name == "teaching_persona":
+        if not output.get("teaching_persona"):
+            return "empty teaching persona"
+    return None
+
+
+def failed_passes(pass_results: Dict[str, Any]) -> Dict[str, str]:
+    """pass_output_error for every pass in pass_results that failed"""
+    failures = {}
+    for name, output in pass_results.items():
+        error = pass_output_error(name, output)
+        if error:
+            failures[name] = error
+    return failures
+
+
+def missing_required_sections(unified: Dict[str, Any]) -> List[str]:
+    """Required passes whose section of a unified knowledge base fails pass_output_error"""
+    return [
+        p.name
+        for p in build_extraction_passes(None, None, None)
+        if p.required and pass_output_error(p.name, {p.name: unified.get(p.name)})
+    ]
+
+
+def get_settings_dependent_passes(passes: List[ExtractionPass]) -> Set[str]:
+    """Passes that must re-run when only the bridge settings change: the ones
+    that use them, plus everything downstream of those"""
+    rerun = {p.name for p in passes if p.uses_settings}
+    changed = True
+    while changed:
+        changed = False
+        for p in passes:
+            if p.name not in rerun and rerun.intersection(p.depends_on):
+                rerun.add(p.name)
+                changed = True
+    return rerun
+
+
+def settings_dependent_pass_names() -> Set[str]:
+    """Names of the extraction passes a bridge_type/instructions change invalidates"""
+    return get_settings_dependent_passes(build_extraction_passes(None, None, None))
+
+
+def pass_outputs_from_unified(unified: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recover per-pass outputs from a stored unified knowledge base, for scripts
+    extracted before pass checkpoints were kept. Only the settings-independent
+    passes are returned.
+    """
+    if not unified.get("video_timeline") or not unified.get("knowledge_base"):
+        return {}
+    return {
+        name: {name: unified.get(name) or {}}
+        for name in (
+            "video_timeline",
+            "document_timeline",
+            "knowledge_base",
+            "document_knowledge",
+        )
+    }
+
+
+def run_extraction_dag(
+    passes: List[ExtractionPass],
+    log_collector=None,
+    max_workers: int = EXTRACTION_MAX_WORKERS,
+    progress_range: Tuple[int, int] = (20, 95),
+    completed: Optional[Dict[str, Any]] = None,
+    on_pass_complete: Optional[Callable[[str, Any], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]:
+    """
+    Run extraction passes on a bounded thread pool, starting each pass as soon as
+    all of its dependencies have produced output.
+
+    Passes already present in `completed` (e.g. checkpoints from a failed run)
+    are not re-run; their stored output feeds the passes that depend on them.
+    `on_pass_complete(name, result)` is called after every pass that does run
+    and produces real output (see pass_output_error). A required pass without
+    real output stops the DAG with a RuntimeError; other failed passes are
+    logged and their placeholders passed on.
+
+    Log, progress and completion callbacks are only invoked from the calling
+    thread, so they never run inside a worker.
+
+    Returns:
+        (results keyed by pass name, timings keyed by pass name with start/end
+        offsets in seconds from the start of the DAG)
+    """
+    by_name = {p.name: p for p in passes}
+    for p in passes:
+        missing = [d for d in p.depends_on if d not in by_name]
+        if missing:
+            raise ValueError(f"Pass '{p.name}' depends on unknown passes: {missing}")
+
+    results: Dict[str, Any] = {}
+    timings: Dict[str, Dict[str, float]] = {}
+    pending = list(passes)
+    running = {}
+    dag_start = time.time()
+    progress_start, progress_end = progress_range
+
+    def log(message, status="info"):
+        print(message)
+        if log_collector:
+            log_collector.add_log(message, status=status)
+
+    for extraction_pass in list(pending):
+        if completed and extraction_pass.name in completed:
+            pending.remove(extraction_pass)
+            results[extraction_pass.name] = completed[extraction_pass.name]
+            log(f"⏭️ Skipping {extraction_pass.label} (restored from checkpoint)")
+
+    def run_pass(extraction_pass, inputs):
+        timings[extraction_pass.name] = {"start": time.time() - dag_start}
+        return extraction_pass.func(inputs)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            # Submit every pass whose inputs now exist
+            for extraction_pass in list(pending):
+                if all(d in results for d in extraction_pass.depends_on):
+                    pending.remove(extraction_pass)
+                    inputs = {d: results[d] for d in extraction_pass.depends_on}
+                    log(
+                        f"▶️ Starting {extraction_pass.label} (t+{time.time() - dag_start:.2f}s)"
+                    )
+                    future = submit_with_context(
+                        executor, run_pass, extraction_pass, inputs
+                    )
+                    running[future] = extraction_pass
+
+            if not running:
+                stuck = [p.name for p in pending]
+                raise RuntimeError(f"Extraction DAG has unsatisfiable passes: {stuck}")
+
+            done, _ = wait(
+                list(running), timeout=LOG_FLUSH_INTERVAL, return_when=FIRST_COMPLETED
+            )
+            if not done:
+                # Let lines logged inside running passes (e.g. streamed
+                # sections) reach the status UI before the pass finishes
+                if log_collector:
+                    log_collector.flush_pending()
+                continue
+            for future in done:
+                extraction_pass = running.pop(future)
+                results[extraction_pass.name] = future.result()
+                timing = timings.setdefault(extraction_pass.name, {"start": 0.0})
+                timing["end"] = time.time() - dag_start
+                timing["duration"] = timing["end"] - timing["start"]
+                error = pass_output_error(
+                    extraction_pass.name, results[extraction_pass.name]
+                )
+                if error and extraction_pass.required:
+                    raise RuntimeError(
+                        f"{extraction_pass.label} produced no usable output: {error}"
+                    )
+                if error:
+                    log(
+                        f"⚠️ {extraction_pass.label} failed after {timing['duration']:.2f}s, continuing without it: {error}",
+                        status="info",
+                    )
+                else:
+                    log(
+                        f"✅ Finished {extraction_pass.label} in {timing['duration']:.2f}s (t+{timing['end']:.2f}s)",
+                        status="success",
+                    )
+                if on_pass_complete and not error:
+                    try:
+                        on_pass_complete(
+                            extraction_pass.name, results[extraction_pass.name]
+                        )
+                    except Exception as e:
+                        logger.error(
+                            f"Pass completion callback failed for {extraction_pass.name}: {e}"
+                        )
+                if log_collector:
+                    completed_fraction = len(results) / len(passes)
+                    log_collector.update_progress(
+                        int(
+                            progress_start
+                            + (progress_end - progress_start) * completed_fraction
+                        )
+                    )
+
+    except BaseException:
+        # Fail straight away rather than waiting on the passes still running
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    return results, timings
+
+
+def get_critical_path(
+    passes: List[ExtractionPass], timings: Dict[str, Dict[str, float]]
+) -> List[str]:
+    """Walk back from the last pass to finish through whichever dependency finished last"""
+    if not timings:
+        return []
+    by_name = {p.name: p for p in passes}
+    current = max(timings, key=lambda name: timings[name].get("end", 0))
+    path = [current]
+    while True:
+        # Passes restored from a checkpoint have no timing and aren't on the path
+        timed_deps = [d for d in by_name[current].depends_on if d in timings]
+        if not timed_deps:
+            break
+        current = max(timed_deps, key=lambda name: timings[name].get("end", 0))
+        path.append(current)
+    return list(reversed(path))
+
+
+def build_extraction_passes(
+    video_file,
+    document_file,
+    model,
+    log_collector=None,
+    bridge_type="course",
+    additional_instructions="",
+    video_windows=None,
+) -> List[ExtractionPass]:
+    """
+    Describe the multi-pass extraction as a DAG.
+
+    When video_windows (a list of (start_seconds, end_seconds, uploaded clip))
+    is given, the timeline and engagement passes run per window and merge.
+
+    video_timeline ─┬─> knowledge_base ─┬─> teaching_persona ─────┬─> engagement ─> integration
+                    │                   └─> document_knowledge ───┘
+    document_timeline ──────────────────────────────────────────────────────────────┘
+    """
+
+    def timelines_from(inputs):
+        return {
+            "video_timeline": inputs["video_timeline"].get("video_timeline", {}),
+            "document_timeline": inputs.get("document_timeline", {}).get(
+                "document_timeline", {}
+            ),
+        }
+
+    return [
+        ExtractionPass(
+            "video_timeline",
+            "PASS 1a (Video Timeline)",
+            lambda inputs: (
+                extract_video_timeline_segmented(video_windows, model, log_collector)
+                if video_windows
+                else extract_video_timeline(video_file, model, log_collector)
+            ),
+            required=True,
+        ),
+        ExtractionPass(
+            "document_timeline",
+            "PASS 1b (Document Timeline)",
+            lambda inputs: extract_document_timeline(document_file, model),
+        ),
+        ExtractionPass(
+            "knowledge_base",
+            "PASS 2 (Knowledge)",
+            lambda inputs: extract_knowledge_base(
+                video_file,
+                document_file,
+                timelines_from(inputs),
+                model,
+                log_collector,
+                bridge_type,
+                additional_instructions,
+            ),
+            depends_on=["video_timeline"],
+            # The prompt mentions the bridge type for emphasis only; the facts it
+            # extracts are kept when just the settings change
+            required=True,
+        ),
+        ExtractionPass(
+            "teaching_persona",
+            "PASS 3 (Persona)",
+            lambda inputs: extract_teaching_persona(
+                video_file,
+                timelines_from(inputs),
+                inputs["knowledge_base"],
+                model,
+                log_collector,
+                bridge_type,
+                additional_instructions,
+            ),
+            depends_on=["video_timeline", "knowledge_base"],
+            uses_settings=True,
+            required=True,
+        ),
+        ExtractionPass(
+            "document_knowledge",
+            "PASS 4 (Document)",
+            lambda inputs: extract_document_knowledge(
+                document_file,
+                {},
+                inputs["knowledge_base"],
+                model,
+                log_collector,
+            ),
+            depends_on=["knowledge_base"],
+        ),
+        ExtractionPass(
+            "engagement_opportunities",
+            "PASS 5 (Engagement)",
+            lambda inputs: (
+                extract_engagement_opportunities_segmented
+                if video_windows
+                else extract_engagement_opportunities
+            )(
+                video_windows if video_windows else video_file,
+                timelines_from(inputs),
+                inputs["knowledge_base"],
+                inputs["teaching_persona"],
+                inputs["document_knowledge"],
+                model,
+                log_collector,
+                bridge_type,
+                additional_instructions,
+            ),
+            depends_on=[
+                "video_timeline",
+                "knowledge_base",
+                "teaching_persona",
+                "document_knowledge",
+            ],
+            uses_settings=True,
+            required=True,
+        ),
+        ExtractionPass(
+            "integration",
+            "FINAL PASS (Integration)",
+            lambda inputs: integrate_knowledge(
+                timelines_from(inputs),
+                inputs["knowledge_base"],
+                inputs["teaching_persona"],
+                inputs["document_knowledge"],
+                inputs["engagement_opportunities"],
+                model,
+                log_collector,
+                bridge_type,
+            ),
+            depends_on=[
+                "video_timeline",
+                "document_timeline",
+                "knowledge_base",
+                "teaching_persona",
+                "document_knowledge",
+                "engagement_opportunities",
+            ],
+            uses_settings=True,
+        ),
+    ]
+
+
+@lru_cache(maxsize=1)
+def get_prompt_fingerprint() -> str:
+    """Fingerprint the extraction prompts so cached results expire when they change"""
+    digest = hashlib.sha256(EXTRACTION_PROMPT_VERSION.encode("utf-8"))
+    for func in (
+        extract_video_timeline,
+        extract_document_timeline,
+        extract_knowledge_base,
+        extract_teaching_persona,
+        extract_document_knowledge,
+        extract_engagement_opportunities,
+        integrate_knowledge,
+    ):
+        digest.update(inspect.getsource(func).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def get_extraction_cache_key(
+    video_path, document_path, bridge_type, additional_instructions, media_variant=None
+) -> str:
+    """Content-addressed cache key for one extraction request"""
+    document_hash = None
+    if document_path and os.path.exists(document_path):
+        document_hash = file_sha256(document_path)
+    return build_cache_key(
+        file_sha256(video_path),
+        document_hash,
+        bridge_type,
+        additional_instructions,
+        GEMINI_MODEL,
+        get_prompt_fingerprint(),
+        media_variant,
+    )
+
+
+def file_registry_key(path: str, variant: Optional[str] = None) -> str:
+    """Registry key for a local file, optionally for a derived variant (e.g. a proxy)"""
+    content_hash = file_sha256(path)
+    return f"{content_hash}:{variant}" if variant else content_hash
+
+
+def registry_key_variant(registry_key: str) -> Optional[str]:
+    """The variant a file_registry_key was made for, None for the original file"""
+    return registry_key.partition(":")[2] or None
+
+
+def extraction_media_variant(
+    media_variant: Optional[str], segmented: bool
+) -> Optional[str]:
+    """Cache key variant for the media Gemini sees: the upload variant plus windowing"""
+    if not segmented:
+        return media_variant
+    return f"{media_variant or 'original'}+segmented-{int(SEGMENT_WINDOW_SECONDS)}-{int(SEGMENT_OVERLAP_SECONDS)}"
+
+
+class FilePreparationError(Exception):
+    """Raised when a derived file can't be prepared and the original may not stand in for it"""
+
+
+def upload_file_reusable(
+    path: str,
+    label: str = "file",
+    log_collector=None,
+    prepare: Optional[Callable[[str], Tuple[Optional[str], bool]]] = None,
+    variant: Optional[str] = None,
+    fallback_to_original: bool = True,
+):
+    """
+    Upload a file to Gemini, or reuse a still-valid upload of identical content.
+
+    `prepare(path)` may return (derived_path, success) to upload a derived file
+    such as an analysis proxy instead; it only runs when nothing can be reused,
+    and the derived file is deleted once uploaded. Uploads are registered under
+    the original file's hash plus `variant`. If preparation fails the original
+    is uploaded, or FilePreparationError raised when `fallback_to_original` is
+    False (e.g. a video window, where the whole video is no substitute).
+
+    Returns (remote file, registry key); the file may still be PROCESSING.
+    """
+    metric_name = f"upload_{label.split('-')[0]}"  # window-3 -> upload_window
+    lookup_start = time.time()
+    registry_key = file_registry_key(path, variant)
+    registry = get_file_registry()
+    entry = registry.get(registry_key)
+    if entry:
+        try:
+            remote_file = genai.get_file(name=entry["name"])
+            if remote_file.state.name in ("ACTIVE", "PROCESSING"):
+                registry.register(registry_key, remote_file)
+                log_message = f"♻️ Reusing uploaded {label} {remote_file.name} (state {remote_file.state.name})"
+                print(log_message)
+                if log_collector:
+                    log_collector.add_log(log_message, status="info")
+                record_gemini_metric(
+                    metric_name, time.time() - lookup_start, outcome="reused"
+                )
+                return remote_file, registry_key
+            logger.info(
+                f"Uploaded {label} {entry['name']} is {remote_file.state.name}, re-uploading"
+            )
+        except Exception as e:
+            logger.info(f"Uploaded {label} {entry['name']} is gone ({e}), re-uploading")
+        registry.invalidate(registry_key)
+
+    upload_path = path
+    if prepare:
+        prepare_start = time.time()
+        derived_path, success = prepare(path)
+        if success and derived_path:
+            upload_path = derived_path
+            print_timing(
+                f"{label.capitalize()} Preparation ({variant or 'derived'})",
+                time.time() - prepare_start,
+                log_collector=log_collector,
+            )
+        elif not fallback_to_original:
+            raise FilePreparationError(f"Could not prepare {label} ({variant})")
+        else:
+            # Fall back to the original, and don't register it as the variant
+            logger.warning(f"Could not prepare {label}, uploading the original")
+            registry_key = file_registry_key(path)
+
+    upload_bytes = os.path.getsize(upload_path)
+    upload_start = time.time()
+    try:
+        remote_file = genai.upload_file(path=upload_path)
+    except Exception as e:
+        record_gemini_metric(
+            metric_name,
+            time.time() - upload_start,
+            outcome="error",
+            bytes_uploaded=upload_bytes,
+            error=str(e),
+        )
+        raise
+    finally:
+        if upload_path != path and os.path.exists(upload_path):
+            os.remove(upload_path)
+    record_gemini_metric(
+        metric_name, time.time() - upload_start, bytes_uploaded=upload_bytes
+    )
+    registry.register(registry_key, remote_file)
+    return remote_file, registry_key
 
 
-def integrate_knowledge(
-    timeline_data,
-    knowledge_data,
-    persona_data,
-    document_data,
-    engagement_data,
-    model,
+def upload_files_concurrently(
+    local_paths: Dict[str, str],
     log_collector=None,
-    bridge_type="course",
-) -> Dict[str, Any]:
+    preparers: Optional[Dict[str, Tuple[Callable, str]]] = None,
+):
     """
-    FINAL PASS: Minimally combine all extracted components preserving their raw structure
+    Upload every {label: path} at once.
+    Returns ({label: remote file}, {label: registry key}).
 
-    Args:
-        timeline_data: Video timeline data
-        knowledge_data: Knowledge base data
-        persona_data: Teaching persona data
-        document_data: Document knowledge data
-        engagement_data: Engagement opportunities data
-        model: Configured Gemini model
+    `preparers` optionally maps a label to (prepare, variant) or
+    (prepare, variant, fallback_to_original) for upload_file_reusable.
+    """
+    preparers = preparers or {}
+    remote_files = {}
+    registry_keys = {}
+    with ThreadPoolExecutor(max_workers=min(len(local_paths), 8)) as executor:
+        futures = {
+            label: submit_with_context(
+                executor,
+                upload_file_reusable,
+                path,
+                label,
+                None,
+                *preparers.get(label, (None, None)),
+            )
+            for label, path in local_paths.items()
+        }
+        for label, future in futures.items():
+            remote_files[label], registry_keys[label] = future.result()
+            if log_collector:
+                log_collector.add_log(
+                    f"📤 {label.capitalize()} uploaded as {remote_files[label].name}",
+                    status="info",
+                )
+    return remote_files, registry_keys
 
-    Returns:
-        Combined knowledge structure for Brdge AI agent
+
+def wait_for_files_active(
+    remote_files: Dict[str, Any],
+    log_collector=None,
+    timeout: float = GEMINI_FILE_PROCESSING_TIMEOUT,
+    initial_interval: float = 1.0,
+    max_interval: float = 10.0,
+):
     """
-    pass_start_time = time.time()
-    print(f"🔄 FINAL PASS: Combining extraction components...")
+    Poll all PROCESSING files together until none remain, backing off
+    exponentially between rounds.
 
-    # Define widget mapping based on bridge type
-    WIDGET_MAP = {
-        "webinar": [
-            "chat",
-            "cta-calendar",
-        ],  # Assuming guided_conversation handled by chat
-        "vsl": ["chat", "cta-checkout"],  # Assuming guided_conversation handled by chat
-        "course": [
-            "chat",
-            "quiz",
-            "progress_bar",
-        ],  # Keep quiz widget for explicit course quizzes
-        "onboarding": [
-            "chat",
-            "deep_link",
-            "inline_tip",
-        ],  # Onboarding uses chat for tips/checks
-        "default": ["chat"],  # Fallback
-    }
-    widgets = WIDGET_MAP.get(bridge_type, WIDGET_MAP["default"])
+    A progress line is logged when a file changes state, plus a heartbeat at
+    most every 15 seconds. Raises TimeoutError once `timeout` seconds pass.
+    Files that end up FAILED are returned as-is for the caller to handle.
+    """
+    remote_files = dict(remote_files)
+    start = time.time()
+    interval = initial_interval
+    last_report = start
+
+    while True:
+        pending = [
+            label
+            for label, remote_file in remote_files.items()
+            if remote_file.state.name == "PROCESSING"
+        ]
+        if not pending:
+            return remote_files
 
-    # Simple combination of all extracted data
-    unified_data = {
-        # Add metadata for identification
-        "extraction_metadata": {
-            "timestamp": datetime.now().isoformat(),
-            "bridge_type": bridge_type,  # Store the type used for extraction
-            "components": [
-                "video_timeline",
-                "knowledge_base",
-                "teaching_persona",
-                "document_knowledge",
-                "engagement_opportunities",
-                "widgets",  # Added widgets component
-            ],
-        },
-        "bridge_type": bridge_type,  # Add type at top level too
-        "widgets": widgets,  # Add the determined widgets
-        # Include all raw components
-        "video_timeline": timeline_data.get("video_timeline", {}),
-        "document_timeline": timeline_data.get("document_timeline", {}),
-        "knowledge_base": knowledge_data.get("knowledge_base", {}),
-        "teaching_persona": persona_data.get("teaching_persona", {}),
-        "document_knowledge": document_data.get("document_knowledge", {}),
-        "engagement_opportunities": engagement_data.get("engagement_opportunities", []),
-    }
+        elapsed = time.time() - start
+        if elapsed >= timeout:
+            raise TimeoutError(
+                f"Gemini still processing {', '.join(pending)} after {elapsed:.0f}s"
+            )
 
-    # No complex processing, just report statistics
-    pass_duration = time.time() - pass_start_time
-    print_timing("FINAL PASS: Data Combination (Total)", pass_duration)
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * 2, max_interval)
+
+        state_changed = False
+        for label in pending:
+            remote_files[label] = genai.get_file(name=remote_files[label].name)
+            if remote_files[label].state.name != "PROCESSING":
+                state_changed = True
+
+        now = time.time()
+        if state_changed or now - last_report >= 15:
+            last_report = now
+            states = ", ".join(
+                f"{label}: {remote_file.state.name}"
+                for label, remote_file in remote_files.items()
+            )
+            log_message = f"⏳ Gemini file processing ({now - start:.0f}s) - {states}"
+            print(log_message)
+            if log_collector:
+                log_collector.add_log(log_message, status="info")
 
-    # Count components for reporting
-    components_stats = {
-        "timeline_sections": len(
-            unified_data["video_timeline"].get("pedagogical_structure", [])
-        ),
-        "document_sections": len(unified_data["document_timeline"].get("sections", [])),
-        "core_concepts": len(unified_data["knowledge_base"].get("core_concepts", [])),
-        "engagement_points": len(unified_data["engagement_opportunities"]),
-    }
 
-    print(
-        f"✅ Knowledge components combined: {', '.join([f'{k}: {v}' for k, v in components_stats.items()])}"
-    )
-    return unified_data
+def refresh_file_registration(registry_key: str, remote_file):
+    """Record a file's post-processing state; FAILED uploads are dropped"""
+    get_file_registry().register(registry_key, remote_file)
 
 
-#################################################
-# MAIN EXTRACTION PIPELINE
-#################################################
+def is_cacheable_extraction(pass_results: Dict[str, Any]) -> bool:
+    """Only cache runs in which every pass produced real output, optional ones included"""
+    return bool(pass_results) and not failed_passes(pass_results)
 
 
 def create_brdge_knowledge(
@@ -1575,6 +3568,13 @@ def create_brdge_knowledge(
     callback=None,
     bridge_type="course",
     additional_instructions="",
+    use_cache=True,
+    checkpoints=None,
+    checkpoint_callback=None,
+    video_proxy_builder=None,
+    video_proxy_profile=None,
+    metrics_callback=None,
+    previous_outputs=None,
 ):
     """
     Create a comprehensive knowledge base through multi-pass extraction
@@ -1584,6 +3584,16 @@ def create_brdge_knowledge(
         document_path: Optional path to a document file
         brdge_id: ID of the Brdge being processed
         callback: Function to call with log updates
+        use_cache: Reuse a previous extraction of identical content and settings
+        checkpoints: Outputs of passes completed by an earlier attempt, keyed by pass name
+        checkpoint_callback: Called as (brdge_id, pass_name, output) after each pass completes
+        video_proxy_builder: Optional (path) -> (proxy_path, success) used to upload a
+            smaller analysis copy of the video instead of the original
+        video_proxy_profile: Name of the proxy settings, part of the cache/upload keys
+        metrics_callback: Called with the list of per-call Gemini metrics when done
+        previous_outputs: Pass outputs from an earlier extraction of the same media.
+            Passes that don't depend on bridge_type/additional_instructions are
+            reused from it, so only persona, engagement and integration re-run
 
     Returns:
         Unified JSON knowledge base for Brdge
@@ -1614,7 +3624,58 @@ def create_brdge_knowledge(
         print(log_message)
         log_collector.add_log(log_message, status="info")
 
+    # Gemini sees a derived copy of the video when a proxy builder is given
+    media_variant = None
+    if video_proxy_builder:
+        media_variant = f"proxy-{video_proxy_profile or 'default'}"
+
+    # Long recordings are analysed as overlapping windows, which changes the output
+    windows = []
+    if SEGMENTED_EXTRACTION_MIN_SECONDS > 0:
+        video_duration = probe_video_duration(video_path)
+        if video_duration and video_duration >= SEGMENTED_EXTRACTION_MIN_SECONDS:
+            windows = plan_video_windows(video_duration)
+            log_message = f"🎞️ Long video ({seconds_to_timestamp(video_duration)}), using {len(windows)} segmented windows"
+            print(log_message)
+            log_collector.add_log(log_message, status="info")
+
+    # Collect a metrics record for every Gemini call made on behalf of this ingestion
+    metrics_token = _metrics_sink.set(log_collector.metrics)
+    # Ingestion yields to interactive Gemini calls (see GeminiRateLimiter)
+    priority_token = _request_priority.set(PRIORITY_BACKGROUND)
     try:
+        # Check the content-addressed cache before touching Gemini
+        cache_key = None
+        if use_cache and EXTRACTION_CACHE_ENABLED:
+            cache_start = time.time()
+            cache_key = get_extraction_cache_key(
+                video_path,
+                document_path,
+                bridge_type,
+                additional_instructions,
+                media_variant=extraction_media_variant(media_variant, bool(windows)),
+            )
+            cached = get_extraction_cache().get(cache_key)
+            print_timing(
+                "Extraction Cache Lookup",
+                time.time() - cache_start,
+                log_collector=log_collector,
+            )
+            # Entries stored before every pass was validated may hold placeholders
+            if cached and not is_cacheable_extraction(cached.get("passes") or {}):
+                log_message = (
+                    f"🗑️ Ignoring incomplete cached extraction ({cache_key[:12]})"
+                )
+                print(log_message)
+                log_collector.add_log(log_message, status="info")
+                cached = None
+            if cached:
+                log_message = f"♻️ Extraction cache hit ({cache_key[:12]}), skipping Gemini passes"
+                print(log_message)
+                log_collector.add_log(log_message, status="success")
+                log_collector.update_progress(100)
+                return cached["unified"]
+
         # Configure Gemini
         config_start = time.time()
         configure_genai()
@@ -1625,198 +3686,180 @@ def create_brdge_knowledge(
         )
         log_collector.update_progress(5)  # 5% progress
 
-        # Upload files to Gemini
-        upload_start = time.time()
-        log_message = f"📤 Uploading video to Gemini API..."
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        video_file = genai.upload_file(path=video_path)
-        video_upload_duration = time.time() - upload_start
-        print_timing("Video Upload", video_upload_duration, log_collector=log_collector)
-        log_collector.update_progress(10)  # 10% progress
-
-        document_file = None
-        doc_upload_duration = 0
-        if document_path and os.path.exists(document_path):
-            doc_upload_start = time.time()
-            log_message = f"📤 Uploading document to Gemini API..."
+        # Only the integration pass works purely from earlier outputs; anything
+        # else still needs the media uploaded to Gemini
+        checkpoints = {
+            name: output
+            for name, output in (checkpoints or {}).items()
+            # Placeholders checkpointed before failed passes were recognised
+            if not pass_output_error(name, output)
+        }
+        if checkpoints:
+            log_message = (
+                f"🔁 Resuming from checkpoints: {', '.join(sorted(checkpoints))}"
+            )
             print(log_message)
             log_collector.add_log(log_message, status="info")
-
-            document_file = genai.upload_file(path=document_path)
-            doc_upload_duration = time.time() - doc_upload_start
-            print_timing(
-                "Document Upload", doc_upload_duration, log_collector=log_collector
-            )
-            log_collector.update_progress(15)  # 15% progress
-
-        # Wait for processing to complete
-        processing_start = time.time()
-        while video_file.state.name == "PROCESSING":
-            log_message = "⏳ Processing video file..."
+        if previous_outputs:
+            # Re-extraction after a settings change: keep every pass the settings
+            # can't affect, checkpoints from this run take precedence
+            rerun = settings_dependent_pass_names()
+            reused = {
+                name: output
+                for name, output in previous_outputs.items()
+                if name not in rerun
+                and name not in checkpoints
+                and not pass_output_error(name, output)
+            }
+            checkpoints = {**reused, **checkpoints}
+            log_message = f"🎯 Re-extracting {', '.join(sorted(rerun - set(checkpoints)))}; reusing {', '.join(sorted(reused)) or 'nothing'}"
             print(log_message)
             log_collector.add_log(log_message, status="info")
-            time.sleep(2)
-            video_file = genai.get_file(name=video_file.name)
+        file_passes = list(EXTRACTION_FILE_PASSES)
+        if document_path and os.path.exists(document_path):
+            file_passes += ["document_timeline", "document_knowledge"]
+        needs_upload = any(name not in checkpoints for name in file_passes)
 
-        if document_file and document_file.state.name == "PROCESSING":
-            log_message = "⏳ Processing document file..."
+        video_file = None
+        document_file = None
+        video_windows = []
+        upload_duration = 0
+        processing_duration = 0
+        if needs_upload:
+            # Upload the video and document concurrently
+            local_paths = {"video": video_path}
+            if document_path and os.path.exists(document_path):
+                local_paths["document"] = document_path
+            log_message = f"📤 Uploading {' and '.join(local_paths)} to Gemini API..."
+
+            preparers = {}
+            if video_proxy_builder:
+                preparers["video"] = (video_proxy_builder, media_variant)
+
+            # Clips for the windowed passes, cut and uploaded alongside the full video
+            if windows and not (
+                "video_timeline" in checkpoints
+                and "engagement_opportunities" in checkpoints
+            ):
+                for index, (start, end) in enumerate(windows):
+                    label = f"window-{index + 1}"
+                    local_paths[label] = video_path
+                    preparers[label] = (
+                        partial(cut_video_window, start=start, end=end),
+                        f"window-{int(start)}-{int(end)}",
+                        False,
+                    )
+                log_message += f" (+{len(windows)} video windows)"
             print(log_message)
             log_collector.add_log(log_message, status="info")
-            time.sleep(2)
-            document_file = genai.get_file(name=document_file.name)
-
-        processing_duration = time.time() - processing_start
-        print_timing(
-            "File Processing Wait Time",
-            processing_duration,
-            log_collector=log_collector,
-        )
 
-        log_message = f"✅ File uploads complete and ready for processing"
-        print(log_message)
-        log_collector.add_log(log_message, status="success")
-        log_collector.update_progress(20)  # 20% progress
-
-        # PASS 1: Extract initial timelines
-        pass1_start = time.time()
-        log_message = f"🔍 EXTRACTION PASS 1: Extracting parallel content timelines..."
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        # Call the extraction function with log_collector
-        timelines = extract_initial_timelines(
-            video_file, document_file, model, log_collector
-        )
-        pass1_duration = time.time() - pass1_start
-        print_timing(
-            "PASS 1: Timeline Extraction - Total Pass Time",
-            pass1_duration,
-            include_emoji=False,
-            log_collector=log_collector,
-        )
-        log_collector.update_progress(35)  # 35% progress
-
-        # PASS 2: Extract knowledge base
-        pass2_start = time.time()
-        log_message = (
-            f"🔍 EXTRACTION PASS 2: Extracting knowledge base and concept network..."
-        )
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        knowledge_data = extract_knowledge_base(
-            video_file,
-            document_file,
-            timelines,
-            model,
-            log_collector,
-            bridge_type,
-            additional_instructions,
-        )
-        pass2_duration = time.time() - pass2_start
-        print_timing(
-            "PASS 2: Knowledge Base Extraction - Total Pass Time",
-            pass2_duration,
-            include_emoji=False,
-            log_collector=log_collector,
-        )
-        log_collector.update_progress(50)  # 50% progress
-
-        # PASS 3: Extract teaching persona
-        pass3_start = time.time()
-        log_message = f"🔍 EXTRACTION PASS 3: Extracting teaching persona and communication style..."
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        persona_data = extract_teaching_persona(
-            video_file,
-            timelines,
-            knowledge_data,
-            model,
-            log_collector,
-            bridge_type,
-            additional_instructions,
-        )
-        pass3_duration = time.time() - pass3_start
-        print_timing(
-            "PASS 3: Teaching Persona Extraction - Total Pass Time",
-            pass3_duration,
-            include_emoji=False,
-            log_collector=log_collector,
-        )
-        log_collector.update_progress(65)  # 65% progress
-
-        # PASS 4: Extract document knowledge (if document provided)
-        pass4_start = time.time()
-        log_message = f"🔍 EXTRACTION PASS 4: Extracting document-specific knowledge..."
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
+            upload_start = time.time()
+            try:
+                remote_files, registry_keys = upload_files_concurrently(
+                    local_paths, log_collector, preparers
+                )
+            except FilePreparationError as e:
+                # Every window must be its own clip, or the merged timeline is
+                # wrong; analyse the whole video in one go instead. Finished
+                # uploads are in the registry, so the retry reuses them.
+                log_message = f"⚠️ {e}, extracting without segmentation"
+                print(log_message)
+                log_collector.add_log(log_message, status="info")
+                windows = []
+                for label in [
+                    name for name in local_paths if name.startswith("window-")
+                ]:
+                    del local_paths[label]
+                    del preparers[label]
+                remote_files, registry_keys = upload_files_concurrently(
+                    local_paths, log_collector, preparers
+                )
+            # Key the cache on what Gemini actually gets: a failed proxy build
+            # uploads the original, and a failed window cut drops segmentation
+            media_variant = registry_key_variant(registry_keys["video"])
+            if cache_key:
+                cache_key = get_extraction_cache_key(
+                    video_path,
+                    document_path,
+                    bridge_type,
+                    additional_instructions,
+                    media_variant=extraction_media_variant(
+                        media_variant, bool(windows)
+                    ),
+                )
+            upload_duration = time.time() - upload_start
+            print_timing("File Uploads", upload_duration, log_collector=log_collector)
+            log_collector.update_progress(15)  # 15% progress
 
-        document_data = extract_document_knowledge(
-            document_file, timelines, knowledge_data, model, log_collector
-        )
-        pass4_duration = time.time() - pass4_start
-        if document_file:
+            # Wait for Gemini to finish processing every pending file
+            processing_start = time.time()
+            remote_files = wait_for_files_active(remote_files, log_collector)
+            processing_duration = time.time() - processing_start
             print_timing(
-                "PASS 4: Document Knowledge Extraction - Total Pass Time",
-                pass4_duration,
-                include_emoji=False,
+                "File Processing Wait Time",
+                processing_duration,
                 log_collector=log_collector,
             )
-        log_collector.update_progress(80)  # 80% progress
 
-        # PASS 5: Extract engagement opportunities
-        pass5_start = time.time()
-        log_message = f"🔍 EXTRACTION PASS 5: Extracting engagement opportunities and quiz points..."
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
+            for label, remote_file in remote_files.items():
+                refresh_file_registration(registry_keys[label], remote_file)
+            failed = [
+                f"{label} ({remote_file.name})"
+                for label, remote_file in remote_files.items()
+                if remote_file.state.name == "FAILED"
+            ]
+            if failed:
+                raise ValueError(f"Gemini failed to process {', '.join(failed)}")
+            video_file = remote_files["video"]
+            document_file = remote_files.get("document")
+            video_windows = [
+                (start, end, remote_files[f"window-{index + 1}"])
+                for index, (start, end) in enumerate(windows)
+                if f"window-{index + 1}" in remote_files
+            ]
+
+            log_message = f"✅ File uploads complete and ready for processing"
+            print(log_message)
+            log_collector.add_log(log_message, status="success")
+            log_collector.update_progress(20)  # 20% progress
+        else:
+            log_message = (
+                "⏭️ All file-based passes restored from checkpoints, skipping uploads"
+            )
+            print(log_message)
+            log_collector.add_log(log_message, status="info")
+            log_collector.update_progress(20)
 
-        engagement_data = extract_engagement_opportunities(
+        # PASSES 1-5 + FINAL: run as a dependency graph so independent passes overlap
+        passes = build_extraction_passes(
             video_file,
-            timelines,
-            knowledge_data,
-            persona_data,
-            document_data,
+            document_file,
             model,
             log_collector,
             bridge_type,
             additional_instructions,
+            video_windows=video_windows,
         )
-        pass5_duration = time.time() - pass5_start
-        print_timing(
-            "PASS 5: Engagement Opportunities Extraction - Total Pass Time",
-            pass5_duration,
-            include_emoji=False,
-            log_collector=log_collector,
-        )
-        log_collector.update_progress(90)  # 90% progress
+        dag_start = time.time()
+        on_pass_complete = None
+        if checkpoint_callback:
 
-        # FINAL PASS: Integrate all components
-        final_pass_start = time.time()
-        log_message = f"🔄 FINAL PASS: Combining extraction components..."
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
+            def on_pass_complete(name, result):
+                # The unified output is stored with the script itself
+                if name != "integration":
+                    checkpoint_callback(brdge_id, name, result)
 
-        unified_data = integrate_knowledge(
-            timelines,
-            knowledge_data,
-            persona_data,
-            document_data,
-            engagement_data,
-            model,
+        pass_results, pass_timings = run_extraction_dag(
+            passes,
             log_collector,
-            bridge_type,
-        )
-        final_pass_duration = time.time() - final_pass_start
-        print_timing(
-            "FINAL PASS: Knowledge Integration - Total Pass Time",
-            final_pass_duration,
-            include_emoji=False,
-            log_collector=log_collector,
+            completed=checkpoints,
+            on_pass_complete=on_pass_complete,
         )
-        log_collector.update_progress(95)  # 95% progress
+        dag_duration = time.time() - dag_start
+        unified_data = pass_results["integration"]
+
+        if cache_key and is_cacheable_extraction(pass_results):
+            get_extraction_cache().put(cache_key, pass_results, unified_data)
 
         # Report completion
         overall_duration = time.time() - overall_start_time
@@ -1827,53 +3870,40 @@ def create_brdge_knowledge(
         log_collector.add_log(log_message, status="success")
 
         # Print timing summary
-        log_message = "\n⏱️ TIMING SUMMARY:"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - Configuration & Setup: {config_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
+        summary_lines = [
+            "\n⏱️ TIMING SUMMARY:",
+            f"   - Configuration & Setup: {config_duration:.2f}s",
+            f"   - File Uploads: {upload_duration:.2f}s",
+            f"   - File Processing: {processing_duration:.2f}s",
+        ]
+        for extraction_pass in passes:
+            timing = pass_timings.get(extraction_pass.name)
+            if not timing:
+                continue
+            if (
+                extraction_pass.name in ("document_timeline", "document_knowledge")
+                and not document_file
+            ):
+                continue
+            summary_lines.append(
+                f"   - {extraction_pass.label}: {timing['duration']:.2f}s "
+                f"(t+{timing['start']:.2f}s → t+{timing['end']:.2f}s)"
+            )
 
-        log_message = (
-            f"   - File Uploads: {video_upload_duration + doc_upload_duration:.2f}s"
+        serial_duration = sum(t["duration"] for t in pass_timings.values())
+        critical_path = get_critical_path(passes, pass_timings)
+        summary_lines.extend(
+            [
+                f"   - Critical path: {' → '.join(critical_path)}",
+                f"   - Pass wall-clock: {dag_duration:.2f}s (serial would be {serial_duration:.2f}s, saved {max(serial_duration - dag_duration, 0):.2f}s)",
+                f"   - Gemini calls: {len(log_collector.metrics)} ({sum(m['input_tokens'] for m in log_collector.metrics)} input / {sum(m['output_tokens'] for m in log_collector.metrics)} output tokens)",
+                f"   - TOTAL EXTRACTION TIME: {overall_duration:.2f}s",
+            ]
         )
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - File Processing: {processing_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - PASS 1 (Timeline): {pass1_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - PASS 2 (Knowledge): {pass2_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - PASS 3 (Persona): {pass3_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        if document_file:
-            log_message = f"   - PASS 4 (Document): {pass4_duration:.2f}s"
+        for log_message in summary_lines:
             print(log_message)
             log_collector.add_log(log_message, status="info")
 
-        log_message = f"   - PASS 5 (Engagement): {pass5_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - FINAL PASS (Integration): {final_pass_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
-        log_message = f"   - TOTAL EXTRACTION TIME: {overall_duration:.2f}s"
-        print(log_message)
-        log_collector.add_log(log_message, status="info")
-
         log_collector.update_progress(100)  # 100% progress - completed
 
         return unified_data
@@ -1897,6 +3927,16 @@ def create_brdge_knowledge(
                 "error_message": str(e),
             },
         }
+    finally:
+        _metrics_sink.reset(metrics_token)
+        _request_priority.reset(priority_token)
+        # Lines logged since the last throttled flush (summary, errors)
+        log_collector.update_database()
+        if metrics_callback and log_collector.metrics:
+            try:
+                metrics_callback(brdge_id, list(log_collector.metrics))
+            except Exception as e:
+                logger.error(f"Metrics callback failed: {e}")
 
 
 def generate_logic_puzzle_challenge(model, job_role: str) -> Optional[Dict[str, Any]]:
@@ -1948,7 +3988,9 @@ def generate_logic_puzzle_challenge(model, job_role: str) -> Optional[Dict[str,
     }}
     """
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "logic_puzzle_challenge", expect_json=True
+        )
         challenge_data = json.loads(response.text)
 
         # Validate required fields
@@ -2099,7 +4141,9 @@ def generate_code_snippet_challenge(
     }}
     """
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "code_snippet_challenge", expect_json=True
+        )
         challenge_data = json.loads(response.text)
 
         # Validate required fields
@@ -2276,7 +4320,9 @@ def generate_system_design_challenge(model, job_role: str) -> Optional[Dict[str,
     }}
     """
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "system_design_challenge", expect_json=True
+        )
         challenge_data = json.loads(response.text)
 
         # Validate required fields
@@ -2464,7 +4510,7 @@ def generate_game_theory_challenge(model, job_role: str) -> Optional[Dict[str, A
     }}
     """
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(model, prompt, "game_theory_challenge", expect_json=True)
         challenge_data = json.loads(response.text)
 
         # Validate required fields
@@ -2564,7 +4610,9 @@ def generate_connect_the_dots_challenge(
     }}
     """
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "connect_the_dots_challenge", expect_json=True
+        )
         challenge_data = json.loads(response.text)
         if not (
             challenge_data.get("stimulus") and challenge_data["stimulus"].get("texts")
@@ -2667,7 +4715,9 @@ def generate_product_sense_challenge(model, job_role: str) -> Optional[Dict[str,
     }}
     """
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "product_sense_challenge", expect_json=True
+        )
         challenge_data = json.loads(response.text)
 
         # Basic validation
@@ -2707,8 +4757,7 @@ def generate_product_sense_challenge(model, job_role: str) -> Optional[Dict[str,
 #      they will use these new generator functions. Ensure get_dynamic_challenge_sequence calls the correct new function names.)
 def get_dynamic_challenge_sequence(job_id_str: str) -> List[Dict[str, Any]]:
     try:
-        # Ensure Gemini is configured (if not done globally)
-        # configure_genai() # Assuming this is called once at app startup or is idempotent
+        configure_genai()  # No-op once the process is configured
         model = get_model(
             model_name=GEMINI_MODEL
         )  # Use the specific flash model for challenges
@@ -2938,7 +4987,9 @@ def validate_solution(
 
                     Return ONLY a JSON object: {{"feedback": "str"}}
                     """
-                    response = model.generate_content(prompt)
+                    response = call_gemini(
+                        model, prompt, "validate_solution", expect_json=True
+                    )
                     feedback_json = json.loads(response.text)
                     return {
                         "is_correct": False,
@@ -3027,7 +5078,7 @@ def validate_solution(
 
             Return ONLY a JSON object: {{"is_correct": true/false, "feedback": "str (Constructive feedback highlighting strengths and potential improvements)"}}
             """
-            response = model.generate_content(prompt)
+            response = call_gemini(model, prompt, "validate_solution", expect_json=True)
             eval_results = json.loads(response.text)
 
             is_correct = eval_results.get("is_correct", False)
@@ -3065,7 +5116,7 @@ def validate_solution(
 
             Return ONLY a JSON object: {{"is_correct": true/false, "feedback": "str (Balanced, encouraging feedback. Default to 'is_correct': true if a reasonable textual explanation is provided.)"}}
             """
-            response = model.generate_content(prompt)
+            response = call_gemini(model, prompt, "validate_solution", expect_json=True)
             eval_results = json.loads(response.text)
             # The prompt guides the LLM to return is_correct: true for reasonable effort.
             # If LLM fails to provide is_correct, defaulting to True makes it more lenient.
@@ -3107,7 +5158,7 @@ def validate_solution(
 
             Return ONLY a JSON object: {{"is_correct": true/false, "feedback": "str (Constructive feedback highlighting strategic insights, alignment of reasoning with chosen option, and areas for deeper consideration)"}}
             """
-            response = model.generate_content(prompt)
+            response = call_gemini(model, prompt, "validate_solution", expect_json=True)
             eval_results = json.loads(response.text)
             is_correct = eval_results.get("is_correct", False)
             feedback = eval_results.get(
@@ -3141,7 +5192,7 @@ def validate_solution(
 
             Return ONLY a JSON object: {{"is_correct": true/false, "feedback": "str (Constructive feedback on the response, highlighting strengths or areas for improvement based on focus points.)"}}
             """
-            response = model.generate_content(prompt)
+            response = call_gemini(model, prompt, "validate_solution", expect_json=True)
             eval_results = json.loads(response.text)
             is_correct = eval_results.get("is_correct", False)
             feedback = eval_results.get(
@@ -3253,7 +5304,7 @@ def generate_http_status_challenge(model, job_role: str) -> Optional[Dict[str, A
 
     try:
         # Generate the challenge
-        response = model.generate_content(prompt)
+        response = call_gemini(model, prompt, "http_status_challenge", expect_json=True)
         challenge_data = json.loads(response.text)
 
         # Validate required fields
@@ -3475,7 +5526,9 @@ def generate_visual_pattern_challenge(model, job_role: str) -> Optional[Dict[str
     """
 
     try:
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "visual_pattern_challenge", expect_json=True
+        )
         challenge_data = json.loads(response.text)
 
         # Validate required fields
@@ -3614,7 +5667,9 @@ def analyze_csv_for_personalization(csv_file_path, sample_rows=5):
         """
 
         # Get analysis from Gemini
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "analyze_csv_for_personalization", expect_json=True
+        )
         analysis = json.loads(response.text)
 
         # Validate the response structure
@@ -3692,7 +5747,12 @@ def update_personalization_template_descriptions(template_columns, usage_feedbac
         }}
         """
 
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model,
+            prompt,
+            "update_personalization_template_descriptions",
+            expect_json=True,
+        )
         improvements = json.loads(response.text)
 
         logger.info(
@@ -3840,7 +5900,9 @@ def analyze_resume_for_career(resume_path: str) -> Dict[str, Any]:
         """
 
         # Generate analysis
-        response = model.generate_content([prompt, resume_file])
+        response = call_gemini(
+            model, [prompt, resume_file], "analyze_resume_for_career", expect_json=True
+        )
         analysis_results = json.loads(response.text)
 
         # Validate the response structure
@@ -4071,7 +6133,12 @@ def analyze_resume_for_career_with_text(resume_path: str) -> Dict[str, Any]:
         """
 
         # Generate analysis with text extraction
-        response = model.generate_content([prompt, resume_file])
+        response = call_gemini(
+            model,
+            [prompt, resume_file],
+            "analyze_resume_for_career_with_text",
+            expect_json=True,
+        )
         analysis_results = json.loads(response.text)
 
         # Validate the response structure
@@ -4295,7 +6362,9 @@ chatTranscript: {json.dumps(chat_transcript, indent=2)}
         # Generate the career strategy ticket
         full_prompt = f"{system_prompt}\n\n{input_data}"
 
-        response = model.generate_content(full_prompt)
+        response = call_gemini(
+            model, full_prompt, "career_strategy_ticket", expect_json=True
+        )
 
         # Parse the JSON response
         try:
@@ -4473,7 +6542,9 @@ def generate_csv_structure(headers, sample_rows, filename="uploaded_file.csv"):
         """
 
         # Get analysis from Gemini
-        response = model.generate_content(analysis_prompt)
+        response = call_gemini(
+            model, analysis_prompt, "csv_structure", expect_json=True
+        )
         analysis = json.loads(response.text)
 
         # Validate the response structure
@@ -4693,7 +6764,7 @@ def generate_ai_consulting_proposal(
         - Package names can be customized if needed
         """
 
-        response = model.generate_content(proposal_prompt)
+        response = call_gemini(model, proposal_prompt, "ai_consulting_proposal")
         proposal_text = response.text.strip()
 
         # Clean up the response to ensure valid JSON
@@ -4977,7 +7048,7 @@ def generate_funnel_chat_response(
         """
 
         # Generate response
-        response = model.generate_content(full_prompt)
+        response = call_gemini(model, full_prompt, "funnel_chat_response")
         ai_response = response.text.strip()
 
         # Log the conversation turn to database
@@ -5223,7 +7294,9 @@ DIAGRAM GENERATION RULES:
 IMPORTANT: Generate a diagram that accurately reflects what was discussed while filling in reasonable architectural patterns and best practices. Focus on creating a visually appealing and technically accurate representation.
 """
 
-        response = model.generate_content(prompt)
+        response = call_gemini(
+            model, prompt, "system_architecture_diagram", expect_json=True
+        )
 
         if not response or not response.text:
             logger.error("Empty response from Gemini for system diagram generation")
@@ -0,0 +1,171 @@
+# gemini_files.py
+"""
+Registry of files already uploaded to the Gemini File API.
+
+Uploads are keyed on the SHA-256 of the local file, so re-processing the same
+recording (a resume, a retry or a re-run after a prompt change) reuses the
+remote file instead of uploading it again and waiting for PROCESSING to end.
+
+Gemini deletes uploaded files after 48 hours. Entries are dropped once they are
+close to their expiry or when the remote file reports FAILED or can no longer
+be found.
+
+The registry file is shared by every worker process on the host; each
+read-modify-write holds an exclusive flock on a sidecar ".lock" file (where
+fcntl exists) so concurrent registrations don't overwrite each other.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+GEMINI_FILE_REGISTRY_PATH = os.getenv(
+    "GEMINI_FILE_REGISTRY_PATH", "/tmp/brdge_gemini_files.json"
+)
+# A reused file must stay valid at least this long so a full extraction fits
+GEMINI_FILE_MIN_TTL_SECONDS = int(os.getenv("GEMINI_FILE_MIN_TTL_SECONDS", "3600"))
+# Used when the SDK doesn't report an expiration time (files live for 48h)
+GEMINI_FILE_DEFAULT_TTL_SECONDS = 47 * 60 * 60
+
+REUSABLE_STATES = ("ACTIVE", "PROCESSING")
+
+
+def _expiry_timestamp(remote_file) -> float:
+    expiration = getattr(remote_file, "expiration_time", None)
+    if expiration is not None and hasattr(expiration, "timestamp"):
+        try:
+            return expiration.timestamp()
+        except (OverflowError, OSError, ValueError):
+            pass
+    return time.time() + GEMINI_FILE_DEFAULT_TTL_SECONDS
+
+
+class GeminiFileRegistry:
+    """
+    Content hash -> remote Gemini file, persisted as a small JSON file.
+
+    The file is re-read before every lookup and update so that uploads made by
+    other worker processes are visible, and every read-modify-write runs under
+    _locked() so they aren't lost either.
+    """
+
+    def __init__(self, path=GEMINI_FILE_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def _locked(self):
+        """The thread lock plus an exclusive flock shared with other processes"""
+        with self._lock:
+            lock_file = None
+            if fcntl is not None:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    lock_file = open(f"{self.path}.lock", "a")
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                except OSError as e:
+                    logger.warning(
+                        f"Gemini file registry not locked across processes: {e}"
+                    )
+                    if lock_file:
+                        lock_file.close()
+                    lock_file = None
+            try:
+                yield
+            finally:
+                if lock_file:
+                    # Closing the file releases the flock
+                    lock_file.close()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable Gemini file registry: {e}")
+            return {}
+        now = time.time()
+        return {
+            content_hash: entry
+            for content_hash, entry in entries.items()
+            if entry.get("expires_at", 0) > now
+        }
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to write Gemini file registry: {e}")
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return a registered upload that is still usable, invalidating stale ones"""
+        with self._locked():
+            self._entries = self._load()
+            entry = self._entries.get(content_hash)
+            if not entry:
+                return None
+            remaining = entry.get("expires_at", 0) - time.time()
+            if (
+                remaining < GEMINI_FILE_MIN_TTL_SECONDS
+                or entry.get("state") not in REUSABLE_STATES
+            ):
+                del self._entries[content_hash]
+                self._save()
+                return None
+            return dict(entry)
+
+    def register(self, content_hash: str, remote_file):
+        """Record (or refresh) the remote file uploaded for this content"""
+        state = remote_file.state.name
+        with self._locked():
+            self._entries = self._load()
+            if state not in REUSABLE_STATES:
+                self._entries.pop(content_hash, None)
+            else:
+                self._entries[content_hash] = {
+                    "name": remote_file.name,
+                    "uri": getattr(remote_file, "uri", None),
+                    "mime_type": getattr(remote_file, "mime_type", None),
+                    "state": state,
+                    "expires_at": _expiry_timestamp(remote_file),
+                    "registered_at": time.time(),
+                }
+            self._save()
+
+    def invalidate(self, content_hash: str):
+        """Forget an upload that Gemini no longer has or that failed processing"""
+        with self._locked():
+            self._entries = self._load()
+            if self._entries.pop(content_hash, None) is not None:
+                self._save()
+
+
+_file_registry = None
+_file_registry_lock = threading.Lock()
+
+
+def get_file_registry() -> GeminiFileRegistry:
+    """Process-wide registry instance"""
+    global _file_registry
+    with _file_registry_lock:
+        if _file_registry is None:
+            _file_registry = GeminiFileRegistry()
+        return _file_registry
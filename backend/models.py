@@ -2,8 +2,10 @@ import uuid
 from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy.orm import deferred
 import json
 import logging
+import zlib
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -254,7 +256,11 @@ class UsageLogs(db.Model):
 class BrdgeScript(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     brdge_id = db.Column(db.Integer, db.ForeignKey("brdge.id"), nullable=False)
-    content = db.Column(db.JSON)  # Stores the transcript in a flexible JSON format
+    # Legacy whole-document JSON; new content lives in script_content_section
+    # (see load_content/store_content) and this is left NULL. Deferred so
+    # sectioned reads never pull it. none_as_null: assigning None stores SQL
+    # NULL, not the JSON value null, so content.isnot(None) finds legacy rows.
+    content = deferred(db.Column(db.JSON(none_as_null=True)))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default="pending")  # pending, completed, failed
     script_metadata = db.Column(
@@ -269,17 +275,298 @@ class BrdgeScript(db.Model):
         ),
     )
 
+    def load_content(self, sections=None):
+        """
+        The knowledge JSON, or only the named top-level sections of it.
+        Only the requested sections are fetched and decompressed; scripts
+        written before sectioned storage are read from the content column.
+        """
+        query = ScriptContentSection.query.filter_by(script_id=self.id)
+        if sections is not None:
+            query = query.filter(ScriptContentSection.name.in_(list(sections)))
+        rows = query.all() if self.id else []
+        if rows:
+            return {row.name: row.decode() for row in rows}
+
+        legacy = self.content or {}
+        if sections is None:
+            return dict(legacy)
+        return {name: legacy[name] for name in sections if name in legacy}
+
+    def content_section_names(self):
+        """Top-level keys present in the content, without decoding any of them"""
+        names = {
+            name
+            for (name,) in db.session.query(ScriptContentSection.name).filter_by(
+                script_id=self.id
+            )
+        }
+        return names or set(self.content or {})
+
+    def store_content(self, content):
+        """Replace the knowledge JSON, one compressed row per top-level key"""
+        if self.id is None:
+            db.session.flush()
+        existing = {row.name: row for row in self.content_sections}
+        for name, value in (content or {}).items():
+            row = existing.pop(name, None)
+            if row is None:
+                row = ScriptContentSection(script_id=self.id, name=name)
+                db.session.add(row)
+            row.encode(value)
+        for row in existing.values():
+            db.session.delete(row)
+        self.content = None
+
+    def update_content(self, sections):
+        """Overwrite just the given top-level sections, leaving the rest untouched"""
+        legacy = self.content
+        if legacy:
+            # First write to an old-style script moves all of it into sections
+            self.store_content({**legacy, **sections})
+            return
+        if self.id is None:
+            db.session.flush()
+        existing = {
+            row.name: row
+            for row in self.content_sections.filter(
+                ScriptContentSection.name.in_(list(sections))
+            )
+        }
+        for name, value in sections.items():
+            row = existing.get(name)
+            if row is None:
+                row = ScriptContentSection(script_id=self.id, name=name)
+                db.session.add(row)
+            row.encode(value)
+
     def to_dict(self):
         return {
             "id": self.id,
             "brdge_id": self.brdge_id,
             "status": self.status,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "content": self.content or {},  # Return the full content object
+            "content": self.load_content(),  # Return the full content object
             "metadata": self.script_metadata,
         }
 
 
+class ScriptContentSection(db.Model):
+    """One top-level key of a script's knowledge JSON (timeline, knowledge_base,
+    teaching_persona, ...), stored as zlib-compressed JSON"""
+
+    __tablename__ = "script_content_section"
+    __table_args__ = (
+        db.UniqueConstraint("script_id", "name", name="uq_script_content_section"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    script_id = db.Column(
+        db.Integer, db.ForeignKey("brdge_script.id"), nullable=False, index=True
+    )
+    name = db.Column(db.String(64), nullable=False)
+    # MEDIUMBLOB on MySQL; a long timeline can exceed BLOB's 64KB even compressed
+    data = db.Column(db.LargeBinary(length=16 * 1024 * 1024), nullable=False)
+    raw_bytes = db.Column(db.Integer, nullable=False)  # Size before compression
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    script = db.relationship(
+        "BrdgeScript",
+        backref=db.backref(
+            "content_sections", cascade="all, delete-orphan", lazy="dynamic"
+        ),
+    )
+
+    def encode(self, value):
+        raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+        self.data = zlib.compress(raw, 6)
+        self.raw_bytes = len(raw)
+
+    def decode(self):
+        return json.loads(zlib.decompress(self.data))
+
+
+class AgentContext(db.Model):
+    """Precompiled agent-config payload and prompt context for a script
+    (see agent_context.py), rebuilt whenever the script content changes"""
+
+    __tablename__ = "agent_context"
+
+    id = db.Column(db.Integer, primary_key=True)
+    script_id = db.Column(
+        db.Integer, db.ForeignKey("brdge_script.id"), nullable=False, unique=True
+    )
+    version = db.Column(db.Integer, nullable=False)
+    # Minified JSON, served as-is; MEDIUMTEXT on MySQL
+    config = db.Column(db.Text(length=16 * 1024 * 1024), nullable=False)
+    prompt = db.Column(db.Text(length=16 * 1024 * 1024), nullable=False)
+    # Windowed prompt index, only for scripts over the prompt token budget
+    windowed = db.Column(db.Text(length=16 * 1024 * 1024), nullable=True)
+    generated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    script = db.relationship(
+        "BrdgeScript",
+        backref=db.backref(
+            "agent_context", cascade="all, delete-orphan", uselist=False
+        ),
+    )
+
+
+class ScriptRetrievalIndex(db.Model):
+    """BM25 retrieval index over a script's knowledge base, QA pairs and
+    timeline (see retrieval.py), stored as zlib-compressed JSON"""
+
+    __tablename__ = "script_retrieval_index"
+
+    id = db.Column(db.Integer, primary_key=True)
+    script_id = db.Column(
+        db.Integer, db.ForeignKey("brdge_script.id"), nullable=False, unique=True
+    )
+    version = db.Column(db.Integer, nullable=False)
+    document_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary(length=16 * 1024 * 1024), nullable=False)
+    raw_bytes = db.Column(db.Integer, nullable=False)  # Size before compression
+    generated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    script = db.relationship(
+        "BrdgeScript",
+        backref=db.backref(
+            "retrieval_index", cascade="all, delete-orphan", uselist=False
+        ),
+    )
+
+    def encode(self, index):
+        raw = json.dumps(index, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+        self.data = zlib.compress(raw, 6)
+        self.raw_bytes = len(raw)
+        self.version = index["version"]
+        self.document_count = len(index["documents"])
+
+    def decode(self):
+        return json.loads(zlib.decompress(self.data))
+
+
+class ExtractionCheckpoint(db.Model):
+    """Output of one completed extraction pass, so failed ingestions can resume"""
+
+    __tablename__ = "extraction_checkpoint"
+    __table_args__ = (
+        db.UniqueConstraint("script_id", "pass_name", name="uq_checkpoint_pass"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    script_id = db.Column(
+        db.Integer, db.ForeignKey("brdge_script.id"), nullable=False, index=True
+    )
+    pass_name = db.Column(db.String(50), nullable=False)  # e.g. knowledge_base
+    data = db.Column(db.JSON, nullable=False)  # Raw JSON output of the pass
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    script = db.relationship(
+        "BrdgeScript",
+        backref=db.backref("checkpoints", cascade="all, delete-orphan", lazy="dynamic"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "script_id": self.script_id,
+            "pass_name": self.pass_name,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class ScriptLog(db.Model):
+    """Append-only ingestion log line; replaces the logs list in script_metadata"""
+
+    __tablename__ = "script_log"
+
+    id = db.Column(db.Integer, primary_key=True)
+    script_id = db.Column(
+        db.Integer, db.ForeignKey("brdge_script.id"), nullable=False, index=True
+    )
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default="info")  # info, success, error
+    progress = db.Column(db.Integer, nullable=True)  # Script progress when written
+    logged_at = db.Column(db.Float, nullable=False)  # Unix time the line was logged
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    script = db.relationship(
+        "BrdgeScript",
+        backref=db.backref("log_lines", cascade="all, delete-orphan", lazy="dynamic"),
+    )
+
+    def to_dict(self):
+        # Same shape as the entries LogCollector used to store in script_metadata
+        return {
+            "id": self.id,
+            "message": self.message,
+            "status": self.status,
+            "timestamp": self.logged_at,
+            "progress": self.progress,
+        }
+
+
+class GeminiCallMetric(db.Model):
+    """One Gemini call (generate or upload) made while processing a script"""
+
+    __tablename__ = "gemini_call_metric"
+
+    id = db.Column(db.Integer, primary_key=True)
+    script_id = db.Column(
+        db.Integer, db.ForeignKey("brdge_script.id"), nullable=True, index=True
+    )
+    pass_name = db.Column(db.String(64), nullable=False, index=True)
+    model = db.Column(db.String(100), nullable=True)
+    input_tokens = db.Column(db.Integer, default=0)
+    output_tokens = db.Column(db.Integer, default=0)
+    wall_time = db.Column(db.Float, nullable=False)  # Seconds
+    bytes_uploaded = db.Column(db.BigInteger, default=0)
+    retries = db.Column(db.Integer, default=0)
+    outcome = db.Column(db.String(20), nullable=False)  # success, error, reused
+    error = db.Column(db.Text, nullable=True)
+    # Streamed calls only: seconds until the first item was parsed
+    time_to_first_item = db.Column(db.Float, nullable=True)
+    # Seconds spent waiting on the rate limiter before the call
+    queue_wait = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    script = db.relationship(
+        "BrdgeScript",
+        backref=db.backref(
+            "gemini_metrics", cascade="all, delete-orphan", lazy="dynamic"
+        ),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "script_id": self.script_id,
+            "pass_name": self.pass_name,
+            "model": self.model,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "wall_time": self.wall_time,
+            "bytes_uploaded": self.bytes_uploaded,
+            "retries": self.retries,
+            "outcome": self.outcome,
+            "error": self.error,
+            "time_to_first_item": self.time_to_first_item,
+            "queue_wait": self.queue_wait,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
 class KnowledgeBase(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     brdge_id = db.Column(db.Integer, db.ForeignKey("brdge.id"), nullable=False)
@@ -635,6 +922,19 @@ class ConversationLogs(db.Model):
         }
 
 
+class AgentLogBatch(db.Model):
+    """A usage/conversation log batch the voice agent already delivered, so a
+    batch resent after a timeout hid the response isn't stored twice"""
+
+    __tablename__ = "agent_log_batch"
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(64), nullable=False, unique=True)
+    brdge_id = db.Column(db.Integer, db.ForeignKey("brdge.id"), nullable=True)
+    row_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
 class PersonalizationTemplate(db.Model):
     """Stores personalization schema for a bridge"""
 
@@ -0,0 +1,246 @@
+# retrieval.py
+"""
+Lexical (BM25) retrieval over a script's knowledge base, QA pairs and video
+timeline, so the voice agent can look facts up on demand instead of carrying
+all of them in its system prompt.
+
+The index is built once when ingestion completes and stored next to the
+script (ScriptRetrievalIndex). BM25 weights are computed at build time, so a
+query only adds up precomputed weights from the postings of its terms:
+
+    index = RetrievalIndex.build(script.load_content(RETRIEVAL_SECTIONS))
+    stored = index.to_dict()  # JSON-serializable
+    results = RetrievalIndex.from_dict(stored).search("pricing tiers", k=5)
+
+Bump RETRIEVAL_INDEX_VERSION whenever the index layout or tokenization
+changes; stored indexes with an older version are rebuilt on their next read.
+"""
+
+import heapq
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+RETRIEVAL_INDEX_VERSION = 1
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# Leave knowledge base and QA entries out of the agent's system prompt and rely
+# on the search tool for them
+RETRIEVAL_ONLY_KNOWLEDGE = (
+    os.getenv("RETRIEVAL_ONLY_KNOWLEDGE", "false").lower() == "true"
+)
+
+# Script content sections the index is built from
+RETRIEVAL_SECTIONS = ["knowledge_base", "qa_pairs", "video_timeline", "timeline"]
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Characters of a document's text returned to the LLM per result
+RESULT_TEXT_CHARS = 800
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+    a an and are as at be but by can did do does for from had has have how i if
+    in into is it its me my no not of on or our so than that the their them then
+    there these they this to was we were what when where which who why will with
+    would you your
+    """.split())
+# Keys that hold ids and locations rather than text worth searching
+SKIP_KEYS = frozenset({"id", "type", "section_id", "step_number"})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords, with plurals made singular"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif token.endswith(("sses", "xes", "ches", "shes")):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _strings(value: Any, key: Optional[str] = None) -> List[str]:
+    """All searchable strings inside an entry, in order"""
+    if key in SKIP_KEYS or (key or "").endswith("_location"):
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, dict):
+        return [s for k, v in value.items() for s in _strings(v, k)]
+    if isinstance(value, list):
+        return [s for v in value for s in _strings(v, key)]
+    return []
+
+
+def build_documents(content: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    One document per timeline section summary and segment, knowledge base
+    list entry and QA pair. Entries that point at a timeline section get that
+    section's start time.
+    """
+    documents = []
+    timeline = content.get("video_timeline") or content.get("timeline") or {}
+    sections = (
+        timeline.get("pedagogical_structure") or []
+        if isinstance(timeline, dict)
+        else []
+    )
+    section_starts = {}
+    for section in sections:
+        if section.get("id") and section.get("start_time"):
+            section_starts[section["id"]] = section["start_time"]
+        if section.get("summary"):
+            documents.append(
+                {
+                    "kind": "section",
+                    "title": section.get("title", ""),
+                    "timestamp": section.get("start_time"),
+                    "text": section["summary"],
+                }
+            )
+        for segment in section.get("segments") or []:
+            if segment.get("id") and segment.get("start_time"):
+                section_starts[segment["id"]] = segment["start_time"]
+            text = " ".join(
+                _strings(
+                    {
+                        key: segment.get(key)
+                        for key in ("key_points", "transcript", "visual_content")
+                    }
+                )
+            )
+            if text:
+                documents.append(
+                    {
+                        "kind": "segment",
+                        "title": segment.get("title", ""),
+                        "timestamp": segment.get("start_time"),
+                        "text": text,
+                    }
+                )
+
+    def add_entry(kind, entry):
+        strings = _strings(entry)
+        if not strings:
+            return
+        title = ""
+        timestamp = None
+        if isinstance(entry, dict):
+            title = entry.get("name") or entry.get("title")
+            timestamp = entry.get("timestamp") or entry.get("start_time")
+            if timestamp is None:
+                for location_key in ("source_location", "evidence_location"):
+                    location = entry.get(location_key)
+                    if isinstance(location, dict):
+                        timestamp = section_starts.get(location.get("section_id"))
+                        if timestamp:
+                            break
+        documents.append(
+            {
+                "kind": kind,
+                "title": title or "",
+                "timestamp": timestamp if isinstance(timestamp, str) else None,
+                "text": " ".join(strings),
+            }
+        )
+
+    knowledge_base = content.get("knowledge_base") or {}
+    if isinstance(knowledge_base, dict):
+        for key, value in knowledge_base.items():
+            if isinstance(value, list):
+                for entry in value:
+                    add_entry(key, entry)
+    for entry in content.get("qa_pairs") or []:
+        add_entry("qa_pair", entry)
+    return documents
+
+
+class RetrievalIndex:
+    """BM25 index with weights precomputed per (term, document)"""
+
+    def __init__(
+        self, documents: List[Dict[str, Any]], postings: Dict[str, List[List]]
+    ):
+        self.documents = documents
+        # term -> [[document index, BM25 weight], ...]
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def build(cls, content: Dict[str, Any]) -> "RetrievalIndex":
+        documents = build_documents(content)
+        term_counts = []
+        for document in documents:
+            counts: Dict[str, int] = {}
+            for token in tokenize(f"{document['title']} {document['text']}"):
+                counts[token] = counts.get(token, 0) + 1
+            term_counts.append(counts)
+
+        lengths = [sum(counts.values()) for counts in term_counts]
+        average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        document_frequency: Dict[str, int] = {}
+        for counts in term_counts:
+            for token in counts:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+
+        total = len(documents)
+        postings: Dict[str, List[List]] = {}
+        for index, counts in enumerate(term_counts):
+            norm = BM25_K1 * (
+                1 - BM25_B + BM25_B * lengths[index] / (average_length or 1.0)
+            )
+            for token, frequency in counts.items():
+                df = document_frequency[token]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                weight = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                postings.setdefault(token, []).append([index, round(weight, 4)])
+        return cls(documents, postings)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": RETRIEVAL_INDEX_VERSION,
+            "documents": self.documents,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RetrievalIndex":
+        return cls(data.get("documents") or [], data.get("postings") or {})
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+        """The k best-scoring documents for query, each with its score"""
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            for index, weight in self.postings.get(token, ()):
+                scores[index] = scores.get(index, 0.0) + weight
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            dict(self.documents[index], score=round(score, 3)) for index, score in best
+        ]
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Search results as plain text for the LLM"""
+    if not results:
+        return "No matching information found."
+    lines = []
+    for number, result in enumerate(results, 1):
+        text = result["text"]
+        if len(text) > RESULT_TEXT_CHARS:
+            text = text[:RESULT_TEXT_CHARS].rsplit(" ", 1)[0] + "..."
+        where = f" at {result['timestamp']}" if result.get("timestamp") else ""
+        title = result.get("title")
+        # Entries usually repeat their name at the start of their text
+        title = f" {title}:" if title and not text.startswith(title) else ""
+        lines.append(f"{number}. [{result['kind']}{where}]{title} {text}")
+    return "\n".join(lines)
@@ -1,6 +1,7 @@
 # routes.py
 # brian voice :nPczCjzI2devNBz1zQrb
 import re
+import math
 from flask import (
     request,
     jsonify,
@@ -49,7 +50,23 @@ from models import (
     IntelligenceRecord,  # Add IntelligenceRecord model
     OutreachTemplate,  # Add OutreachTemplate model
     FulfillmentLog,  # Add FulfillmentLog model
+    ExtractionCheckpoint,
+    GeminiCallMetric,
+    ScriptLog,
+    ScriptContentSection,
+    AgentContext,
+    ScriptRetrievalIndex,
+    AgentLogBatch,
 )
+from agent_context import (
+    AGENT_CONTEXT_SECTIONS,
+    AGENT_CONTEXT_VERSION,
+    agent_config_fields,
+    build_agent_context,
+    dumps_compact,
+    splice_json_object,
+)
+from retrieval import RETRIEVAL_INDEX_VERSION, RETRIEVAL_SECTIONS, RetrievalIndex
 from utils import (
     clone_voice_helper,
     pdf_to_images,
@@ -57,15 +74,19 @@ from utils import (
     align_transcript_with_slides,
     generate_voice_helper,
     convert_webm_to_mp4,
+    create_analysis_proxy,
+    ANALYSIS_PROXY_ENABLED,
+    ANALYSIS_PROXY_PROFILE,
 )
 from io import BytesIO
 import botocore
 import json
 from werkzeug.security import check_password_hash, generate_password_hash
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from jwt import encode, decode, ExpiredSignatureError, InvalidTokenError
 from datetime import datetime, timedelta
 from werkzeug.exceptions import RequestEntityTooLarge
-from functools import wraps
+from functools import partial, wraps
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 import logging
 from google.oauth2 import id_token
@@ -87,17 +108,20 @@ import asyncio
 from botocore.config import Config  # Add this import at the top
 from threading import Thread
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.exc import IntegrityError
 
 # Import the full module, not just the function
 from sqlalchemy.orm.attributes import flag_modified
 from dotenv import load_dotenv
 import ffmpeg
 import time
+import zlib
 import threading
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import gemini
+from extraction_cache import get_extraction_cache
 from email import encoders
 from email.mime.base import MIMEBase
 from chat_prompts import ai_consultant_prompt
@@ -392,7 +416,26 @@ def delete_brdge(user, brdge_id):
             # 2. Delete personalization templates
             PersonalizationTemplate.query.filter_by(brdge_id=brdge_id).delete()
 
-            # 3. Delete associated scripts
+            # 3. Delete associated scripts. A bulk delete skips the ORM
+            # cascades, so remove their child rows first
+            script_ids = [
+                script_id
+                for (script_id,) in db.session.query(BrdgeScript.id).filter_by(
+                    brdge_id=brdge_id
+                )
+            ]
+            if script_ids:
+                for child in (
+                    ScriptContentSection,
+                    AgentContext,
+                    ScriptRetrievalIndex,
+                    ExtractionCheckpoint,
+                    ScriptLog,
+                    GeminiCallMetric,
+                ):
+                    child.query.filter(child.script_id.in_(script_ids)).delete(
+                        synchronize_session=False
+                    )
             BrdgeScript.query.filter_by(brdge_id=brdge_id).delete()
 
             # 4. Delete any course modules that reference this brdge
@@ -482,39 +525,196 @@ def upload_image_to_s3(args):
         return False
 
 
+class ScriptLogWriter:
+    """
+    LogCollector callback that appends only the lines it hasn't written yet to
+    script_log (one batched INSERT per flush) and keeps just the progress value
+    in script_metadata.
+    """
+
+    def __init__(self, script_id):
+        self.script_id = script_id
+        self.written = 0
+        self.progress = None
+        self._lock = threading.Lock()
+
+    def __call__(self, brdge_id, logs, progress=0):
+        with self._lock:
+            new_logs = logs[self.written :]
+            if not new_logs and progress == self.progress:
+                return
+            try:
+                db.session.add_all(
+                    [
+                        ScriptLog(
+                            script_id=self.script_id,
+                            message=entry["message"],
+                            status=entry.get("status", "info"),
+                            progress=progress,
+                            logged_at=entry.get("timestamp", time.time()),
+                        )
+                        for entry in new_logs
+                    ]
+                )
+                if progress != self.progress:
+                    script = BrdgeScript.query.get(self.script_id)
+                    if script:
+                        script.script_metadata = {
+                            **(script.script_metadata or {}),
+                            "progress": progress,
+                        }
+                db.session.commit()
+                self.written += len(new_logs)
+                self.progress = progress
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error writing script logs: {e}")
+
+
+def append_script_log(script_id, message, status="info", progress=None):
+    """Add a single line to a script's log outside of an extraction run"""
+    db.session.add(
+        ScriptLog(
+            script_id=script_id,
+            message=message,
+            status=status,
+            progress=progress,
+            logged_at=time.time(),
+        )
+    )
+
+
+def clear_reextracting(script):
+    """Drop the flag that marks a settings re-extraction as running"""
+    script.script_metadata = {
+        key: value
+        for key, value in (script.script_metadata or {}).items()
+        if key != "reextracting"
+    }
+
+
 def process_brdge_content(
     brdge_id,
     video_path,
     pdf_path=None,
     bridge_type="course",
     additional_instructions="",
+    resume_script_id=None,
+    reextract_script_id=None,
 ):
-    """Process uploaded content using Gemini and create a script"""
+    """Process uploaded content using Gemini and create a script
+
+    When resume_script_id is given, the existing (failed) script is reused and
+    any passes it already checkpointed are not sent to Gemini again.
+
+    When reextract_script_id is given, the script's bridge settings changed:
+    its timelines and knowledge base are reused and only the passes that depend
+    on the settings re-run. The old content and status stay live until the new
+    content lands; the run is tracked with a `reextracting` metadata flag.
+    """
+    script_id = None
     try:
-        # Create initial script object with pending status
-        script = BrdgeScript(
-            brdge_id=brdge_id,
-            content={},
-            status="pending",
-            script_metadata={"logs": [], "progress": 0},
+        checkpoints = {}
+        previous_outputs = None
+        script = BrdgeScript.query.get(resume_script_id) if resume_script_id else None
+        reextract_script = (
+            BrdgeScript.query.get(reextract_script_id) if reextract_script_id else None
         )
-        db.session.add(script)
-        db.session.commit()
+        if script:
+            checkpoints = {
+                checkpoint.pass_name: checkpoint.data
+                for checkpoint in script.checkpoints
+            }
+            script.status = "pending"
+            db.session.commit()
+        elif reextract_script:
+            script = reextract_script
+            previous_outputs = {
+                checkpoint.pass_name: checkpoint.data
+                for checkpoint in script.checkpoints
+            }
+            if not {"video_timeline", "knowledge_base"} <= set(previous_outputs):
+                # Extracted before checkpoints were kept
+                previous_outputs = gemini.pass_outputs_from_unified(
+                    script.load_content(
+                        [
+                            "video_timeline",
+                            "document_timeline",
+                            "knowledge_base",
+                            "document_knowledge",
+                        ]
+                    )
+                )
+            # Stale outputs must not be picked up if this run has to be resumed
+            ExtractionCheckpoint.query.filter(
+                ExtractionCheckpoint.script_id == script.id,
+                ExtractionCheckpoint.pass_name.in_(
+                    gemini.settings_dependent_pass_names()
+                ),
+            ).delete(synchronize_session=False)
+            script.script_metadata = {
+                **(script.script_metadata or {}),
+                "reextracting": True,
+            }
+            db.session.commit()
+        else:
+            # Create initial script object with pending status
+            script = BrdgeScript(
+                brdge_id=brdge_id,
+                status="pending",
+                script_metadata={"progress": 0},
+            )
+            db.session.add(script)
+            db.session.commit()
+        script_id = script.id
 
-        # Define callback to update the script with logs
-        def update_script_logs(brdge_id, logs, progress=0):
+        # Append new log lines to script_log in batches instead of rewriting metadata
+        update_script_logs = ScriptLogWriter(script_id)
+
+        # Persist each pass as it finishes so a failed job can be resumed
+        def save_checkpoint(brdge_id, pass_name, data):
             try:
-                # Get the latest script for this brdge
-                script = (
-                    BrdgeScript.query.filter_by(brdge_id=brdge_id)
-                    .order_by(BrdgeScript.id.desc())
-                    .first()
+                checkpoint = ExtractionCheckpoint.query.filter_by(
+                    script_id=script_id, pass_name=pass_name
+                ).first()
+                if checkpoint:
+                    checkpoint.data = data
+                else:
+                    db.session.add(
+                        ExtractionCheckpoint(
+                            script_id=script_id, pass_name=pass_name, data=data
+                        )
+                    )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error saving checkpoint {pass_name}: {e}")
+
+        def save_metrics(brdge_id, records):
+            try:
+                db.session.add_all(
+                    [
+                        GeminiCallMetric(
+                            script_id=script_id,
+                            pass_name=record["pass_name"],
+                            model=record["model"],
+                            input_tokens=record["input_tokens"],
+                            output_tokens=record["output_tokens"],
+                            wall_time=record["wall_time"],
+                            bytes_uploaded=record["bytes_uploaded"],
+                            retries=record["retries"],
+                            outcome=record["outcome"],
+                            error=record["error"],
+                            time_to_first_item=record.get("time_to_first_item"),
+                            queue_wait=record.get("queue_wait"),
+                        )
+                        for record in records
+                    ]
                 )
-                if script:
-                    script.script_metadata = {"logs": logs, "progress": progress}
-                    db.session.commit()
+                db.session.commit()
             except Exception as e:
-                logger.error(f"Error updating script logs: {e}")
+                db.session.rollback()
+                logger.error(f"Error saving Gemini call metrics: {e}")
 
         # Call the Gemini processing with the callback
         knowledge = gemini.create_brdge_knowledge(
@@ -524,17 +724,36 @@ def process_brdge_content(
             callback=update_script_logs,
             bridge_type=bridge_type,
             additional_instructions=additional_instructions,
+            checkpoints=checkpoints,
+            checkpoint_callback=save_checkpoint,
+            # Gemini gets a small analysis copy; the original stays in S3 for playback
+            video_proxy_builder=(
+                partial(create_analysis_proxy, profile=ANALYSIS_PROXY_PROFILE)
+                if ANALYSIS_PROXY_ENABLED
+                else None
+            ),
+            video_proxy_profile=ANALYSIS_PROXY_PROFILE,
+            metrics_callback=save_metrics,
+            previous_outputs=previous_outputs,
         )
 
         # Update with final results
-        script = (
-            BrdgeScript.query.filter_by(brdge_id=brdge_id)
-            .order_by(BrdgeScript.id.desc())
-            .first()
-        )
+        script = BrdgeScript.query.get(script_id)
         if script:
-            script.content = knowledge
-            script.status = "completed"
+            if reextract_script_id:
+                clear_reextracting(script)
+            if isinstance(knowledge, dict) and knowledge.get("error"):
+                # Keep the checkpoints around so the job can be resumed; a
+                # re-extracted script keeps serving its old content
+                if not reextract_script_id:
+                    script.status = "failed"
+            else:
+                # Only the extracted sections are replaced; model_config,
+                # agent_personality, qa_pairs etc. written alongside them stay
+                script.update_content(knowledge)
+                refresh_agent_context(script)
+                refresh_retrieval_index(script)
+                script.status = "completed"
             db.session.commit()
             return script
         else:
@@ -542,25 +761,17 @@ def process_brdge_content(
             return None
     except Exception as e:
         logger.error(f"Error processing content: {str(e)}")
-        # Update script status to failed if it exists
-        script = (
-            BrdgeScript.query.filter_by(brdge_id=brdge_id)
-            .order_by(BrdgeScript.id.desc())
-            .first()
-        )
+        db.session.rollback()
+        # Mark the script failed; a re-extracted one keeps its live status
+        failed_script_id = script_id or reextract_script_id or resume_script_id
+        script = BrdgeScript.query.get(failed_script_id) if failed_script_id else None
         if script:
-            script.status = "failed"
-            script.script_metadata = {
-                "error": str(e),
-                "logs": script.script_metadata.get("logs", [])
-                + [
-                    {
-                        "message": f"Error: {str(e)}",
-                        "status": "error",
-                        "timestamp": time.time(),
-                    }
-                ],
-            }
+            if reextract_script_id:
+                clear_reextracting(script)
+            else:
+                script.status = "failed"
+            script.script_metadata = {**(script.script_metadata or {}), "error": str(e)}
+            append_script_log(script.id, f"Error: {str(e)}", status="error")
             db.session.commit()
         return script
 
@@ -738,7 +949,6 @@ def create_brdge(user):
         # Create initial script object with pending status
         script = BrdgeScript(
             brdge_id=brdge.id,
-            content={},
             status="pending",
             script_metadata={"logs": [], "progress": 0},
         )
@@ -771,14 +981,10 @@ def create_brdge(user):
                             )
                             if script:
                                 script.status = "failed"
-                                if not script.script_metadata:
-                                    script.script_metadata = {"logs": [], "progress": 0}
-                                script.script_metadata["logs"].append(
-                                    {
-                                        "message": f"Processing failed: {str(e)}",
-                                        "status": "error",
-                                        "timestamp": time.time(),
-                                    }
+                                append_script_log(
+                                    script.id,
+                                    f"Processing failed: {str(e)}",
+                                    status="error",
                                 )
                                 db.session.commit()
                         except Exception as db_error:
@@ -2028,6 +2234,86 @@ def check_brdge_auth(brdge_id):
         return jsonify({"error": "Internal server error"}), 500
 
 
+def refresh_agent_context(script):
+    """Rebuild the precompiled agent context after the script content changed"""
+    artifact = build_agent_context(script.load_content(AGENT_CONTEXT_SECTIONS))
+    context = script.agent_context
+    if context is None:
+        context = AgentContext(script_id=script.id)
+        db.session.add(context)
+    context.version = artifact["version"]
+    context.config = artifact["config"]
+    context.prompt = artifact["prompt"]
+    context.windowed = artifact["windowed"]
+    return context
+
+
+def get_agent_context(script):
+    """The stored agent context, built on first read or after a version bump"""
+    context = script.agent_context
+    if context is None or context.version != AGENT_CONTEXT_VERSION:
+        context = refresh_agent_context(script)
+        db.session.commit()
+    return context
+
+
+def refresh_retrieval_index(script):
+    """Rebuild the script's retrieval index from its knowledge content"""
+    start = time.time()
+    index = RetrievalIndex.build(script.load_content(RETRIEVAL_SECTIONS))
+    stored = script.retrieval_index
+    if stored is None:
+        stored = ScriptRetrievalIndex(script_id=script.id)
+        db.session.add(stored)
+    stored.encode(index.to_dict())
+    logger.info(
+        f"🔎 Built retrieval index for script {script.id}: {len(index)} documents, "
+        f"{len(index.postings)} terms, {len(stored.data)} bytes in "
+        f"{(time.time() - start) * 1000:.0f}ms"
+    )
+    return stored
+
+
+def get_retrieval_index(script):
+    """The stored retrieval index, built on first read or after a version bump"""
+    stored = script.retrieval_index
+    if stored is None or stored.version != RETRIEVAL_INDEX_VERSION:
+        stored = refresh_retrieval_index(script)
+        db.session.commit()
+    return stored
+
+
+@app.route("/api/brdges/<int:brdge_id>/retrieval-index", methods=["GET"])
+@cross_origin()
+def get_brdge_retrieval_index(brdge_id):
+    """The latest script's retrieval index, loaded once per agent session"""
+    try:
+        script = (
+            BrdgeScript.query.filter_by(brdge_id=brdge_id)
+            .order_by(BrdgeScript.id.desc())
+            .first()
+        )
+        if not script:
+            return jsonify({"error": "No script found for this brdge"}), 404
+
+        stored = get_retrieval_index(script)
+        # The stored zlib stream is a valid HTTP "deflate" body; send it as-is
+        # to clients that accept it
+        if "deflate" in request.accept_encodings:
+            response = Response(stored.data, mimetype="application/json")
+            response.headers["Content-Encoding"] = "deflate"
+        else:
+            response = Response(
+                zlib.decompress(stored.data), mimetype="application/json"
+            )
+        response.headers["Cache-Control"] = "no-cache"
+        return response, 200
+
+    except Exception as e:
+        logger.error(f"Error fetching retrieval index: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 # Add this new route for getting agent configuration
 @app.route("/api/brdges/<int:brdge_id>/agent-config", methods=["GET"])
 @cross_origin()
@@ -2133,38 +2419,29 @@ def get_agent_config(brdge_id):
         if not script:
             return jsonify({"error": "No script found for this brdge"}), 404
 
-        # Create simplified agent personality with only the editable fields
-        simplified_agent_personality = {
-            "name": "AI Assistant",
-            "persona_background": "A helpful AI assistant",
-            "communication_style": "friendly",
-        }
-
-        if script.content and "agent_personality" in script.content:
-            content = script.content
-            agent_personality = content.get("agent_personality", {})
-
-            # Only include the three editable fields
-            if "name" in agent_personality:
-                simplified_agent_personality["name"] = agent_personality["name"]
-            if "persona_background" in agent_personality:
-                simplified_agent_personality["persona_background"] = agent_personality[
-                    "persona_background"
-                ]
-            if "communication_style" in agent_personality:
-                simplified_agent_personality["communication_style"] = agent_personality[
-                    "communication_style"
-                ]
+        # Script-derived fields come precompiled; ?sections=a,b builds just
+        # those sections instead
+        requested = request.args.get("sections")
+        if requested:
+            sections = [s for s in requested.split(",") if s in AGENT_CONTEXT_SECTIONS]
+            config_json = dumps_compact(
+                agent_config_fields(script.load_content(sections))
+            )
+            prompt_json = windowed_json = None
+        else:
+            context = get_agent_context(script)
+            config_json, prompt_json = context.config, context.prompt
+            windowed_json = context.windowed
 
-        # Construct response
+        # Per-request fields, spliced in front of the precompiled config
         response = {
             "personality": brdge.agent_personality or "friendly AI assistant",
-            "agentPersonality": simplified_agent_personality,
             "knowledgeBase": [],
             "personalization_data": personalization_data,  # Add personalization data
             "personalization_record_id": (
                 personalization_record.id if personalization_record else None
             ),
+            "brdge": brdge.to_dict(),
         }
 
         if personalization_data:
@@ -2185,41 +2462,25 @@ def get_agent_config(brdge_id):
                 }
             )
 
-        # Include data from script content
-        if script.content:
-            # Add teaching_persona to the response
-            if "teaching_persona" in script.content:
-                response["teaching_persona"] = script.content.get("teaching_persona")
-
-            # Add engagement_opportunities to the response
-            if "engagement_opportunities" in script.content:
-                opportunities = script.content.get("engagement_opportunities")
-                logger.info(f"Found {len(opportunities)} engagement opportunities")
-                response["engagement_opportunities"] = opportunities
-
-            # Add timeline to the response (from video_timeline or timeline)
-            if "video_timeline" in script.content:
-                response["timeline"] = script.content.get("video_timeline")
-            elif "timeline" in script.content:
-                response["timeline"] = script.content.get("timeline")
-
-            # Add knowledge_base to the response
-            if "knowledge_base" in script.content:
-                response["knowledge_base"] = script.content.get("knowledge_base")
-
-            # Add qa_pairs to the response if available
-            if "qa_pairs" in script.content:
-                response["qa_pairs"] = script.content.get("qa_pairs")
-
-            # Add model_config to the response if available
-            if "model_config" in script.content:
-                response["model_config"] = script.content.get("model_config")
-
-            # Add brdge data for completeness
-            response["brdge"] = brdge.to_dict()
+        # The agent asks for the static prompt context to splice its session
+        # into, or for long scripts the windowed index it selects from
+        tail = None
+        if windowed_json and request.args.get("prompt_context"):
+            tail = {
+                "windowed_context": windowed_json,
+                "context_version": AGENT_CONTEXT_VERSION,
+            }
+        elif prompt_json and request.args.get("prompt_context"):
+            tail = {
+                "prompt_context": prompt_json,
+                "context_version": AGENT_CONTEXT_VERSION,
+            }
 
         # Cache control headers to ensure fresh data
-        response_obj = jsonify(response)
+        response_obj = Response(
+            splice_json_object(response, config_json, tail),
+            mimetype="application/json",
+        )
         response_obj.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
         response_obj.headers["Pragma"] = "no-cache"
         response_obj.headers["Expires"] = "0"
@@ -2276,8 +2537,8 @@ def update_agent_config(brdge_id):
                 200,
             )
 
-        # Make a deep copy of the content to avoid reference issues
-        content = script.content.copy() if script.content else {}
+        # Only the sections this endpoint edits are loaded and written back
+        content = script.load_content(["teaching_persona", "engagement_opportunities"])
 
         # Handle teaching_persona updates directly
         if "teaching_persona" in data and isinstance(data["teaching_persona"], dict):
@@ -2397,8 +2658,8 @@ def update_agent_config(brdge_id):
             )
 
         # Update the script content
-        script.content = content
-        flag_modified(script, "content")
+        script.update_content(content)
+        refresh_agent_context(script)
         script.updated_at = datetime.utcnow()
         db.session.commit()
 
@@ -2450,11 +2711,15 @@ def get_brdge_script_content(brdge_id):
                 404,
             )
 
+        # ?sections=a,b returns just those top-level sections
+        requested = request.args.get("sections")
+        sections = [s for s in requested.split(",") if s] if requested else None
+
         # Return the script content with cache control headers
         response = jsonify(
             {
                 "status": script.status,
-                "content": script.content,
+                "content": script.load_content(sections),
                 "metadata": script.script_metadata,
             }
         )
@@ -2670,8 +2935,8 @@ def get_model_config(brdge_id):
             .first()
         )
 
-        if script and script.content and isinstance(script.content, dict):
-            model_config = script.content.get("model_config", {})
+        if script:
+            model_config = script.load_content(["model_config"]).get("model_config")
             if model_config:
                 return jsonify(model_config), 200
 
@@ -2720,26 +2985,22 @@ def update_model_config(brdge_id):
 
         if not script:
             # If no script exists, create one with just model config
-            script = BrdgeScript(
-                brdge_id=brdge_id, content={"model_config": {}}, status="pending"
-            )
+            script = BrdgeScript(brdge_id=brdge_id, status="pending")
             db.session.add(script)
             db.session.flush()  # Ensure we get the ID
 
-        # Ensure content is a dictionary
-        if not script.content:
-            script.content = {}
-
         # Update model configuration in script content
-        script.content["model_config"] = {
-            "mode": mode,
-            "standard_model": standard_model,
-            "realtime_model": realtime_model,
-            "voice_id": voice_id,
-        }
-
-        # Mark the content as modified for SQLAlchemy
-        flag_modified(script, "content")
+        script.update_content(
+            {
+                "model_config": {
+                    "mode": mode,
+                    "standard_model": standard_model,
+                    "realtime_model": realtime_model,
+                    "voice_id": voice_id,
+                }
+            }
+        )
+        refresh_agent_context(script)
 
         # Also update the brdge voice_id if provided
         if voice_id is not None:
@@ -3706,6 +3967,123 @@ def add_conversation_log(brdge_id):
         return jsonify({"error": str(e)}), 500
 
 
+def _parse_log_time(value):
+    """ISO timestamp from the agent, or now if missing/invalid"""
+    try:
+        return datetime.fromisoformat(value) if value else datetime.utcnow()
+    except (TypeError, ValueError):
+        return datetime.utcnow()
+
+
+@app.route("/api/brdges/<int:brdge_id>/agent-logs/bulk", methods=["POST"])
+@cross_origin()
+def bulk_ingest_agent_logs(brdge_id):
+    """
+    Store a batch of completed usage logs and conversation logs from the voice
+    agent in one transaction. Usage log rows arrive finished (started_at and
+    ended_at), so there is no follow-up update.
+
+    A batch_id seen before is acknowledged without storing anything: the agent
+    resends a batch whose response it never got, and usage rows are billed.
+    """
+    try:
+        data = request.get_json() or {}
+        usage_entries = data.get("usage_logs") or []
+        conversation_entries = data.get("conversation_logs") or []
+        batch_id = data.get("batch_id")
+        if (
+            batch_id
+            and AgentLogBatch.query.filter_by(batch_id=batch_id).first() is not None
+        ):
+            logger.info(f"Skipping agent log batch {batch_id}, already ingested")
+            return jsonify({"inserted": 0, "rejected": 0, "duplicate": True}), 200
+
+        # One owner lookup for the whole batch
+        brdge = Brdge.query.get_or_404(brdge_id)
+        owner_id = brdge.user_id
+
+        # Resolve each distinct personalization ID once
+        personalization_ids = {
+            entry.get("personalization_id")
+            for entry in conversation_entries
+            if entry.get("personalization_id")
+        }
+        record_ids = {}
+        if personalization_ids:
+            record_ids = dict(
+                db.session.query(
+                    PersonalizationRecord.unique_id, PersonalizationRecord.id
+                ).filter(PersonalizationRecord.unique_id.in_(personalization_ids))
+            )
+
+        rows = []
+        rejected = 0
+        for entry in usage_entries:
+            if not entry.get("started_at"):
+                rejected += 1
+                continue
+            rows.append(
+                UsageLogs(
+                    brdge_id=brdge_id,
+                    owner_id=owner_id,
+                    viewer_user_id=entry.get("viewer_user_id"),
+                    anonymous_id=entry.get("anonymous_id"),
+                    agent_message=entry.get("agent_message") or "",
+                    started_at=_parse_log_time(entry["started_at"]),
+                    ended_at=(
+                        _parse_log_time(entry["ended_at"])
+                        if entry.get("ended_at")
+                        else None
+                    ),
+                    duration_minutes=entry.get("duration_minutes") or 0.0,
+                    was_interrupted=entry.get("was_interrupted", False),
+                )
+            )
+        for entry in conversation_entries:
+            if not entry.get("message") or not entry.get("role"):
+                rejected += 1
+                continue
+            rows.append(
+                ConversationLogs(
+                    brdge_id=brdge_id,
+                    owner_id=owner_id,
+                    viewer_user_id=entry.get("viewer_user_id"),
+                    anonymous_id=entry.get("anonymous_id"),
+                    role=entry["role"],
+                    message=entry["message"],
+                    timestamp=_parse_log_time(entry.get("timestamp")),
+                    was_interrupted=entry.get("was_interrupted", False),
+                    duration_minutes=entry.get("duration_minutes", 0.0),
+                    personalization_record_id=record_ids.get(
+                        entry.get("personalization_id")
+                    ),
+                )
+            )
+
+        db.session.add_all(rows)
+        if batch_id:
+            db.session.add(
+                AgentLogBatch(batch_id=batch_id, brdge_id=brdge_id, row_count=len(rows))
+            )
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent resend of the same batch committed first
+            db.session.rollback()
+            logger.info(f"Skipping agent log batch {batch_id}, already ingested")
+            return jsonify({"inserted": 0, "rejected": 0, "duplicate": True}), 200
+
+        logger.info(
+            f"Ingested {len(rows)} agent log rows for brdge {brdge_id} ({rejected} rejected)"
+        )
+        return jsonify({"inserted": len(rows), "rejected": rejected}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error ingesting agent logs: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/brdges/<int:brdge_id>/conversation-logs", methods=["GET"])
 @jwt_required(optional=True)
 @cross_origin()
@@ -4777,18 +5155,28 @@ def get_brdge_status(user, brdge_id):
         if not script:
             return jsonify({"status": "pending", "logs": [], "progress": 0}), 200
 
-        # Get metadata with logs
         metadata = script.script_metadata or {}
-        logs = metadata.get("logs", [])
         progress = metadata.get("progress", 0)
 
+        # Pass ?after=<last log id> to only receive lines added since then
+        after = request.args.get("after", type=int)
+        log_query = ScriptLog.query.filter_by(script_id=script.id)
+        if after:
+            log_query = log_query.filter(ScriptLog.id > after)
+        logs = [line.to_dict() for line in log_query.order_by(ScriptLog.id).all()]
+        if not logs and not after:
+            # Scripts processed before script_log existed keep their logs in metadata
+            logs = metadata.get("logs", [])
+
         # Return the status, progress, and logs
         return (
             jsonify(
                 {
                     "status": script.status,
+                    "reextracting": bool(metadata.get("reextracting")),
                     "logs": logs,
                     "progress": progress,
+                    "last_log_id": logs[-1].get("id", after) if logs else after,
                     "updated_at": (
                         script.created_at.isoformat() if script.created_at else None
                     ),
@@ -4802,6 +5190,345 @@ def get_brdge_status(user, brdge_id):
         return jsonify({"error": "Error getting brdge status", "detail": str(e)}), 500
 
 
+SSE_STATUS_POLL_SECONDS = 1.0
+# Each open stream holds a worker, so streams end after this long and the
+# client reconnects with a fresh token
+SSE_STATUS_MAX_SECONDS = 5 * 60
+SSE_HEARTBEAT_SECONDS = 15
+# EventSource can't send an Authorization header, so the stream is opened
+# with a short-lived signed token in the query string instead
+SSE_TOKEN_MAX_AGE_SECONDS = 60
+
+
+def _status_stream_serializer():
+    return URLSafeTimedSerializer(
+        app.config["JWT_SECRET_KEY"], salt="brdge-status-stream"
+    )
+
+
+def _sse_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route("/api/brdges/<int:brdge_id>/status/stream-token", methods=["POST"])
+@login_required
+def create_status_stream_token(user, brdge_id):
+    """Issue a token that opens the status stream for this brdge only"""
+    Brdge.query.filter_by(id=brdge_id, user_id=user.id).first_or_404()
+    token = _status_stream_serializer().dumps(
+        {"user_id": user.id, "brdge_id": brdge_id}
+    )
+    return jsonify({"token": token, "expires_in": SSE_TOKEN_MAX_AGE_SECONDS}), 200
+
+
+@app.route("/api/brdges/<int:brdge_id>/status/stream", methods=["GET"])
+def stream_brdge_status(brdge_id):
+    """
+    Server-sent events for an ingestion: `log` for each new line, `progress`
+    when progress or status changes and `done` once the script completes or
+    fails. The stream sends `expired` and closes after SSE_STATUS_MAX_SECONDS.
+    Reconnects resume after the Last-Event-ID (or ?after=) log id.
+    """
+    try:
+        claims = _status_stream_serializer().loads(
+            request.args.get("token", ""), max_age=SSE_TOKEN_MAX_AGE_SECONDS
+        )
+    except BadSignature:
+        return jsonify({"error": "Invalid or expired stream token"}), 401
+    if claims.get("brdge_id") != brdge_id:
+        return jsonify({"error": "Invalid or expired stream token"}), 401
+    Brdge.query.filter_by(id=brdge_id, user_id=claims.get("user_id")).first_or_404()
+    last_id = request.headers.get("Last-Event-ID", type=int) or request.args.get(
+        "after", 0, type=int
+    )
+
+    def generate():
+        nonlocal last_id
+        started = time.time()
+        last_sent = started
+        last_state = None
+
+        while time.time() - started < SSE_STATUS_MAX_SECONDS:
+            script = (
+                BrdgeScript.query.filter_by(brdge_id=brdge_id)
+                .order_by(BrdgeScript.id.desc())
+                .first()
+            )
+            if script:
+                lines = (
+                    ScriptLog.query.filter(
+                        ScriptLog.script_id == script.id, ScriptLog.id > last_id
+                    )
+                    .order_by(ScriptLog.id)
+                    .limit(500)
+                    .all()
+                )
+                for line in lines:
+                    last_id = line.id
+                    last_sent = time.time()
+                    yield _sse_event("log", line.to_dict(), event_id=line.id)
+
+                metadata = script.script_metadata or {}
+                state = {
+                    "status": script.status,
+                    "reextracting": bool(metadata.get("reextracting")),
+                    "progress": metadata.get("progress", 0),
+                }
+                if state != last_state:
+                    last_state = state
+                    last_sent = time.time()
+                    yield _sse_event("progress", state)
+
+                if (
+                    script.status in ("completed", "failed")
+                    and not state["reextracting"]
+                    and len(lines) < 500
+                ):
+                    yield _sse_event("done", state)
+                    return
+
+            if time.time() - last_sent > SSE_HEARTBEAT_SECONDS:
+                last_sent = time.time()
+                yield ": keepalive\n\n"
+
+            # End the read transaction so the next poll sees newly committed lines
+            db.session.rollback()
+            time.sleep(SSE_STATUS_POLL_SECONDS)
+
+        yield _sse_event("expired", {"last_log_id": last_id})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/brdges/<int:brdge_id>/resume", methods=["POST"])
+@login_required
+def resume_brdge_processing(user, brdge_id):
+    """Re-run a failed ingestion, skipping the passes that were checkpointed"""
+    try:
+        brdge = Brdge.query.filter_by(id=brdge_id, user_id=user.id).first_or_404()
+        script = (
+            BrdgeScript.query.filter_by(brdge_id=brdge_id)
+            .order_by(BrdgeScript.id.desc())
+            .first()
+        )
+        if not script or script.status != "failed":
+            return jsonify({"error": "No failed processing job to resume"}), 409
+
+        recording = (
+            Recording.query.filter_by(brdge_id=brdge_id)
+            .order_by(Recording.id.desc())
+            .first()
+        )
+        if not recording:
+            return jsonify({"error": "No recording found for this brdge"}), 404
+
+        # Pull the originals back down from S3 for the Gemini upload
+        video_local_path = f"/tmp/brdge_{brdge.id}_{recording.filename}"
+        s3_client.download_file(
+            S3_BUCKET,
+            f"{brdge.folder}/recordings/{recording.filename}",
+            video_local_path,
+        )
+        pdf_local_path = None
+        if brdge.presentation_filename:
+            pdf_local_path = f"/tmp/brdge_{brdge.id}_{brdge.presentation_filename}"
+            s3_client.download_file(
+                S3_BUCKET,
+                f"{brdge.folder}/{brdge.presentation_filename}",
+                pdf_local_path,
+            )
+
+        completed_passes = [checkpoint.pass_name for checkpoint in script.checkpoints]
+        script_id = script.id
+        bridge_type = brdge.bridge_type
+        additional_instructions = brdge.additional_instructions or ""
+
+        def resume_in_background(b_id, s_id, v_path, p_path, b_type, add_instr):
+            with app.app_context():
+                try:
+                    process_brdge_content(
+                        b_id, v_path, p_path, b_type, add_instr, resume_script_id=s_id
+                    )
+                except Exception as e:
+                    logger.error(f"Resume processing error: {str(e)}", exc_info=True)
+                finally:
+                    try:
+                        if v_path and os.path.exists(v_path):
+                            os.remove(v_path)
+                        if p_path and os.path.exists(p_path):
+                            os.remove(p_path)
+                    except Exception as cleanup_error:
+                        logger.error(f"Error cleaning up files: {str(cleanup_error)}")
+
+        thread = Thread(
+            target=resume_in_background,
+            args=(
+                brdge_id,
+                script_id,
+                video_local_path,
+                pdf_local_path,
+                bridge_type,
+                additional_instructions,
+            ),
+        )
+        thread.daemon = True
+        thread.start()
+
+        return (
+            jsonify(
+                {
+                    "message": "Processing resumed",
+                    "processing_status": "pending",
+                    "script_id": script_id,
+                    "completed_passes": completed_passes,
+                }
+            ),
+            202,
+        )
+
+    except Exception as e:
+        logger.error(f"Error resuming brdge processing: {str(e)}")
+        return (
+            jsonify({"error": "Error resuming brdge processing", "detail": str(e)}),
+            500,
+        )
+
+
+@app.route("/api/brdges/<int:brdge_id>/reextract", methods=["POST"])
+@login_required
+def reextract_brdge_knowledge(user, brdge_id):
+    """
+    Change bridge_type and/or additional_instructions and refresh only the
+    persona, engagement opportunities and integration passes.
+    """
+    flagged_script_id = None
+    try:
+        brdge = Brdge.query.filter_by(id=brdge_id, user_id=user.id).first_or_404()
+        data = request.get_json() or {}
+        bridge_type = data.get("bridge_type", brdge.bridge_type) or "course"
+        additional_instructions = data.get(
+            "additional_instructions", brdge.additional_instructions or ""
+        )
+
+        script = (
+            BrdgeScript.query.filter_by(brdge_id=brdge_id)
+            .order_by(BrdgeScript.id.desc())
+            .first()
+        )
+        if not script or "video_timeline" not in script.content_section_names():
+            return jsonify({"error": "No completed extraction to build on"}), 409
+        if script.status == "pending" or (script.script_metadata or {}).get(
+            "reextracting"
+        ):
+            return jsonify({"error": "Processing is already running"}), 409
+
+        recording = (
+            Recording.query.filter_by(brdge_id=brdge_id)
+            .order_by(Recording.id.desc())
+            .first()
+        )
+        if not recording:
+            return jsonify({"error": "No recording found for this brdge"}), 404
+
+        brdge.bridge_type = bridge_type
+        brdge.additional_instructions = additional_instructions
+        # Flag the run now so a second request is turned away straight away
+        script.script_metadata = {
+            **(script.script_metadata or {}),
+            "reextracting": True,
+        }
+        db.session.commit()
+        flagged_script_id = script.id
+
+        # Persona and engagement still watch the video; an upload made in the
+        # last 48h is reused from the file registry instead of being re-sent
+        video_local_path = f"/tmp/brdge_{brdge.id}_{recording.filename}"
+        s3_client.download_file(
+            S3_BUCKET,
+            f"{brdge.folder}/recordings/{recording.filename}",
+            video_local_path,
+        )
+        pdf_local_path = None
+        if brdge.presentation_filename:
+            pdf_local_path = f"/tmp/brdge_{brdge.id}_{brdge.presentation_filename}"
+            s3_client.download_file(
+                S3_BUCKET,
+                f"{brdge.folder}/{brdge.presentation_filename}",
+                pdf_local_path,
+            )
+
+        script_id = script.id
+
+        def reextract_in_background(b_id, s_id, v_path, p_path, b_type, add_instr):
+            with app.app_context():
+                try:
+                    process_brdge_content(
+                        b_id,
+                        v_path,
+                        p_path,
+                        b_type,
+                        add_instr,
+                        reextract_script_id=s_id,
+                    )
+                except Exception as e:
+                    logger.error(f"Re-extraction error: {str(e)}", exc_info=True)
+                finally:
+                    try:
+                        if v_path and os.path.exists(v_path):
+                            os.remove(v_path)
+                        if p_path and os.path.exists(p_path):
+                            os.remove(p_path)
+                    except Exception as cleanup_error:
+                        logger.error(f"Error cleaning up files: {str(cleanup_error)}")
+
+        thread = Thread(
+            target=reextract_in_background,
+            args=(
+                brdge_id,
+                script_id,
+                video_local_path,
+                pdf_local_path,
+                bridge_type,
+                additional_instructions,
+            ),
+        )
+        thread.daemon = True
+        thread.start()
+
+        return (
+            jsonify(
+                {
+                    "message": "Re-extraction started",
+                    "reextracting": True,
+                    "script_id": script_id,
+                    "rerun_passes": sorted(gemini.settings_dependent_pass_names()),
+                }
+            ),
+            202,
+        )
+
+    except Exception as e:
+        logger.error(f"Error starting re-extraction: {str(e)}")
+        db.session.rollback()
+        script = BrdgeScript.query.get(flagged_script_id) if flagged_script_id else None
+        if script:
+            clear_reextracting(script)
+            db.session.commit()
+        return (
+            jsonify({"error": "Error starting re-extraction", "detail": str(e)}),
+            500,
+        )
+
+
 def process_brdge_content_with_logs(
     brdge_id, video_local_path, pdf_local_path, template_type, script_id
 ):
@@ -8001,6 +8728,123 @@ def get_admin_analytics():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/admin/extraction-cache/stats", methods=["GET"])
+@jwt_required()
+@cross_origin()
+def get_extraction_cache_stats():
+    """Hit/miss counters and disk usage of the knowledge extraction cache"""
+    try:
+        admin_record = AdminUser.query.filter_by(
+            user_id=get_jwt_identity(), is_active=True
+        ).first()
+        if not admin_record:
+            return jsonify({"success": False, "error": "Admin access required"}), 403
+
+        return jsonify({"success": True, "cache": get_extraction_cache().stats()})
+
+    except Exception as e:
+        logger.error(f"Error fetching extraction cache stats: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+@app.route("/api/admin/gemini-metrics", methods=["GET"])
+@jwt_required()
+@cross_origin()
+def get_gemini_metrics():
+    """Latency, token and failure percentiles per extraction pass, plus rate limiter queues"""
+    try:
+        admin_record = AdminUser.query.filter_by(
+            user_id=get_jwt_identity(), is_active=True
+        ).first()
+        if not admin_record:
+            return jsonify({"success": False, "error": "Admin access required"}), 403
+
+        days = request.args.get("days", 7, type=int)
+        since = datetime.utcnow() - timedelta(days=days)
+        query = GeminiCallMetric.query.filter(GeminiCallMetric.created_at >= since)
+        if request.args.get("pass_name"):
+            query = query.filter_by(pass_name=request.args["pass_name"])
+        rows = query.with_entities(
+            GeminiCallMetric.pass_name,
+            GeminiCallMetric.wall_time,
+            GeminiCallMetric.input_tokens,
+            GeminiCallMetric.output_tokens,
+            GeminiCallMetric.bytes_uploaded,
+            GeminiCallMetric.retries,
+            GeminiCallMetric.outcome,
+            GeminiCallMetric.time_to_first_item,
+            GeminiCallMetric.queue_wait,
+        ).all()
+
+        by_pass = {}
+        for row in rows:
+            by_pass.setdefault(row.pass_name, []).append(row)
+
+        passes = {}
+        for pass_name, pass_rows in by_pass.items():
+            wall_times = sorted(r.wall_time for r in pass_rows)
+            input_tokens = sorted(r.input_tokens or 0 for r in pass_rows)
+            output_tokens = sorted(r.output_tokens or 0 for r in pass_rows)
+            first_item_times = sorted(
+                r.time_to_first_item
+                for r in pass_rows
+                if r.time_to_first_item is not None
+            )
+            queue_waits = sorted(
+                r.queue_wait for r in pass_rows if r.queue_wait is not None
+            )
+            outcomes = {}
+            for r in pass_rows:
+                outcomes[r.outcome] = outcomes.get(r.outcome, 0) + 1
+            passes[pass_name] = {
+                "calls": len(pass_rows),
+                "outcomes": outcomes,
+                "error_rate": round(outcomes.get("error", 0) / len(pass_rows), 4),
+                "retries": sum(r.retries or 0 for r in pass_rows),
+                "wall_time": {
+                    f"p{p}": _percentile(wall_times, p) for p in (50, 90, 95, 99)
+                },
+                "time_to_first_item": {
+                    f"p{p}": _percentile(first_item_times, p) for p in (50, 90, 99)
+                },
+                "queue_wait": {
+                    f"p{p}": _percentile(queue_waits, p) for p in (50, 90, 99)
+                },
+                "input_tokens": {
+                    f"p{p}": _percentile(input_tokens, p) for p in (50, 90, 99)
+                },
+                "output_tokens": {
+                    f"p{p}": _percentile(output_tokens, p) for p in (50, 90, 99)
+                },
+                "total_input_tokens": sum(input_tokens),
+                "total_output_tokens": sum(output_tokens),
+                "total_bytes_uploaded": sum(r.bytes_uploaded or 0 for r in pass_rows),
+            }
+
+        return jsonify(
+            {
+                "success": True,
+                "days": days,
+                "total_calls": len(rows),
+                "passes": passes,
+                # Live state of this worker process's limiter
+                "rate_limiter": gemini.gemini_rate_limiter.stats(),
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Error fetching Gemini metrics: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ============================================================================
 # FULFILLMENT API ROUTES
 # ============================================================================
@@ -41,6 +41,16 @@ ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")  # Your API key for authent
 S3_BUCKET = os.getenv("S3_BUCKET")
 S3_REGION = os.getenv("S3_REGION", "us-east-1")
 
+# Low-bitrate proxy sent to Gemini for analysis (the original stays in S3)
+ANALYSIS_PROXY_ENABLED = os.getenv("ANALYSIS_PROXY_ENABLED", "false").lower() == "true"
+ANALYSIS_PROXY_PROFILE = os.getenv("ANALYSIS_PROXY_PROFILE", "standard")
+ANALYSIS_PROXY_PROFILES = {
+    # Gemini samples video at 1 fps, so extra frames mostly add upload bytes
+    "low": {"height": 360, "fps": 1, "crf": 34, "audio_bitrate": "32k"},
+    "standard": {"height": 480, "fps": 2, "crf": 30, "audio_bitrate": "48k"},
+    "high": {"height": 720, "fps": 4, "crf": 28, "audio_bitrate": "64k"},
+}
+
 # Add debug logging for S3 configuration
 
 
@@ -582,3 +592,54 @@ def convert_webm_to_mp4(input_path: str) -> Tuple[str, bool]:
     except Exception as e:
         print(f"Error converting video: {str(e)}")
         return None, False
+
+
+def create_analysis_proxy(
+    input_path: str, profile: str = ANALYSIS_PROXY_PROFILE
+) -> Tuple[str, bool]:
+    """
+    Build a compact copy of a recording for AI analysis: downscaled, low-fps
+    video with mono speech-quality audio. Timestamps are unchanged.
+    Returns tuple of (output_path, success); the proxy is only reported as a
+    success when it is actually smaller than the input.
+    """
+    try:
+        settings = ANALYSIS_PROXY_PROFILES.get(profile)
+        if not settings:
+            raise ValueError(f"Unknown analysis proxy profile: {profile}")
+
+        output_path = input_path.rsplit(".", 1)[0] + f".proxy-{profile}.mp4"
+
+        stream = ffmpeg.input(input_path)
+        stream = ffmpeg.output(
+            stream,
+            output_path,
+            # Never upscale recordings that are already small
+            vf=f"fps={settings['fps']},scale=-2:'min({settings['height']},ih)'",
+            vcodec="libx264",
+            crf=settings["crf"],
+            preset="veryfast",  # Proxy is thrown away after upload
+            acodec="aac",
+            audio_bitrate=settings["audio_bitrate"],
+            ac=1,  # Mono audio is enough for transcription
+            ar=16000,
+            movflags="+faststart",
+        )
+
+        ffmpeg.run(
+            stream, overwrite_output=True, capture_stdout=True, capture_stderr=True
+        )
+
+        original_size = os.path.getsize(input_path)
+        proxy_size = os.path.getsize(output_path)
+        if proxy_size >= original_size:
+            os.remove(output_path)
+            return None, False
+
+        print(
+            f"Created {profile} analysis proxy: {original_size / 1e6:.1f} MB -> {proxy_size / 1e6:.1f} MB"
+        )
+        return output_path, True
+    except Exception as e:
+        print(f"Error creating analysis proxy: {str(e)}")
+        return None, False
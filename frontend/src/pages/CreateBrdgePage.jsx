@@ -64,6 +64,10 @@ function CreateBrdgePage() {
     const [isDragging, setIsDragging] = useState(false);
     const [pollingInterval, setPollingInterval] = useState(null);
     const logContainerRef = useRef(null);
+    const lastLogIdRef = useRef(null);
+    const statusStreamRef = useRef(null);
+    // Fall back to polling when the status stream can't be opened or drops
+    const [streamFailed, setStreamFailed] = useState(false);
 
     // Add state for new fields
     const [bridgeType, setBridgeType] = useState('course'); // Default to 'course'
@@ -102,9 +106,17 @@ function CreateBrdgePage() {
         };
     }, [pollingInterval]);
 
-    // Start polling for status updates
+    // Follow status updates over the server-sent event stream
     useEffect(() => {
-        if (createdBrdgeId && loading) {
+        if (createdBrdgeId && loading && !streamFailed) {
+            openStatusStream(createdBrdgeId);
+            return () => closeStatusStream();
+        }
+    }, [createdBrdgeId, loading, streamFailed]);
+
+    // Poll for status updates when the stream isn't available
+    useEffect(() => {
+        if (createdBrdgeId && loading && streamFailed) {
             const interval = setInterval(() => {
                 fetchProcessingStatus(createdBrdgeId);
             }, 3000); // Poll every 3 seconds
@@ -116,7 +128,7 @@ function CreateBrdgePage() {
 
             return () => clearInterval(interval);
         }
-    }, [createdBrdgeId, loading]);
+    }, [createdBrdgeId, loading, streamFailed]);
 
     // Auto-scroll to bottom of logs
     useEffect(() => {
@@ -158,13 +170,78 @@ function CreateBrdgePage() {
 
     const fetchProcessingStatus = async (brdgeId) => {
         try {
-            const response = await api.get(`/brdges/${brdgeId}/status`);
-            setProcessingStatus(response.data);
+            // Only ask for the log lines added since the last poll
+            const after = lastLogIdRef.current;
+            const response = await api.get(`/brdges/${brdgeId}/status`, {
+                params: after ? { after } : {}
+            });
+            const { logs = [], last_log_id: lastLogId } = response.data;
+            lastLogIdRef.current = lastLogId || after;
+            setProcessingStatus(prev => {
+                if (!after) {
+                    return response.data;
+                }
+                // Overlapping polls can return the same lines twice
+                const lastSeen = prev.logs.length ? prev.logs[prev.logs.length - 1].id || 0 : 0;
+                return {
+                    ...response.data,
+                    logs: [...prev.logs, ...logs.filter(log => log.id > lastSeen)]
+                };
+            });
         } catch (error) {
             console.error('Error fetching processing status:', error);
         }
     };
 
+    const closeStatusStream = () => {
+        if (statusStreamRef.current) {
+            statusStreamRef.current.close();
+            statusStreamRef.current = null;
+        }
+    };
+
+    const openStatusStream = async (brdgeId) => {
+        closeStatusStream();
+        try {
+            // EventSource can't send the Authorization header, so get a short-lived stream token
+            const { data } = await api.post(`/brdges/${brdgeId}/status/stream-token`);
+            const params = new URLSearchParams({ token: data.token });
+            if (lastLogIdRef.current) {
+                params.set('after', lastLogIdRef.current);
+            }
+            const baseUrl = api.defaults.baseURL.replace(/\/$/, '');
+            const source = new EventSource(`${baseUrl}/brdges/${brdgeId}/status/stream?${params}`);
+            statusStreamRef.current = source;
+
+            source.addEventListener('log', (event) => {
+                const log = JSON.parse(event.data);
+                if (log.id <= (lastLogIdRef.current || 0)) {
+                    return;
+                }
+                lastLogIdRef.current = log.id;
+                setProcessingStatus(prev => ({ ...prev, logs: [...prev.logs, log] }));
+            });
+            const updateStatus = (event) => {
+                const { status, progress } = JSON.parse(event.data);
+                setProcessingStatus(prev => ({ ...prev, status, progress }));
+            };
+            source.addEventListener('progress', updateStatus);
+            source.addEventListener('done', (event) => {
+                closeStatusStream();
+                updateStatus(event);
+            });
+            // The server closes long-lived streams; reconnect with a fresh token
+            source.addEventListener('expired', () => openStatusStream(brdgeId));
+            source.onerror = () => {
+                closeStatusStream();
+                setStreamFailed(true);
+            };
+        } catch (error) {
+            console.error('Error opening status stream:', error);
+            setStreamFailed(true);
+        }
+    };
+
     const fetchBrdgeData = async () => {
         try {
             const response = await api.get(`/brdges/${id}`);
@@ -13,12 +13,20 @@ Perfect for:
 
 Usage:
     python quickstart_extraction.py --video /path/to/video.mp4 --document /path/to/doc.pdf
+
+Batch mode (one JSONL line per input; re-running skips inputs already done):
+    python quickstart_extraction.py --input-dir recordings/ --workers 4 --rate-limit 60
+    python quickstart_extraction.py --manifest backfill.jsonl --output backfill_results.jsonl
 """
 
 import os
 import sys
+import csv
 import json
+import time
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
@@ -26,7 +34,12 @@ from pathlib import Path
 sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
 
 try:
-    from backend.gemini import create_brdge_knowledge, configure_genai
+    from backend.gemini import (
+        create_brdge_knowledge,
+        configure_genai,
+        missing_required_sections,
+        set_request_throttle,
+    )
 except ImportError:
     print(
         "❌ Error: Could not import backend modules. Make sure you're running from the project root."
@@ -155,6 +168,190 @@ def save_results(knowledge_data, output_path):
     print(f"\n💾 Full results saved to: {output_path}")
 
 
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".webm", ".mkv")
+DOCUMENT_EXTENSIONS = (".pdf", ".txt")
+
+
+class SharedRateLimiter:
+    """
+    Spaces Gemini requests from every worker process evenly, so the whole pool
+    stays under requests_per_minute. The next free slot lives in shared memory.
+    """
+
+    def __init__(self, requests_per_minute, next_slot, lock):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = next_slot
+        self.lock = lock
+
+    def __call__(self):
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot.value)
+            self.next_slot.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _init_batch_worker(requests_per_minute, next_slot, lock):
+    """Runs once per worker process: imports and Gemini setup are shared by all its jobs"""
+    load_environment()
+    configure_genai()
+    if requests_per_minute:
+        set_request_throttle(SharedRateLimiter(requests_per_minute, next_slot, lock))
+
+
+def _run_batch_item(item):
+    """Extract one manifest entry inside a worker process"""
+    started_at = datetime.now().isoformat()
+    start = time.time()
+    record = {**item, "started_at": started_at}
+    try:
+        knowledge_data = create_brdge_knowledge(
+            item["video"],
+            item.get("document"),
+            bridge_type=item.get("type") or "course",
+            additional_instructions=item.get("instructions") or "",
+        )
+        if isinstance(knowledge_data, dict) and knowledge_data.get("error"):
+            record.update(status="error", error=knowledge_data["error"])
+        else:
+            missing = missing_required_sections(knowledge_data)
+            if missing:
+                # Not "ok", so the next run of the batch retries it
+                record.update(
+                    status="error", error=f"No output for: {', '.join(missing)}"
+                )
+            else:
+                record.update(status="ok", result=knowledge_data)
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["finished_at"] = datetime.now().isoformat()
+    record["duration_seconds"] = round(time.time() - start, 2)
+    return record
+
+
+def find_directory_inputs(input_dir, bridge_type, instructions):
+    """Every video in input_dir, paired with a document of the same name if present"""
+    items = []
+    for path in sorted(Path(input_dir).iterdir()):
+        if path.suffix.lower() not in VIDEO_EXTENSIONS:
+            continue
+        document = next(
+            (
+                str(path.with_suffix(ext))
+                for ext in DOCUMENT_EXTENSIONS
+                if path.with_suffix(ext).exists()
+            ),
+            None,
+        )
+        items.append(
+            {
+                "id": str(path.resolve()),
+                "video": str(path),
+                "document": document,
+                "type": bridge_type,
+                "instructions": instructions,
+            }
+        )
+    return items
+
+
+def read_manifest(manifest_path, bridge_type, instructions):
+    """
+    Load inputs from a JSONL or CSV manifest with video and optional document,
+    type, instructions and id fields.
+    """
+    with open(manifest_path, "r", encoding="utf-8", newline="") as f:
+        if manifest_path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for row in rows:
+        if not row.get("video"):
+            print(f"⚠️  Skipping manifest entry without a video: {row}")
+            continue
+        items.append(
+            {
+                "id": row.get("id") or str(Path(row["video"]).resolve()),
+                "video": row["video"],
+                "document": row.get("document") or None,
+                "type": row.get("type") or bridge_type,
+                "instructions": row.get("instructions") or instructions,
+            }
+        )
+    return items
+
+
+def read_completed_ids(output_path):
+    """Ids already extracted successfully by an earlier (possibly interrupted) run"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut off by an interrupted run
+            if record.get("status") == "ok":
+                completed.add(record.get("id"))
+    return completed
+
+
+def run_batch(items, output_path, workers, requests_per_minute):
+    """Run create_brdge_knowledge over items on a process pool, appending JSONL results"""
+    completed = read_completed_ids(output_path)
+    pending = [item for item in items if item["id"] not in completed]
+    print(
+        f"\n📦 Batch: {len(items)} inputs, {len(items) - len(pending)} already done, "
+        f"{len(pending)} to process with {workers} workers"
+        + (f" at ≤{requests_per_minute} requests/min" if requests_per_minute else "")
+    )
+    if not pending:
+        return 0
+
+    missing = [item for item in pending if not os.path.exists(item["video"])]
+    for item in missing:
+        print(f"❌ Video file not found: {item['video']}")
+    pending = [item for item in pending if item not in missing]
+
+    next_slot = multiprocessing.Value("d", 0.0)
+    lock = multiprocessing.Lock()
+    batch_start = time.time()
+    failures = len(missing)
+    with open(output_path, "a", encoding="utf-8") as output, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_batch_worker,
+        initargs=(requests_per_minute, next_slot, lock),
+    ) as executor:
+        futures = {executor.submit(_run_batch_item, item): item for item in pending}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # The worker process itself died
+                record = {**item, "status": "error", "error": str(e)}
+            if record["status"] != "ok":
+                failures += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            status = "✅" if record["status"] == "ok" else "❌"
+            print(
+                f"{status} [{done_count}/{len(pending)}] {item['video']} "
+                f"({record.get('duration_seconds', 0):.1f}s){' - ' + record['error'] if record.get('error') else ''}"
+            )
+
+    print(
+        f"\n📦 Batch finished in {time.time() - batch_start:.1f}s: "
+        f"{len(pending) - failures + len(missing)} succeeded, {failures} failed"
+    )
+    print(f"💾 Results appended to: {output_path}")
+    return failures
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="DotBridge Knowledge Extraction Quickstart"
@@ -184,8 +381,30 @@ def main():
     parser.add_argument(
         "--output",
         type=str,
-        default="extraction_results.json",
-        help="Output file for results",
+        default=None,
+        help="Output file for results (default: extraction_results.json, or .jsonl in batch mode)",
+    )
+    parser.add_argument(
+        "--input-dir",
+        type=str,
+        help="Batch mode: extract every video in this directory (documents with the same name are paired)",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Batch mode: JSONL or CSV file of inputs (video, document, type, instructions, id)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Batch mode: number of worker processes",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0,
+        help="Batch mode: maximum Gemini requests per minute across all workers (0 = unlimited)",
     )
 
     args = parser.parse_args()
@@ -196,6 +415,21 @@ def main():
     # Load environment
     load_environment()
 
+    if args.input_dir or args.manifest:
+        if args.input_dir:
+            items = find_directory_inputs(args.input_dir, args.type, args.instructions)
+        else:
+            items = read_manifest(args.manifest, args.type, args.instructions)
+        failures = run_batch(
+            items,
+            args.output or "extraction_results.jsonl",
+            max(args.workers, 1),
+            args.rate_limit,
+        )
+        sys.exit(1 if failures else 0)
+
+    args.output = args.output or "extraction_results.json"
+
     # Handle sample content
     if not args.video and not args.document:
         print("📝 No content files provided. Creating sample content...")